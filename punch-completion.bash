@@ -38,12 +38,19 @@ _punch_complete()
         done < "$config_file"
     fi
 
-    local subcommands="start report export login submit add config help"
+    local subcommands="start report export import login browserd submit add amend undo config db log rollup archive help"
     local opts_start="-t --time"
-    local opts_report="-f --from -t --to -d --day"
-    local opts_export="-f --from -t --to -d --day --format -o --output"
-    local opts_submit="-f --from -t --to -d --day -n --dry-run --headed -i --interactive --sleep"
+    local opts_amend="-t --time --notes"
+    local opts_report="-f --from -t --to -d --day --by --metrics --parallel --collapse --no-collapse --plain"
+    local opts_export="-f --from -t --to -d --day --format -o --output --gzip --since-last --parallel --no-parallel"
+    local opts_import="--format -n --dry-run"
+    local opts_browserd="--headed --status --stop"
+    local opts_submit="-f --from -t --to -d --day -n --dry-run --headed -i --interactive --sleep -w --workers --force --backend"
     local opts_config="show edit path set get wizard"
+    local opts_db="migrate export-text"
+    local opts_log="segment verify"
+    local opts_rollup="verify rebuild"
+    local opts_archive="-b --before"
     local opts_global="-v --verbose -V --version -h --help"
 
     # Subcommand completion
@@ -110,10 +117,26 @@ _punch_complete()
                 fi
             fi
             ;;
+        amend)
+            COMPREPLY=( $(compgen -W "$opts_amend $opts_global" -- "$cur") )
+            return 0
+            ;;
+        undo)
+            COMPREPLY=( $(compgen -W "$opts_global" -- "$cur") )
+            return 0
+            ;;
         report)
             COMPREPLY=( $(compgen -W "$opts_report $opts_global" -- "$cur") )
             return 0
             ;;
+        import)
+            if [[ "$prev" == "--format" ]]; then
+                COMPREPLY=( $(compgen -W "json ndjson csv lines" -- "$cur") )
+            else
+                COMPREPLY=( $(compgen -f -W "$opts_import $opts_global" -- "$cur") )
+            fi
+            return 0
+            ;;
         export)
             COMPREPLY=( $(compgen -W "$opts_export $opts_global" -- "$cur") )
             return 0
@@ -122,6 +145,10 @@ _punch_complete()
             COMPREPLY=( $(compgen -W "$opts_global" -- "$cur") )
             return 0
             ;;
+        browserd)
+            COMPREPLY=( $(compgen -W "$opts_browserd $opts_global" -- "$cur") )
+            return 0
+            ;;
         submit)
             COMPREPLY=( $(compgen -W "$opts_submit $opts_global" -- "$cur") )
             return 0
@@ -139,6 +166,28 @@ _punch_complete()
                 return 0
             fi
             ;;
+        db)
+            if [[ ${COMP_CWORD} -eq 2 ]]; then
+                COMPREPLY=( $(compgen -W "$opts_db" -- "$cur") )
+                return 0
+            fi
+            ;;
+        archive)
+            COMPREPLY=( $(compgen -W "$opts_archive $opts_global" -- "$cur") )
+            return 0
+            ;;
+        log)
+            if [[ ${COMP_CWORD} -eq 2 ]]; then
+                COMPREPLY=( $(compgen -W "$opts_log" -- "$cur") )
+                return 0
+            fi
+            ;;
+        rollup)
+            if [[ ${COMP_CWORD} -eq 2 ]]; then
+                COMPREPLY=( $(compgen -W "$opts_rollup" -- "$cur") )
+                return 0
+            fi
+            ;;
         help)
             COMPREPLY=( $(compgen -W "$opts_global" -- "$cur") )
             return 0
@@ -0,0 +1,205 @@
+import gzip
+import io
+import json
+import os
+import re
+import tempfile
+
+from punch.cache import invalidate_rollup
+from punch.locking import locked
+from punch.segments import _write_json_atomic, is_segmented
+
+ARCHIVE_SUFFIX = ".archive.gz"
+INDEX_VERSION = 1
+
+# Blocks are closed at the first day boundary after this many uncompressed bytes
+BLOCK_SIZE = 256 * 1024
+
+_TIMESTAMP_PREFIX = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}')
+
+def get_archive_path(taskfile):
+    """
+    Returns the path of the compressed archive of taskfile (tasks.txt -> tasks.archive.gz).
+    """
+    return os.path.splitext(taskfile)[0] + ARCHIVE_SUFFIX
+
+def get_index_path(archive_path):
+    """
+    Returns the path of the block index of an archive (tasks.archive.gz -> tasks.archive.json).
+    """
+    return archive_path[:-len(".gz")] + ".json"
+
+def is_archive(path):
+    return path.endswith(ARCHIVE_SUFFIX)
+
+def has_archive(taskfile):
+    return os.path.exists(get_index_path(get_archive_path(taskfile)))
+
+def load_index(archive_path):
+    """
+    Returns the block index of an archive:
+    {"version": 1, "size": <bytes>, "blocks": [{"offset", "length", "first", "last", "lines"}, ...]},
+    with offset and length locating each gzip member in the archive and first/last being the
+    'YYYY-MM-DD HH:MM' timestamps of its first and last line.
+    """
+    with open(get_index_path(archive_path), 'r') as f:
+        index = json.load(f)
+    if index.get("version") != INDEX_VERSION:
+        raise ValueError(f"Unsupported task log archive version: {index.get('version')}")
+    return index
+
+def archive_blocks(archive_path, date_from=None, date_to=None):
+    """
+    Returns (first_line, block) for the blocks of the archive overlapping date_from..date_to
+    (inclusive, datetime.date objects or None for an open bound), in chronological order.
+    first_line is the number of lines in the archive before the block.
+    """
+    blocks = []
+    first_line = 0
+    for block in load_index(archive_path)["blocks"]:
+        overlaps = not (
+            (date_from is not None and block["last"][:10] < date_from.isoformat())
+            or (date_to is not None and block["first"][:10] > date_to.isoformat())
+        )
+        if overlaps:
+            blocks.append((first_line, block))
+        first_line += block["lines"]
+    return blocks
+
+def read_block(f, block):
+    """
+    Returns the decompressed lines of a block of the archive opened in binary mode as f.
+    """
+    f.seek(block["offset"])
+    return gzip.decompress(f.read(block["length"]))
+
+def archive_tasklog(taskfile, before, block_size=BLOCK_SIZE):
+    """
+    Moves the entries of the task log finished before the day before (a datetime.date)
+    to the end of its compressed archive. Every block of the archive is a separate gzip member
+    holding whole days, so a date range only needs to decompress the blocks it overlaps.
+    The block index is updated before the task log is rewritten without the archived lines;
+    if a run is interrupted in between, the next one drops the lines it already archived
+    from the head of the task log.
+    Returns the number of lines archived.
+    Raises ValueError if the log is segmented, a line has no 'YYYY-MM-DD HH:MM' prefix
+    or the entries are not in chronological order.
+    """
+    with locked(taskfile):
+        return _archive_tasklog(taskfile, before, block_size)
+
+def _archive_tasklog(taskfile, before, block_size):
+    if is_segmented(taskfile):
+        raise ValueError("A segmented task log cannot be archived")
+    archive_path = get_archive_path(taskfile)
+    if has_archive(taskfile):
+        index = load_index(archive_path)
+    else:
+        index = {"version": INDEX_VERSION, "size": 0, "blocks": []}
+    with open(taskfile, 'rb') as f:
+        lines = f.readlines()
+    skipped = _archived_head(archive_path, index, lines)
+    key = before.isoformat()
+    end = skipped
+    while end < len(lines) and lines[end][:10].decode('ascii', 'replace') < key:
+        end += 1
+    archived = lines[skipped:end]
+    remaining = b"".join(lines[end:])
+    if not archived and not skipped:
+        return 0
+    if archived:
+        _append_blocks(archive_path, index, archived, skipped, block_size)
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(taskfile)), prefix=".punch-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(remaining)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, taskfile)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    invalidate_rollup(taskfile)
+    return len(archived)
+
+def _archived_head(archive_path, index, lines):
+    """
+    Returns how many lines at the head of the task log are the last lines of the archive already:
+    the ones a run interrupted after writing the index but before rewriting the task log archived.
+    Lines stamped up to the last archived timestamp only count if they match the archive exactly.
+    """
+    if not index["blocks"]:
+        return 0
+    last = index["blocks"][-1]["last"]
+    count = 0
+    while count < len(lines) and lines[count][:16].decode('ascii', 'replace') <= last:
+        count += 1
+    if not count:
+        return 0
+    tail = []
+    with open(archive_path, 'rb') as f:
+        for block in reversed(index["blocks"]):
+            tail[:0] = io.BytesIO(read_block(f, block)).readlines()
+            if len(tail) >= count:
+                break
+    # The last archived line got a newline if the task log ended without one
+    if [raw.rstrip(b"\n") for raw in tail[-count:]] != [raw.rstrip(b"\n") for raw in lines[:count]]:
+        return 0
+    return count
+
+def _append_blocks(archive_path, index, archived, skipped, block_size):
+    """
+    Compresses the archived lines (which follow the skipped ones in the task log) into new blocks
+    at the end of the archive, then writes the updated index.
+    """
+    prev_timestamp = index["blocks"][-1]["last"] if index["blocks"] else None
+    for line_no, raw in enumerate(archived, skipped + 1):
+        timestamp = raw[:16].decode('ascii', 'replace')
+        if not _TIMESTAMP_PREFIX.fullmatch(timestamp):
+            raise ValueError(f"Invalid task entry format: line {line_no}: {raw.decode('utf-8', 'replace').strip()}")
+        if prev_timestamp and timestamp < prev_timestamp:
+            raise ValueError(
+                f"Task log not in chronological order: line {line_no}: ({timestamp} < {prev_timestamp})"
+            )
+        prev_timestamp = timestamp
+    if not archived[-1].endswith(b"\n"):
+        archived[-1] += b"\n"
+
+    with open(archive_path, 'ab') as out:
+        # Drop blocks written by an interrupted run that never made it into the index
+        out.truncate(index["size"])
+        out.seek(index["size"])
+        for block_lines in _split_blocks(archived, block_size):
+            data = gzip.compress(b"".join(block_lines), mtime=0)
+            index["blocks"].append({
+                "offset": out.tell(),
+                "length": len(data),
+                "first": block_lines[0][:16].decode('ascii'),
+                "last": block_lines[-1][:16].decode('ascii'),
+                "lines": len(block_lines),
+            })
+            out.write(data)
+        out.flush()
+        os.fsync(out.fileno())
+        index["size"] = out.tell()
+    _write_json_atomic(get_index_path(archive_path), index)
+
+def _split_blocks(lines, block_size):
+    """
+    Yields lists of lines of about block_size bytes, only ever split at a day boundary.
+    """
+    block = []
+    size = 0
+    for raw in lines:
+        if size >= block_size and raw[:10] != block[-1][:10]:
+            yield block
+            block = []
+            size = 0
+        block.append(raw)
+        size += len(raw)
+    if block:
+        yield block
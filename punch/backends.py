@@ -0,0 +1,333 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import datetime
+import http.client
+import json
+import os
+import queue
+import time
+from urllib.parse import quote, urlsplit
+
+from rich.console import Console
+
+from punch.web import (
+    DRY_RUN_SUFFIX, PROGRESS_WIDTH, AuthFileNotFoundError, _submission_progress, format_latencies, get_auth_json_path,
+    get_timecards_link, login_to_site, submit_timecards,
+)
+
+SUBMIT_BACKENDS = ("browser", "http")
+DEFAULT_BACKEND = "browser"
+
+# Records per request, the most the Salesforce sObject Collections API accepts
+SUBMIT_BATCH_SIZE = 200
+
+API_VERSION = "v60.0"
+
+# Fields of the timecard object set by the http backend, overridden by submit_api.fields in the config
+API_FIELDS = {
+    "case": "Case__c",
+    "owner": "OwnerId",
+    "description": "Description__c",
+    "minutes": "TotalMinutesStatic__c",
+    "start": "StartTime__c",
+}
+
+# Seconds to wait for the API to answer a request
+API_TIMEOUT = 60
+
+def open_backend(name, config, headless=True, interactive=False, verbose=False, sleep=0.0, workers=1):
+    """
+    Returns the submission backend called name: BrowserBackend ("browser") fills the
+    timecard form in Firefox, HttpBackend ("http") creates the timecards through the API.
+    Both have submit(timecards, dry_run=False, journal=None).
+    """
+    if name == "browser":
+        return BrowserBackend(config, headless, interactive, verbose, sleep, workers)
+    if name == "http":
+        if interactive:
+            raise ValueError("Interactive mode needs the browser submission backend.")
+        return HttpBackend(config, verbose, workers)
+    raise ValueError(f"Unknown submission backend: {name} (expected one of: {', '.join(SUBMIT_BACKENDS)})")
+
+class BrowserBackend:
+    """
+    Fills in and saves the timecard form in Firefox, see punch.web.submit_timecards.
+    """
+    def __init__(self, config, headless=True, interactive=False, verbose=False, sleep=0.0, workers=1):
+        self.config = config
+        self.headless = headless
+        self.interactive = interactive
+        self.verbose = verbose
+        self.sleep = sleep
+        self.workers = workers
+
+    def submit(self, timecards, dry_run=False, journal=None):
+        submit_timecards(
+            self.config, timecards, headless=self.headless, interactive=self.interactive, dry_run=dry_run,
+            verbose=self.verbose, sleep=self.sleep, workers=self.workers, journal=journal,
+        )
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"HTTP {status}: {message}" if status else message)
+        self.status = status
+
+class ApiSession:
+    """
+    Salesforce REST API requests authenticated with the session cookies saved by punch login,
+    over a pool of up to size keep-alive connections.
+    """
+    def __init__(self, base_url, cookies, size=1, timeout=API_TIMEOUT):
+        parts = urlsplit(base_url)
+        self.https = parts.scheme == "https"
+        self.host = parts.netloc
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        matching = [c for c in cookies if _cookie_matches(c, parts.hostname, self.https)]
+        if matching:
+            self.headers["Cookie"] = "; ".join(f"{c['name']}={c['value']}" for c in matching)
+        sid = next((c["value"] for c in matching if c["name"] == "sid"), None)
+        if sid:
+            self.headers["Authorization"] = f"Bearer {sid}"
+        self.idle = queue.LifoQueue(size)
+
+    @classmethod
+    def from_auth_json(cls, base_url, path, size=1):
+        try:
+            with open(path, "r") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            raise AuthFileNotFoundError("Auth file not found. Please login first using the 'login' command.")
+        return cls(base_url, state.get("cookies", []), size)
+
+    @contextmanager
+    def _connection(self):
+        try:
+            conn, reused = self.idle.get_nowait(), True
+        except queue.Empty:
+            connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn, reused = connection_class(self.host, timeout=self.timeout), False
+        try:
+            yield conn, reused
+        except BaseException:
+            conn.close()
+            raise
+        try:
+            self.idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method, path, body=None):
+        """
+        Returns the decoded JSON response, raising ApiError for an error status.
+        Kept-alive connections the server has closed in the meantime are dropped and the
+        request is sent again, unless it is not a GET and was sent in full: the server may
+        have acted on it before closing the connection.
+        """
+        data = None if body is None else json.dumps(body).encode("utf-8")
+        while True:
+            sent = False
+            try:
+                with self._connection() as (conn, reused):
+                    conn.request(method, path, body=data, headers=self.headers)
+                    sent = True
+                    response = conn.getresponse()
+                    payload = response.read()
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                if not reused or (sent and method != "GET"):
+                    raise
+        if response.status >= 400:
+            raise ApiError(response.status, _error_message(payload))
+        return json.loads(payload) if payload else None
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+def _cookie_matches(cookie, host, https):
+    domain = cookie.get("domain", "").lstrip(".")
+    if cookie.get("secure") and not https:
+        return False
+    return host == domain or host.endswith("." + domain)
+
+def _error_message(payload):
+    """
+    Returns the message of a Salesforce error response, [{"message", "errorCode"}].
+    """
+    try:
+        return _format_errors(json.loads(payload))
+    except (ValueError, TypeError, AttributeError):
+        return payload.decode("utf-8", "replace")[:200]
+
+def _format_errors(errors):
+    # Record results name the code statusCode, error responses errorCode
+    return "; ".join(f"{e.get('statusCode') or e.get('errorCode', '')}: {e.get('message', '')}" for e in errors)
+
+def _session_error(error):
+    if isinstance(error, ApiError) and error.status == 401:
+        return ApiError(401, "the session has expired, log in again with punch login")
+    return error
+
+def _soql_literal(value):
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+class HttpBackend:
+    """
+    Creates timecards through the Salesforce REST API (sObject Collections), submit_batch_size
+    records per request, with the session saved to auth.json by punch login. Cases and owners
+    are looked up by case number and name first, with one query each.
+    Up to workers batches are posted at once, each over a kept-alive connection from the pool.
+    Configured by the submit_api config section: url (default: the server of timecards_url),
+    version, object (the API name of the timecard object, required) and fields (see API_FIELDS).
+    """
+    def __init__(self, config, verbose=False, workers=1):
+        self.config = config
+        self.verbose = verbose
+        self.workers = max(1, workers)
+        api = config.get("submit_api") or {}
+        self.object = api.get("object")
+        if not self.object:
+            raise ValueError("No submit_api.object found in config. Set it to the API name of the timecard object.")
+        if api.get("url"):
+            self.base_url = api["url"].rstrip("/")
+        else:
+            parts = urlsplit(get_timecards_link(config))
+            self.base_url = f"{parts.scheme}://{parts.netloc}"
+        self.api_path = f"/services/data/{api.get('version', API_VERSION)}"
+        self.fields = {**API_FIELDS, **(api.get("fields") or {})}
+        self.batch_size = int(config.get("submit_batch_size", SUBMIT_BATCH_SIZE))
+
+    def submit(self, timecards, dry_run=False, journal=None):
+        console = Console()
+        if not timecards:
+            console.print("[yellow]No timecards to submit.[/yellow]")
+            return
+        suffix = DRY_RUN_SUFFIX if dry_run else ""
+        auth_json_path = get_auth_json_path()
+        if not os.path.exists(auth_json_path):
+            console.print("[red]No authentication found. Trying to login.[/red]")
+            login_to_site(self.config, self.verbose)
+
+        session = ApiSession.from_auth_json(self.base_url, auth_json_path, self.workers)
+        try:
+            if self.verbose:
+                console.print(f"[cyan]Submitting through {self.base_url}{self.api_path}[/cyan]")
+            try:
+                failed, ready = self._resolve(session, timecards)
+            except (ApiError, OSError, http.client.HTTPException) as e:
+                console.print(f"[red]Could not look up the cases and users of the timecards: {_session_error(e)}[/red]")
+                return
+            batches = [ready[i:i + self.batch_size] for i in range(0, len(ready), self.batch_size)]
+            latencies = []
+            if dry_run:
+                console.print(f"[green]Would create {len(ready)} timecards in {len(batches)} requests.[/green]{suffix}")
+            else:
+                latencies = self._post_batches(console, session, batches, failed, journal)
+        finally:
+            session.close()
+
+        failed.sort(key=lambda item: item[0])
+        for _, timecard, error in failed:
+            console.print(f"[red]Failed to submit {timecard.desc} - {timecard.work_performed} ({timecard.start_date} {timecard.start_time:%H:%M}): {error}[/red]")
+        console.print(f"[bold green]Submitted {len(timecards) - len(failed)} entries.{suffix}[/bold green]")
+        if not dry_run:
+            console.print(format_latencies(latencies))
+
+    def _resolve(self, session, timecards):
+        """
+        Returns the [(idx, timecard, error)] whose case or owner was not found
+        and the [(idx, timecard, record)] ready to be created.
+        """
+        case_ids = self._lookup(session, "Case", "CaseNumber", {t.case_no for t in timecards})
+        owner_ids = self._lookup(session, "User", "Name", {t.owner for t in timecards})
+        failed, ready = [], []
+        for idx, timecard in enumerate(timecards):
+            if timecard.case_no not in case_ids:
+                failed.append((idx, timecard, f"case {timecard.case_no} not found"))
+            elif timecard.owner not in owner_ids:
+                failed.append((idx, timecard, f"user {timecard.owner} not found"))
+            else:
+                ready.append((idx, timecard, self._record(timecard, case_ids, owner_ids)))
+        return failed, ready
+
+    def _lookup(self, session, sobject, field, values):
+        """
+        Returns {value: Id} of the sobject records whose field is one of values.
+        """
+        ids = {}
+        values = sorted(values)
+        # Keeps the query string well below URL length limits
+        for i in range(0, len(values), 100):
+            chunk = ", ".join(_soql_literal(v) for v in values[i:i + 100])
+            soql = f"SELECT Id, {field} FROM {sobject} WHERE {field} IN ({chunk})"
+            result = session.request("GET", f"{self.api_path}/query?q={quote(soql)}")
+            while True:
+                for record in result["records"]:
+                    ids[record[field]] = record["Id"]
+                if result.get("done", True):
+                    break
+                result = session.request("GET", result["nextRecordsUrl"])
+        return ids
+
+    def _record(self, timecard, case_ids, owner_ids):
+        start = datetime.datetime.combine(timecard.start_date, timecard.start_time).astimezone()
+        return {
+            "attributes": {"type": self.object},
+            self.fields["case"]: case_ids[timecard.case_no],
+            self.fields["owner"]: owner_ids[timecard.owner],
+            self.fields["description"]: timecard.work_performed,
+            self.fields["minutes"]: timecard.minutes,
+            self.fields["start"]: start.isoformat(timespec="seconds"),
+        }
+
+    def _post_batches(self, console, session, batches, failed, journal):
+        """
+        Posts the batches, workers at a time, adding the timecards that were not created to failed.
+        The timecards of a request that fails as a whole all fail with its error.
+        Returns the seconds each created timecard took, its share of the time of its request.
+        """
+        total = sum(len(batch) for batch in batches)
+        latencies = []
+        with _submission_progress(console) as progress:
+            task = progress.add_task(
+                "Submitting entries", total=total, desc="Submitting entries".ljust(PROGRESS_WIDTH), count=f"0/{total}",
+                latency="",
+            )
+            done = 0
+            with ThreadPoolExecutor(self.workers) as executor:
+                for batch, results, elapsed in executor.map(lambda batch: self._post(session, batch), batches):
+                    created = 0
+                    for (idx, timecard, _), result in zip(batch, results):
+                        if isinstance(result, Exception):
+                            failed.append((idx, timecard, result))
+                        elif result.get("success"):
+                            created += 1
+                            if journal is not None:
+                                journal.record(timecard)
+                        else:
+                            failed.append((idx, timecard, _format_errors(result.get("errors", []))))
+                    latencies.extend([elapsed / len(batch)] * created)
+                    done += len(batch)
+                    fields = {"latency": f"{elapsed / len(batch):.2f}s/entry"} if created else {}
+                    progress.update(task, advance=len(batch), count=f"{done}/{total}", **fields)
+        return latencies
+
+    def _post(self, session, batch):
+        """
+        Returns the batch, the result of each record in it and the seconds the request took.
+        """
+        start = time.perf_counter()
+        try:
+            results = session.request(
+                "POST", f"{self.api_path}/composite/sobjects",
+                {"allOrNone": False, "records": [record for _, _, record in batch]},
+            )
+            if not isinstance(results, list) or len(results) != len(batch):
+                raise ApiError(None, "unexpected response to the batch")
+        except (ApiError, OSError, http.client.HTTPException, ValueError) as e:
+            results = [_session_error(e)] * len(batch)
+        return batch, results, time.perf_counter() - start
@@ -0,0 +1,271 @@
+import dataclasses
+import datetime
+import json
+import os
+import socket
+import time
+
+from playwright.sync_api import sync_playwright, Error as playwright_error
+from rich.console import Console
+
+from punch import web
+from punch.config import get_config_path
+
+SOCKET_FILE = "browserd.sock"
+
+# Seconds without requests after which the daemon reloads the timecard form,
+# keeping the page fresh and the session alive
+BROWSERD_REFRESH = 600
+
+# Seconds a client waits for the daemon to answer a ping
+CONNECT_TIMEOUT = 2.0
+
+class BrowserdError(Exception):
+    pass
+
+def get_socket_path():
+    """
+    Returns the path of the Unix socket punch browserd listens on, next to auth.json.
+    """
+    return os.path.join(os.path.dirname(get_config_path()), SOCKET_FILE)
+
+def _timecard_to_json(timecard):
+    data = dataclasses.asdict(timecard)
+    data["start_date"] = timecard.start_date.isoformat()
+    data["start_time"] = timecard.start_time.isoformat()
+    return data
+
+def _timecard_from_json(data):
+    return web.TimecardEntry(**{
+        **data,
+        "start_date": datetime.date.fromisoformat(data["start_date"]),
+        "start_time": datetime.time.fromisoformat(data["start_time"]),
+    })
+
+class BrowserdClient:
+    """
+    Talks to a running punch browserd, one request per connection: a JSON line is sent and
+    the JSON lines of the reply are read until the connection is closed.
+    """
+    def __init__(self, path, info):
+        self.path = path
+        self.headless = info["headless"]
+        self.pid = info["pid"]
+
+    def call(self, op, timeout=None, **params):
+        """
+        Yields the messages the daemon replies to op with,
+        raising BrowserdError if it reports an error or hangs up before it is done.
+        """
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(self.path)
+            sock.sendall(json.dumps({"op": op, **params}, default=str).encode("utf-8") + b"\n")
+            with sock.makefile("r", encoding="utf-8") as replies:
+                for line in replies:
+                    message = json.loads(line)
+                    if "error" in message:
+                        raise BrowserdError(message["error"])
+                    yield message
+                    if message.get("event") == "done":
+                        return
+        raise BrowserdError("punch browserd closed the connection")
+
+    def login(self, config):
+        return self.call("login", config=config)
+
+    def submit(self, config, timecards, dry_run=False, sleep=0.0):
+        return self.call("submit", config=config, timecards=[_timecard_to_json(t) for t in timecards],
+                         dry_run=dry_run, sleep=sleep)
+
+    def stop(self):
+        for _ in self.call("stop", timeout=CONNECT_TIMEOUT):
+            pass
+
+def connect(path=None):
+    """
+    Returns a BrowserdClient if punch browserd is running, None otherwise.
+    """
+    path = path or get_socket_path()
+    client = BrowserdClient(path, {"headless": True, "pid": None})
+    try:
+        for message in client.call("ping", timeout=CONNECT_TIMEOUT):
+            return BrowserdClient(path, message)
+    except (OSError, ValueError, BrowserdError):
+        return None
+
+class BrowserDaemon:
+    """
+    Keeps a Playwright browser, a context logged in from auth.json and a page with the timecard
+    form loaded, and serves login and submit requests from punch on a Unix socket.
+    Playwright's sync API is bound to one thread, so requests are handled one at a time;
+    the form is loaded again after each request, outside of the client's time.
+    auth.json is loaded again when it changes, e.g. after a punch login without the daemon.
+    """
+    def __init__(self, config, headless=True, verbose=False, path=None):
+        self.config = config
+        self.headless = headless
+        self.verbose = verbose
+        self.path = path or get_socket_path()
+        self.console = Console()
+        self.browser = None
+        self.context = None
+        self.page = None
+        self.auth_mtime = None
+        self.ready = False
+
+    def serve(self):
+        """
+        Runs until a stop request or an exception, such as KeyboardInterrupt.
+        """
+        if connect(self.path) is not None:
+            raise BrowserdError(f"punch browserd is already running on {self.path}")
+        if os.path.exists(self.path):
+            # Left behind by a daemon that did not exit cleanly
+            os.unlink(self.path)
+        with sync_playwright() as p:
+            self.browser = p.firefox.launch(headless=self.headless)
+            try:
+                self._load_auth()
+                self._prepare()
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+                    old_umask = os.umask(0o177)  # The socket gives access to the logged in session
+                    try:
+                        server.bind(self.path)
+                    finally:
+                        os.umask(old_umask)
+                    try:
+                        server.listen()
+                        server.settimeout(BROWSERD_REFRESH)
+                        self.console.print(f"[green]punch browserd listening on {self.path}[/green]")
+                        self._serve_forever(server)
+                    finally:
+                        os.unlink(self.path)
+            finally:
+                self.browser.close()
+
+    def _serve_forever(self, server):
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                self.ready = False
+                self._prepare()
+                continue
+            with conn:
+                stop = self._handle(conn)
+            if stop:
+                return
+            self._prepare()
+
+    def _handle(self, conn):
+        """
+        Answers one request, returning True if the daemon should stop.
+        """
+        conn.settimeout(None)
+        replies = conn.makefile("w", encoding="utf-8")
+        try:
+            request = json.loads(conn.makefile("r", encoding="utf-8").readline())
+            op = request.pop("op")
+            if self.verbose:
+                self.console.print(f"[cyan]Request: {op}[/cyan]")
+            handler = getattr(self, f"_op_{op}", None)
+            if handler is None:
+                raise BrowserdError(f"Unknown request: {op}")
+            for message in handler(**request):
+                replies.write(json.dumps(message) + "\n")
+                replies.flush()
+            return op == "stop"
+        except Exception as e:
+            self.ready = False
+            if self.verbose:
+                self.console.print(f"[red]Request failed: {e}[/red]")
+            try:
+                replies.write(json.dumps({"error": f"{type(e).__name__}: {e}"}) + "\n")
+                replies.flush()
+            except OSError:
+                pass  # The client is gone
+            return False
+        finally:
+            try:
+                replies.close()
+            except OSError:
+                pass
+
+    def _load_auth(self):
+        """
+        Opens a new context from auth.json if it changed since it was last loaded.
+        """
+        auth_json_path = web.get_auth_json_path()
+        try:
+            mtime = os.stat(auth_json_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self.auth_mtime and self.page is not None and not self.page.is_closed():
+            return
+        if self.context is not None:
+            self.context.close()
+        self.context = self.browser.new_context(storage_state=auth_json_path)
+        self.page = self.context.new_page()
+        if self.verbose:
+            self.page.on("request", web.log_redirects)
+        self.auth_mtime = mtime
+        self.ready = False
+
+    def _prepare(self):
+        """
+        Loads the timecard form for the next request, if it is not loaded already.
+        """
+        if self.ready or self.context is None:
+            return
+        try:
+            self._load_auth()
+            web._reload_timecards(self.console, self.page, self.config)
+            self.ready = True
+        except (playwright_error, TimeoutError, web.MissingTimecardsUrl) as e:
+            if self.verbose:
+                self.console.print(f"[yellow]Could not load the timecard form: {e}[/yellow]")
+
+    def _op_ping(self):
+        yield {"event": "done", "headless": self.headless, "pid": os.getpid()}
+
+    def _op_stop(self):
+        yield {"event": "done"}
+
+    def _op_login(self, config):
+        if self.headless:
+            raise BrowserdError("punch browserd runs headless and cannot show the login page")
+        self.config = config
+        timecards_link = web.get_timecards_link(config)
+        auth_json_path = web.get_auth_json_path()
+        context = self.browser.new_context(storage_state=auth_json_path if os.path.exists(auth_json_path) else None)
+        page = context.new_page()
+        page.goto(timecards_link)
+        yield {"event": "waiting", "url": timecards_link}
+        page.wait_for_url(timecards_link, timeout=0)
+        context.storage_state(path=auth_json_path)
+        if self.context is not None:
+            self.context.close()
+        self.context, self.page = context, page
+        self.auth_mtime = os.stat(auth_json_path).st_mtime_ns
+        self.ready = True
+        yield {"event": "done"}
+
+    def _op_submit(self, config, timecards, dry_run=False, sleep=0.0):
+        self.config = config
+        self._load_auth()
+        if self.context is None:
+            raise web.AuthFileNotFoundError("Auth file not found. Please login first using the 'login' command.")
+        if not self.ready:
+            web._reload_timecards(self.console, self.page, config)
+        self.ready = False
+        for idx, data in enumerate(timecards):
+            timecard = _timecard_from_json(data)
+            start = time.perf_counter()
+            web._fill_single_entry(config, self.page, timecard, False)
+            yield {"event": "filled", "idx": idx}
+            web._finish_entry(self.console, self.page, config, False, dry_run, sleep)
+            yield {"event": "saved", "idx": idx, "latency": time.perf_counter() - start - sleep}
+        # Save & New, or the reload of a dry run, left an empty form open
+        self.ready = True
+        yield {"event": "done"}
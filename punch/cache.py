@@ -0,0 +1,164 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+# Bump whenever the pickled state layout changes so stale caches are ignored.
+CACHE_VERSION = 1
+
+# Bump whenever the layout of the daily rollups changes.
+ROLLUP_VERSION = 1
+
+# Number of bytes before the cached offset that are fingerprinted to detect
+# in-place edits of the already parsed part of the log. Editors and punch's own
+# rewrites that write a new file are caught by the inode changing, but an edit made
+# in place further back than this, keeping the length of the file, followed by an
+# append, goes unnoticed: delete the .cache file next to the log and run
+# punch rollup rebuild after one.
+TAIL_DIGEST_BYTES = 4096
+
+def get_cache_path(taskfile):
+    """
+    Returns the path of the parsed tasklog cache that belongs to taskfile.
+    The cache lives next to the task log as a hidden file.
+    """
+    taskfile = os.path.abspath(taskfile)
+    return os.path.join(os.path.dirname(taskfile), f".{os.path.basename(taskfile)}.cache")
+
+def tail_digest(f, offset):
+    """
+    Returns a digest of up to TAIL_DIGEST_BYTES bytes preceding offset in the binary file f.
+    """
+    start = max(0, offset - TAIL_DIGEST_BYTES)
+    f.seek(start)
+    return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+def file_id(st):
+    """
+    Returns the (device, inode) of an os.stat_result, which changes when a file is replaced by a new one.
+    """
+    return st.st_dev, st.st_ino
+
+def load_cache(taskfile, f, st):
+    """
+    Loads the cached parse state of taskfile, if it is still usable.
+    f is the task log opened in binary mode and st its os.stat_result.
+    Returns the cached state when the file is unchanged or has only been appended to
+    since the last parse, None when the log must be re-parsed from the beginning.
+    See TAIL_DIGEST_BYTES for the edits that are not detected.
+    """
+    try:
+        with open(get_cache_path(taskfile), 'rb') as cf:
+            cached = pickle.load(cf)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("version") != CACHE_VERSION:
+        return None
+
+    state = cached["state"]
+    # Replaced by a new file, e.g. saved by an editor
+    if cached.get("file_id") != file_id(st):
+        return None
+    if st.st_size == cached["size"] and st.st_mtime_ns == cached["mtime_ns"]:
+        return state
+    # Anything other than a pure append (shrunk, rewritten in place) needs a full re-parse
+    if st.st_size <= state.offset:
+        return None
+    if tail_digest(f, state.offset) != cached["tail_digest"]:
+        return None
+    return state
+
+def save_cache(taskfile, f, st, state):
+    """
+    Atomically stores the parse state of taskfile together with the inode, size, mtime
+    and tail digest of the file it was computed from.
+    Failing to write the cache is not an error, the next run simply re-parses the log.
+    """
+    cached = {
+        "version": CACHE_VERSION,
+        "file_id": file_id(st),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "tail_digest": tail_digest(f, state.offset),
+        "state": state,
+    }
+    _dump_atomic(get_cache_path(taskfile), cached)
+
+def invalidate_cache(taskfile):
+    """
+    Removes the parse cache of taskfile, forcing the next read to re-parse the whole log.
+    """
+    try:
+        os.unlink(get_cache_path(taskfile))
+    except FileNotFoundError:
+        pass
+
+def get_rollup_path(taskfile):
+    """
+    Returns the path of the daily rollup of taskfile, a hidden file next to it like the parse cache.
+    """
+    taskfile = os.path.abspath(taskfile)
+    return os.path.join(os.path.dirname(taskfile), f".{os.path.basename(taskfile)}.rollup")
+
+def load_rollup(taskfile):
+    """
+    Returns the stored daily rollup of a task log file (see punch.rollup), or None if there is
+    no usable one: {"version", "offset", "file_id", "tail_digest", "days"}, where days maps each
+    datetime.date to {(category, task): [minutes, count, min minutes, max minutes]}
+    and offset is where the next refresh resumes parsing.
+    """
+    try:
+        with open(get_rollup_path(taskfile), 'rb') as rf:
+            rollup = pickle.load(rf)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError):
+        return None
+    if not isinstance(rollup, dict) or rollup.get("version") != ROLLUP_VERSION:
+        return None
+    return rollup
+
+def save_rollup(taskfile, rollup):
+    """
+    Atomically stores the daily rollup of a task log file. Failing to write it is not an error.
+    """
+    _dump_atomic(get_rollup_path(taskfile), dict(rollup, version=ROLLUP_VERSION))
+
+def trim_rollup(taskfile, f, day, day_offset):
+    """
+    Cuts the stored rollup of a text log file back to the days before day, whose first line
+    is at day_offset in the binary file f, so that a rewrite of the file from there on is picked up
+    by the next refresh. Writers call it holding the exclusive lock, before the rewrite.
+    """
+    rollup = load_rollup(taskfile)
+    if rollup is None or rollup["offset"] < day_offset:
+        return
+    rollup = {
+        "offset": day_offset,
+        "file_id": file_id(os.fstat(f.fileno())),
+        "tail_digest": tail_digest(f, day_offset),
+        "days": {d: totals for d, totals in rollup["days"].items() if d < day},
+    }
+    save_rollup(taskfile, rollup)
+
+def invalidate_rollup(taskfile):
+    """
+    Removes the daily rollup of taskfile, forcing the next refresh to rebuild it.
+    """
+    try:
+        os.unlink(get_rollup_path(taskfile))
+    except FileNotFoundError:
+        pass
+
+def _dump_atomic(path, obj):
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".punch-cache-")
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, 'wb') as cf:
+            pickle.dump(obj, cf, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
@@ -1,19 +1,34 @@
-from datetime import datetime, timedelta
+from contextlib import contextmanager
+from datetime import datetime
 import os
 import re
+import shlex
+import shutil
+import signal
+import subprocess
 import sys
 from rich.console import Console
-from rich.tree import Tree
+from rich.markup import escape
 from rich.syntax import Syntax
 import yaml
 
 from playwright.sync_api import TimeoutError
 
-from punch.config import set_config_value
-from punch.export import export_csv, export_json
-from punch.report import generate_report
-from punch.tasks import CMDLINE_SEPARATOR, TaskEntry, parse_new_task_string, write_task
-from punch.web import DRY_RUN_SUFFIX, AuthFileNotFoundError, MissingTimecardsUrl, NoCaseMappingError, get_timecards, login_to_site, submit_timecards
+from punch.archive import archive_tasklog, get_archive_path, get_index_path, has_archive
+from punch.backends import DEFAULT_BACKEND, open_backend
+from punch.browserd import BrowserDaemon, BrowserdError, connect
+from punch.config import SQLITE_TASKS_FILE, TEXT_TASKS_FILE, set_config_value
+from punch.export import EXPORT_FORMATS, open_export_output, write_export, write_export_since
+from punch.importer import import_entries, parse_import
+from punch.parallel import can_parse_in_parallel, read_tasklog_parallel, should_parse_in_parallel
+from punch.report import aggregate, iter_report
+from punch.rollup import rebuild_rollups, verify_rollups
+from punch.segments import get_segment_dir, is_segmented, segment_tasklog, verify_manifest
+from punch.submissions import open_journal
+from punch.storage import TextStorage, export_sqlite_to_text, migrate_text_to_sqlite, open_storage
+from punch.tasklog import TaskLog
+from punch.tasks import CMDLINE_SEPARATOR, TaskEntry, format_task_line, parse_new_task_string
+from punch.web import DRY_RUN_SUFFIX, SUBMIT_WORKERS, AuthFileNotFoundError, MissingTimecardsUrl, NoCaseMappingError, get_timecards, login_to_site
 
     
 def time_to_current_datetime(time_str: str) -> datetime:
@@ -185,7 +200,7 @@ def run_config_wizard(config, config_path):
 
 def handle_start(args, tasks_file):
     start_dt = args.time
-    write_task(tasks_file, "", "start", "", start_dt)
+    open_storage(tasks_file).append("", "start", "", start_dt)
 
 def handle_help(parser):
     parser.print_help()
@@ -198,99 +213,256 @@ def get_category_by_short(categories, arg_str):
 
 def handle_add(_args, task: TaskEntry, tasks_file, console):
     try:
-        write_task(tasks_file, task.category, task.task, task.notes, task.finish)
+        open_storage(tasks_file).append(task.category, task.task, task.notes, task.finish)
         console.print(f"✓ Task logged: {task.category} : {task.task} : {task.notes}", style="bold green")
     except ValueError as e:
         console.print(f"✗ Error saving task: {e}", style="bold red")
         sys.exit(1)
 
-def print_report(report):
+def handle_undo(args, tasks_file, console):
     """
-    Pretty-print the report dictionary using a rich Tree.
-    The report dict should be in the format:
-      {category: {"tasks": [(task, duration)], "total": timedelta}} if collapsed,
-      or {category: {"tasks": [(task, notes, duration)], "total": timedelta}} if not collapsed.
-    Also prints the sum of all durations at the bottom.
+    Remove the last args.count entries of the task log.
     """
-    console = Console()
-    tree = Tree("Task Report")
+    try:
+        removed = open_storage(tasks_file).remove_last(args.count)
+    except ValueError as e:
+        console.print(f"[red]Error undoing entries: {e}[/red]")
+        sys.exit(1)
+    console.print(f"[bold green]Removed {len(removed)} entries:[/bold green]")
+    for entry in removed:
+        console.print(format_task_line(entry.finish, entry.category, entry.task, entry.notes), end="", markup=False)
 
-    # Find max length for left part (task or task | notes)
-    max_left_len = 0
-    for cat_data in report.values():
-        for entry in cat_data["tasks"]:
-            if len(entry) == 2:
-                task = entry[0]
-                left = f"{task}"
-            elif len(entry) == 3:
-                task, notes, _ = entry
-                left = f"{task}"
-                if notes:
-                    left += f" | {notes}"
-            max_left_len = max(max_left_len, len(left))
+def handle_amend(args, tasks_file, console):
+    """
+    Change the last entry of the task log: args.task (a TaskEntry parsed from the command line)
+    replaces its category, task and notes, args.notes only its notes and args.time its finish time.
+    """
+    task = args.task
+    try:
+        old, new = open_storage(tasks_file).amend_last(
+            category=task.category if task else None,
+            task=task.task if task else None,
+            notes=args.notes if args.notes is not None else (task.notes if task else None),
+            time=args.time,
+        )
+    except ValueError as e:
+        console.print(f"[red]Error amending entry: {e}[/red]")
+        sys.exit(1)
+    console.print(f"✓ Task amended: {new.category} : {new.task} : {new.notes}", style="bold green")
+    if args.verbose:
+        console.print("was: " + format_task_line(old.finish, old.category, old.task, old.notes), end="", markup=False)
+        console.print("now: " + format_task_line(new.finish, new.category, new.task, new.notes), end="", markup=False)
 
-    total_duration = timedelta(0)
+# Width of the task (and notes) column of printed reports, longer names are truncated
+REPORT_COLUMN_WIDTH = 48
 
-    for category, cat_data in report.items():
-        # Format category total
-        cat_total = cat_data["total"]
+def print_report(report, console=None, plain=False, width=REPORT_COLUMN_WIDTH):
+    """
+    Print a report as a tree, one line at a time as its categories arrive.
+    report is the dict of generate_report or the (category, tasks, total) tuples of iter_report:
+      tasks are [(task, duration)] if collapsed, or [(task, notes, duration)] if not collapsed.
+    The task (and notes) column is padded or truncated to width, so durations line up without
+    scanning the whole report first. Also prints the sum of all durations at the bottom.
+    With plain, prints tab-separated category, task, [notes,] minutes lines instead,
+    with no markup and no totals.
+    """
+    console = console or Console()
+    if isinstance(report, dict):
+        report = ((category, cat_data["tasks"], cat_data["total"]) for category, cat_data in report.items())
+
+    if plain:
+        out = console.file
+        for category, tasks, _ in report:
+            for *fields, duration in tasks:
+                minutes = int(duration.total_seconds() // 60)
+                out.write("\t".join(_tsv_field(field) for field in (category, *fields, minutes)) + "\n")
+        return
+
+    def line(text):
+        console.print(text, highlight=False, soft_wrap=True)
+
+    line("Task Report")
+    total_minutes = 0
+    for category, tasks, cat_total in report:
         cat_total_mins = int(cat_total.total_seconds() // 60)
-        cat_hours = int(cat_total.total_seconds() // 3600)
-        cat_mins = int((cat_total.total_seconds() % 3600) // 60)
-        cat_total_str = f"{cat_hours}:{cat_mins:02d}"
-        cat_node = tree.add(f"[bold]{category}[/bold] [dim]{cat_total_str} ({cat_total_mins} min)[/dim]")
-        
-        for entry in cat_data["tasks"]:
+        line(f"├── [bold]{escape(category)}[/bold] [dim]{format_minutes(cat_total_mins)} ({cat_total_mins} min)[/dim]")
+        for idx, entry in enumerate(tasks):
             if len(entry) == 2:
                 # collapsed: (task, duration)
                 task, duration = entry
-                minutes = int(duration.total_seconds() // 60)
                 left = f"{task}"
-            elif len(entry) == 3:
+            else:
                 # not collapsed: (task, notes, duration)
                 task, notes, duration = entry
-                minutes = int(duration.total_seconds() // 60)
                 left = f"{task}"
                 if notes:
                     left += f" | {notes}"
-            # Pad left part so all durations align
+            minutes = int(duration.total_seconds() // 60)
+            guide = "└──" if idx == len(tasks) - 1 else "├──"
             # Format duration as H:MM (no seconds, no days)
-            hours = int(duration.total_seconds() // 3600)
-            minutes = int((duration.total_seconds() % 3600) // 60)
-            duration_str = f"{hours}:{minutes:02d}"
-            line = f"{left.ljust(max_left_len)} {duration_str.rjust(10)} ({minutes + hours*60} min)"
-            cat_node.add(line)
-            total_duration += duration
-
-    total_minutes = int(total_duration.total_seconds() // 60)
-    total_hours = int(total_duration.total_seconds() // 3600)
-    remainder_minutes = total_minutes % 60
+            line(f"│   {guide} {escape(_fit(left, width))} {format_minutes(minutes).rjust(10)} ({minutes} min)")
+        total_minutes += cat_total_mins
+
     # Print total as H:MM (not days)
-    total_str = f"{total_hours}:{remainder_minutes:02d}"
-    tree.add(f"[bold yellow]Total: {total_str.rjust(max_left_len+8)} ({total_minutes} min)[/bold yellow]")
+    line(f"└── [bold yellow]Total: {format_minutes(total_minutes).rjust(width + 8)} ({total_minutes} min)[/bold yellow]")
+
+def _fit(text, width):
+    """
+    Pads text to width, or truncates it with an ellipsis.
+    """
+    if len(text) > width:
+        return text[:width - 1] + "…"
+    return text.ljust(width)
 
-    console.print(tree)
+def _tsv_field(value):
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+@contextmanager
+def paged_console(enabled=True):
+    """
+    Yields a Console writing through $PAGER (less -FRX by default, which exits straight away
+    when the output fits on the screen) if enabled and stdout is a TTY, or to stdout otherwise.
+    Lines reach the pager as they are printed. Quitting the pager early ends the output quietly.
+    """
+    pager = None
+    if enabled and sys.stdout.isatty():
+        try:
+            pager = subprocess.Popen(
+                shlex.split(os.environ.get("PAGER") or "less -FRX"), stdin=subprocess.PIPE, text=True,
+            )
+        except OSError:
+            pager = None
+    if pager is None:
+        yield Console()
+        return
+    try:
+        yield Console(file=pager.stdin, force_terminal=True, width=shutil.get_terminal_size().columns)
+        pager.stdin.close()
+    except BrokenPipeError:
+        pass
+    finally:
+        try:
+            pager.stdin.close()
+        except BrokenPipeError:
+            pass
+        pager.wait()
+
+def format_minutes(minutes):
+    """
+    Formats a number of minutes as H:MM (no days).
+    """
+    return f"{minutes // 60}:{minutes % 60:02d}"
+
+def print_aggregate(groups, by, metrics, plain=False):
+    """
+    Print the result of punch.report.aggregate as a table: one column per grouping field
+    and per metric, minutes shown as H:MM, with the sum and count totals at the bottom.
+    With plain, prints tab-separated lines of the fields and metrics instead, minutes as numbers.
+    """
+    from rich.table import Table
+
+    if plain:
+        for key, values in groups.items():
+            sys.stdout.write("\t".join(_tsv_field(value) for value in (*key, *(values[m] for m in metrics))) + "\n")
+        return
+
+    table = Table(title="Task Report")
+    for field in by:
+        table.add_column(field.capitalize())
+    for metric in metrics:
+        table.add_column(metric.capitalize(), justify="right")
+
+    def cell(value):
+        if isinstance(value, bool):
+            return "yes" if value else "no"
+        return str(value)
+
+    for key, values in groups.items():
+        table.add_row(*[cell(value) for value in key], *[
+            str(values[metric]) if metric == "count" else format_minutes(values[metric]) for metric in metrics
+        ])
+    if groups:
+        totals = []
+        for metric in metrics:
+            if metric == "sum":
+                totals.append(format_minutes(sum(values["sum"] for values in groups.values())))
+            elif metric == "count":
+                totals.append(str(sum(values["count"] for values in groups.values())))
+            else:
+                totals.append("")
+        table.add_row(*(["[bold yellow]Total[/bold yellow]"] + [""] * (len(by) - 1)), *totals, style="bold yellow")
+    Console().print(table)
+
+def load_range(args, tasks_file):
+    """
+    Returns what export, and report with --parallel, read the entries from: the task file itself,
+    or a TaskLog parsed by several processes. args.parallel forces either, by default the processes
+    are only used when the date range covers a large part of the text log. On a single core the
+    entries are always read sequentially.
+    """
+    if not isinstance(open_storage(tasks_file), TextStorage):
+        return tasks_file
+    parallel = getattr(args, 'parallel', None)
+    if parallel is None:
+        parallel = should_parse_in_parallel(tasks_file, getattr(args, 'from_'), args.to)
+    if not parallel or not can_parse_in_parallel():
+        return tasks_file
+    return TaskLog.from_entries(read_tasklog_parallel(tasks_file, getattr(args, 'from_'), args.to))
 
 def handle_report(args, tasks_file, console):
-    console.print(f"From: {getattr(args, 'from_')} To: {args.to}", style="bold blue")
+    plain = getattr(args, 'plain', False)
+    header = f"From: {getattr(args, 'from_')} To: {args.to}"
+    # Reports on the text log sum its daily rollups, only --parallel parses the entries instead
+    source = load_range(args, tasks_file) if getattr(args, 'parallel', None) else tasks_file
     try:
-        report = generate_report(tasks_file, getattr(args, 'from_'), args.to)
-        print_report(report)
+        if getattr(args, 'by', None):
+            if not plain:
+                console.print(header, style="bold blue")
+            metrics = getattr(args, 'metrics', None) or ["sum"]
+            groups = aggregate(source, getattr(args, 'from_'), args.to, args.by, metrics)
+            print_aggregate(groups, args.by, metrics, plain=plain)
+            return
+        report = iter_report(source, getattr(args, 'from_'), args.to, getattr(args, 'collapse', True))
+        with paged_console(enabled=not plain) as out:
+            if not plain:
+                out.print(header, style="bold blue")
+            print_report(report, out, plain)
     except ValueError as e:
         console.print(f"Error generating report: {e}", style="bold red")
 
 def handle_export(args, tasks_file, console):
-    exported_content = None
-    if args.format == "json":
-        exported_content = export_json(tasks_file, getattr(args, 'from_'), args.to)
-    elif args.format == "csv":
-        exported_content = export_csv(tasks_file, getattr(args, 'from_'), args.to)
+    """
+    Streams the export straight to args.output, or stdout, without going through rich.
+    Ranges covering a large part of the text log are parsed by several processes into memory
+    (see load_range), any other export uses constant memory. With args.since_last only the entries
+    added since the previous export with that watermark name are written.
+    """
+    if args.format not in EXPORT_FORMATS:
+        console.print(f"[red]Unsupported export format: {args.format} (use {', '.join(EXPORT_FORMATS)})[/red]")
+        sys.exit(1)
+    since_last = getattr(args, 'since_last', None)
+    if since_last and not isinstance(open_storage(tasks_file), TextStorage):
+        console.print("[red]--since-last needs the text task log.[/red]")
+        sys.exit(1)
+    source = tasks_file if since_last else load_range(args, tasks_file)
+    compress = getattr(args, 'gzip', False) or (args.output or "").endswith(".gz")
+    rewritten = False
+    try:
+        with open_export_output(args.output, compress) as out:
+            if since_last:
+                count, rewritten = write_export_since(out, tasks_file, since_last, args.format)
+            else:
+                count = write_export(out, source, getattr(args, 'from_'), args.to, args.format)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]Error exporting entries: {e}[/red]")
+        sys.exit(1)
+    if rewritten:
+        Console(stderr=True).print(
+            f"[yellow]The task log was changed before the '{since_last}' watermark, "
+            "only entries finished after it were exported.[/yellow]"
+        )
     if args.output:
-        with open(args.output, "w") as f:
-            f.write(exported_content)
-        console.print(f"Exported to {args.output}", style="bold green")
-    else:
-        console.print(exported_content)
+        console.print(f"Exported {count} entries to {args.output}", style="bold green")
 
 def handle_login(args, config, console):
     try:
@@ -299,6 +471,41 @@ def handle_login(args, config, console):
         console.print(f"[red]{e}[/red]")
         sys.exit(1)
 
+def handle_browserd(args, config, console):
+    """
+    Runs punch browserd in the foreground, or reports on or stops the running one.
+    """
+    daemon = connect()
+    if args.status or args.stop:
+        if daemon is None:
+            console.print("punch browserd is not running.", style="bold yellow")
+            if args.stop:
+                return
+            sys.exit(1)
+        mode = "headless" if daemon.headless else "headed"
+        if args.stop:
+            daemon.stop()
+            console.print(f"Stopped punch browserd (pid {daemon.pid}).", style="bold green")
+        else:
+            console.print(f"punch browserd is running {mode} (pid {daemon.pid}) on {daemon.path}.", style="bold green")
+        return
+    if daemon is not None:
+        console.print(f"[red]punch browserd is already running (pid {daemon.pid}).[/red]")
+        sys.exit(1)
+
+    def stop(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        BrowserDaemon(config, headless=not args.headed, verbose=args.verbose).serve()
+    except BrowserdError as e:
+        console.print(f"[red]{e}[/red]")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+    console.print("punch browserd stopped.", style="bold yellow")
+
 def show_timecards_table(timecards):
     """
     Display the timecards in a table format using rich.
@@ -340,6 +547,20 @@ def handle_submit(args, config, tasks_file, console):
         if args.interactive:
             args.headed = True  # --interactive implies --headed
 
+        try:
+            backend = open_backend(
+                getattr(args, 'backend', None) or config.get("submit_backend", DEFAULT_BACKEND),
+                config,
+                headless=not args.headed,
+                interactive=args.interactive,
+                verbose=args.verbose,
+                sleep=args.sleep,
+                workers=getattr(args, 'workers', None) or config.get("submit_workers", SUBMIT_WORKERS),
+            )
+        except ValueError as e:
+            console.print(f"[red]{e}[/red]")
+            sys.exit(1)
+
         timecards = []
         try:
             timecards = get_timecards(config, tasks_file, getattr(args, 'from_'), args.to)
@@ -353,6 +574,20 @@ def handle_submit(args, config, tasks_file, console):
         if not timecards or len(timecards) == 0:
             console.print("No timecards found for submission.", style="bold red")
             return
+
+        # Timecards saved by an earlier, possibly interrupted, submission are skipped
+        journal = open_journal(os.path.dirname(os.path.abspath(tasks_file)))
+        if not getattr(args, 'force', False):
+            pending = journal.pending(timecards)
+            if len(pending) < len(timecards):
+                console.print(
+                    f"[yellow]Skipping {len(timecards) - len(pending)} timecards already submitted "
+                    "(use --force to submit them again).[/yellow]"
+                )
+            if not pending:
+                console.print("All timecards have already been submitted.", style="bold green")
+                return
+            timecards = pending
         show_timecards_table(timecards)
         
         suffix = DRY_RUN_SUFFIX if args.dry_run else ""
@@ -361,15 +596,7 @@ def handle_submit(args, config, tasks_file, console):
             console.print("Submission cancelled.", style="bold yellow")
             return
 
-        submit_timecards(
-            config,
-            timecards,
-            headless=not args.headed,
-            interactive=args.interactive,
-            dry_run=args.dry_run,
-            verbose=args.verbose,
-            sleep=args.sleep
-        )
+        backend.submit(timecards, dry_run=args.dry_run, journal=journal)
 
     except TimeoutError:
         console.print("[red]Submission timed out. Please retry logging in with `punch login`[/red]")
@@ -377,4 +604,178 @@ def handle_submit(args, config, tasks_file, console):
 
     except MissingTimecardsUrl as e:
         console.print(f"[red]{e}[/red]")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
+
+def handle_db_migrate(args, data_dir, console):
+    """
+    Bulk-load the text task log into a SQLite database, which is used from then on.
+    The text log, with its archive if it has one, is kept as a backup next to the database;
+    a segmented log keeps its segment directory, manifest included.
+    """
+    text_path = os.path.join(data_dir, TEXT_TASKS_FILE)
+    db_path = os.path.join(data_dir, SQLITE_TASKS_FILE)
+    if os.path.exists(db_path):
+        console.print(f"[red]Task database already exists: {db_path}[/red]")
+        sys.exit(1)
+    if not os.path.exists(text_path) and not is_segmented(text_path):
+        console.print(f"[red]Task log not found: {text_path}[/red]")
+        sys.exit(1)
+    try:
+        count = migrate_text_to_sqlite(text_path, db_path)
+    except ValueError as e:
+        console.print(f"[red]Error migrating task log: {e}[/red]")
+        sys.exit(1)
+    backup_paths = _move_aside(
+        text_path, get_segment_dir(text_path), get_archive_path(text_path), get_index_path(get_archive_path(text_path)),
+    )
+    console.print(f"[bold green]Migrated {count} entries to {db_path}[/bold green]")
+    console.print(f"The text task log was kept as {', '.join(backup_paths)}")
+
+def _move_aside(*paths):
+    """
+    Renames the paths that exist to path + '.bak', returning the new names.
+    """
+    backup_paths = []
+    for path in paths:
+        if os.path.exists(path):
+            os.replace(path, path + ".bak")
+            backup_paths.append(path + ".bak")
+    return backup_paths
+
+def handle_db_export_text(args, data_dir, console):
+    """
+    Write the SQLite task database back to a text task log.
+    Without an output file, switch back to the text log and keep the database as a backup.
+    """
+    db_path = os.path.join(data_dir, SQLITE_TASKS_FILE)
+    if not os.path.exists(db_path):
+        console.print(f"[red]Task database not found: {db_path}[/red]")
+        sys.exit(1)
+    text_path = args.output or os.path.join(data_dir, TEXT_TASKS_FILE)
+    if has_archive(text_path):
+        # The archive would be read back in front of entries the database already holds
+        console.print(f"[red]{text_path} already has an archive: {get_archive_path(text_path)}[/red]")
+        sys.exit(1)
+    if is_segmented(text_path):
+        console.print(f"[red]{text_path} is already segmented: {get_segment_dir(text_path)}[/red]")
+        sys.exit(1)
+    try:
+        count = export_sqlite_to_text(db_path, text_path)
+    except FileExistsError:
+        console.print(f"[red]File already exists: {text_path}[/red]")
+        sys.exit(1)
+    console.print(f"[bold green]Exported {count} entries to {text_path}[/bold green]")
+    if not args.output:
+        backup_path = db_path + ".bak"
+        os.replace(db_path, backup_path)
+        console.print(f"The task database was kept as {backup_path}")
+
+def handle_log_segment(args, tasks_file, console):
+    """
+    Split the monolithic text task log into monthly segments with a manifest.
+    """
+    if not isinstance(open_storage(tasks_file), TextStorage):
+        console.print("[red]Only the text task log can be segmented.[/red]")
+        sys.exit(1)
+    if is_segmented(tasks_file):
+        console.print("[yellow]The task log is already segmented.[/yellow]")
+        return
+    if not os.path.exists(tasks_file):
+        console.print(f"[red]Task log not found: {tasks_file}[/red]")
+        sys.exit(1)
+    try:
+        manifest = segment_tasklog(tasks_file)
+    except (ValueError, FileExistsError) as e:
+        console.print(f"[red]Error segmenting task log: {e}[/red]")
+        sys.exit(1)
+    lines = sum(segment["lines"] for segment in manifest["segments"])
+    console.print(f"[bold green]Split {lines} entries into {len(manifest['segments'])} monthly segments.[/bold green]")
+    console.print(f"The original task log was kept as {tasks_file}.bak")
+
+def handle_log_verify(args, tasks_file, console):
+    """
+    Check the segments of a segmented task log against its manifest.
+    """
+    if not is_segmented(tasks_file):
+        console.print("[yellow]The task log is not segmented.[/yellow]")
+        return
+    problems = verify_manifest(tasks_file)
+    if problems:
+        for problem in problems:
+            console.print(f"[red]{problem}[/red]")
+        sys.exit(1)
+    console.print("[bold green]All segments match the manifest.[/bold green]")
+
+def handle_rollup_verify(args, tasks_file, console):
+    """
+    Compare the daily rollups of the text task log with a full recompute.
+    """
+    if not isinstance(open_storage(tasks_file), TextStorage):
+        console.print("[yellow]Only the text task log has rollups.[/yellow]")
+        return
+    try:
+        problems = verify_rollups(tasks_file)
+    except ValueError as e:
+        console.print(f"[red]Error reading task log: {e}[/red]")
+        sys.exit(1)
+    if problems:
+        for problem in problems:
+            console.print(f"[red]{problem}[/red]")
+        console.print("Run 'punch rollup rebuild' to recompute them.")
+        sys.exit(1)
+    console.print("[bold green]The daily rollups match the task log.[/bold green]")
+
+def handle_rollup_rebuild(args, tasks_file, console):
+    """
+    Recompute the daily rollups of the text task log from scratch.
+    """
+    if not isinstance(open_storage(tasks_file), TextStorage):
+        console.print("[yellow]Only the text task log has rollups.[/yellow]")
+        return
+    try:
+        days = rebuild_rollups(tasks_file)
+    except ValueError as e:
+        console.print(f"[red]Error reading task log: {e}[/red]")
+        sys.exit(1)
+    console.print(f"[bold green]Rolled up {days} days.[/bold green]")
+
+def handle_archive(args, tasks_file, console):
+    """
+    Move the entries finished before args.before into the compressed archive of the task log.
+    """
+    if not isinstance(open_storage(tasks_file), TextStorage):
+        console.print("[red]Only the text task log can be archived.[/red]")
+        sys.exit(1)
+    if not os.path.exists(tasks_file):
+        console.print(f"[red]Task log not found: {tasks_file}[/red]")
+        sys.exit(1)
+    try:
+        count = archive_tasklog(tasks_file, args.before)
+    except ValueError as e:
+        console.print(f"[red]Error archiving task log: {e}[/red]")
+        sys.exit(1)
+    if count == 0:
+        console.print(f"[yellow]No entries before {args.before} to archive.[/yellow]")
+        return
+    console.print(f"[bold green]Archived {count} entries finished before {args.before} to {get_archive_path(tasks_file)}.[/bold green]")
+
+def handle_import(args, config, tasks_file, console):
+    """
+    Import entries from args.input (a file, or stdin for '-') into the task storage in one pass.
+    """
+    try:
+        if args.input == "-":
+            entries = parse_import(sys.stdin, args.format)
+        else:
+            with open(args.input, "r", newline="") as f:
+                entries = parse_import(f, args.format)
+        planned = import_entries(tasks_file, entries, config.get("categories") or None, dry_run=args.dry_run)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]Error importing entries: {e}[/red]")
+        sys.exit(1)
+    suffix = DRY_RUN_SUFFIX if args.dry_run else ""
+    added = len(planned) - len(entries)
+    console.print(f"[bold green]Imported {len(entries)} entries ({added} start/break entries added){suffix}.[/bold green]")
+    if args.verbose:
+        for entry in planned:
+            console.print(format_task_line(entry.finish, entry.category, entry.task, entry.notes), end="", markup=False)
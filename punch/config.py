@@ -12,12 +12,23 @@ def get_config_path():
                  os.path.join(os.path.expanduser("~/.config"), "punch")
     return os.path.join(config_dir, "punch.yaml")
 
-def get_tasks_file():
+TEXT_TASKS_FILE = "tasks.txt"
+SQLITE_TASKS_FILE = "tasks.db"
+
+def get_data_dir():
     # Allow override with PUNCH_DATA_DIR, otherwise use ~/.local/share/punch
     data_dir = os.environ.get("PUNCH_DATA_DIR") or \
                os.path.join(os.path.expanduser("~/.local/share"), "punch")
     os.makedirs(data_dir, exist_ok=True)
-    return os.path.join(data_dir, "tasks.txt")
+    return data_dir
+
+def get_tasks_file():
+    # Once the task log has been migrated to SQLite (punch db migrate), use the database
+    data_dir = get_data_dir()
+    db_path = os.path.join(data_dir, SQLITE_TASKS_FILE)
+    if os.path.exists(db_path):
+        return db_path
+    return os.path.join(data_dir, TEXT_TASKS_FILE)
 
 def load_config(config_path):
     with open(config_path, "r") as f:
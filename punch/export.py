@@ -1,63 +1,166 @@
+from contextlib import contextmanager
 import csv
+import gzip
 import io
-import datetime
 import json
-from punch.tasks import read_tasklog
+import sys
+
+try:
+    import orjson
+except ImportError:  # optional, pip install punch[orjson]
+    orjson = None
+
+from punch.storage import open_storage
+from punch.tasklog import TaskLog
+from punch import vectorized
+from punch.watermarks import iter_since, load_watermarks, save_watermark
+
+EXPORT_FORMATS = ("json", "ndjson", "csv")
+EXPORT_FIELDS = ["category", "task", "notes", "finish", "duration_minutes"]
+
+# Rows encoded before each write, so small writes do not dominate (gzip compresses each write)
+WRITE_BATCH = 1024
 
 def export_json(tasks_file, date_from, date_to):
     """
     Export all tasks as a JSON string (list of dicts, one per entry) between date_from and date_to (inclusive).
     Skips tasks with duration 0 or ending with '**'.
     Each dict contains: category, task, notes, finish (ISO), duration_minutes (int).
+    tasks_file may be a path or a TaskLog.
     """
-    date_from_dt = datetime.datetime.combine(date_from, datetime.time.min)
-    date_to_dt = datetime.datetime.combine(date_to, datetime.time.max)
-
-    tasklog = read_tasklog(tasks_file)
-    exported = []
-    for entry in tasklog:
-        if not (date_from_dt <= entry.finish <= date_to_dt):
-            continue
-        if entry.duration.total_seconds() == 0:
-            continue
-        if entry.task.endswith("**"):
-            continue
-        exported.append({
-            "category": entry.category,
-            "task": entry.task,
-            "notes": entry.notes,
-            "finish": entry.finish.isoformat(),
-            "duration_minutes": int(entry.duration.total_seconds() // 60),
-        })
-    return json.dumps(exported, indent=2)
+    return _export_string(tasks_file, date_from, date_to, "json")
 
 def export_csv(tasks_file, date_from, date_to):
     """
     Export all tasks as CSV (one per entry) between date_from and date_to (inclusive).
     Skips tasks with duration 0 or ending with '**'.
     Columns: category, task, notes, finish (ISO), duration_minutes
+    tasks_file may be a path or a TaskLog.
     Returns the CSV as a string.
     """
-    date_from_dt = datetime.datetime.combine(date_from, datetime.time.min)
-    date_to_dt = datetime.datetime.combine(date_to, datetime.time.max)
-
-    tasklog = read_tasklog(tasks_file)
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["category", "task", "notes", "finish", "duration_minutes"])
-
-    for entry in tasklog:
-        if not (date_from_dt <= entry.finish <= date_to_dt):
-            continue
-        if entry.duration.total_seconds() == 0:
-            continue
-        if entry.task.endswith("**"):
-            continue
-        writer.writerow([
-            entry.category,
-            entry.task,
-            entry.notes,
-            entry.finish.isoformat(),
-            int(entry.duration.total_seconds() // 60)
-        ])
-    return output.getvalue()
\ No newline at end of file
+    return _export_string(tasks_file, date_from, date_to, "csv")
+
+def write_export(out, tasks_file, date_from, date_to, fmt="json"):
+    """
+    Streams the entries export_json and export_csv return to the binary stream out, one batch
+    of rows at a time, so memory does not grow with the date range.
+    fmt is one of EXPORT_FORMATS: json (an indented list, exactly as json.dumps(rows, indent=2)
+    writes it), ndjson (one compact UTF-8 object per line, encoded with orjson when it is
+    installed, with the same output as json) or csv.
+    Returns the number of entries written.
+    Raises ValueError on an unsupported format.
+    """
+    return _write_rows(out, _export_rows(tasks_file, date_from, date_to), fmt)
+
+def write_export_since(out, taskfile, name, fmt="json"):
+    """
+    Streams the entries added to the text task log since the export watermark name
+    (see punch.watermarks), every entry on the first run, like write_export.
+    The watermark is only moved past them once they have all been written.
+    Returns (number of entries written, True if the log was rewritten before the watermark).
+    """
+    watermark = load_watermarks(taskfile).get(name)
+    mark = {}
+    rows = (
+        (entry.category, entry.task, entry.notes, entry.finish, int(entry.duration.total_seconds() // 60))
+        for entry in iter_since(taskfile, watermark, mark)
+    )
+    count = _write_rows(out, rows, fmt)
+    out.flush()
+    rewritten = mark.pop("rewritten", False)
+    if mark:
+        save_watermark(taskfile, name, mark)
+    return count, rewritten
+
+def _write_rows(out, rows, fmt):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if fmt == "csv":
+        return _write_csv(out, rows)
+
+    count = 0
+    batch = []
+    if fmt == "json":
+        out.write(b"[")
+    for category, task, notes, finish, minutes in rows:
+        row = {
+            "category": category,
+            "task": task,
+            "notes": notes,
+            "finish": finish.isoformat(),
+            "duration_minutes": minutes,
+        }
+        if fmt == "json":
+            batch.append(b",\n  " if count else b"\n  ")
+            batch.append(json.dumps(row, indent=2).replace("\n", "\n  ").encode("ascii"))
+        else:
+            batch.append(_dumps(row) + b"\n")
+        count += 1
+        if count % WRITE_BATCH == 0:
+            out.write(b"".join(batch))
+            batch = []
+    out.write(b"".join(batch))
+    if fmt == "json":
+        out.write(b"\n]" if count else b"]")
+    return count
+
+@contextmanager
+def open_export_output(path=None, compress=False):
+    """
+    Yields the binary stream an export is written to: the file at path, or stdout if path is None,
+    gzip-compressed if compress.
+    """
+    f = open(path, "wb") if path is not None else None
+    out = f if f is not None else sys.stdout.buffer
+    try:
+        if compress:
+            with gzip.GzipFile(filename="", mode="wb", fileobj=out) as gz:
+                yield gz
+        else:
+            yield out
+    finally:
+        if f is not None:
+            f.close()
+        else:
+            out.flush()
+
+def _export_string(tasks_file, date_from, date_to, fmt):
+    out = io.BytesIO()
+    write_export(out, tasks_file, date_from, date_to, fmt)
+    return out.getvalue().decode("utf-8")
+
+def _write_csv(out, rows):
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(EXPORT_FIELDS)
+    count = 0
+    for category, task, notes, finish, minutes in rows:
+        writer.writerow([category, task, notes, finish.isoformat(), minutes])
+        count += 1
+    text.flush()
+    # Leave out open for the caller
+    text.detach()
+    return count
+
+def _dumps(obj):
+    """
+    Encodes obj as compact UTF-8 JSON.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def _export_rows(tasks_file, date_from, date_to):
+    """
+    Yields (category, task, notes, finish, duration_minutes) for the entries between date_from and date_to.
+    tasks_file may be a path or a TaskLog, whose columns are read without creating TaskEntry objects
+    (and filtered with NumPy when it is installed).
+    """
+    if isinstance(tasks_file, TaskLog):
+        if vectorized.available():
+            yield from vectorized.iter_rows(tasks_file, date_from, date_to)
+        else:
+            yield from tasks_file.rows(*tasks_file.index_range(date_from, date_to), tracked_only=True)
+        return
+    for entry in open_storage(tasks_file).iter_entries(date_from, date_to):
+        yield entry.category, entry.task, entry.notes, entry.finish, int(entry.duration.total_seconds() // 60)
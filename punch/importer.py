@@ -0,0 +1,144 @@
+from bisect import bisect_right, insort
+import csv
+import datetime
+import json
+
+from punch.storage import open_storage
+from punch.tasks import TaskEntry, parse_task
+
+IMPORT_FORMATS = ("json", "ndjson", "csv", "lines")
+
+# Untracked entries inserted so imported durations survive being recomputed from the previous entry
+START_TASK = "start"
+GAP_TASK = "break**"
+
+def parse_import(stream, fmt):
+    """
+    Reads the entries to import from a text stream.
+    json, ndjson and csv use the schema written by punch export (category, task, notes,
+    finish in ISO format, converted to local time if it has a UTC offset, and duration_minutes), lines the task log format itself.
+    Returns a list of TaskEntry objects; entries read from task log lines have no duration (None),
+    their duration is whatever the merged log gives them.
+    Raises ValueError on malformed input.
+    """
+    if fmt == "json":
+        try:
+            rows = json.load(stream)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}") from e
+        if not isinstance(rows, list):
+            raise ValueError("Invalid JSON: expected a list of entries")
+        return [_entry_from_row(row, idx) for idx, row in enumerate(rows, 1)]
+    if fmt == "ndjson":
+        entries = []
+        for line_no, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON: line {line_no}: {e}") from e
+            entries.append(_entry_from_row(row, line_no))
+        return entries
+    if fmt == "csv":
+        return [_entry_from_row(row, idx) for idx, row in enumerate(csv.DictReader(stream), 1)]
+    if fmt == "lines":
+        entries = []
+        for line_no, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            entry = parse_task(line, line_no)
+            entry.duration = None
+            entries.append(entry)
+        return entries
+    raise ValueError(f"Unsupported import format: {fmt}")
+
+def _entry_from_row(row, idx):
+    if not isinstance(row, dict):
+        raise ValueError(f"Invalid entry {idx}: expected an object")
+    try:
+        finish = datetime.datetime.fromisoformat(str(row["finish"])).replace(second=0, microsecond=0)
+        if finish.tzinfo is not None:
+            # The task log is in local time
+            finish = finish.astimezone().replace(tzinfo=None)
+        task = str(row["task"]).strip()
+    except KeyError as e:
+        raise ValueError(f"Invalid entry {idx}: missing {e}") from e
+    except ValueError as e:
+        raise ValueError(f"Invalid entry {idx}: {e}") from e
+    if not task:
+        raise ValueError(f"Invalid entry {idx}: empty task")
+    duration = None
+    if row.get("duration_minutes") not in (None, ""):
+        try:
+            minutes = int(row["duration_minutes"])
+        except ValueError as e:
+            raise ValueError(f"Invalid entry {idx}: duration_minutes must be an integer") from e
+        if minutes < 0:
+            raise ValueError(f"Invalid entry {idx}: negative duration_minutes")
+        duration = datetime.timedelta(minutes=minutes)
+    return TaskEntry(finish, str(row.get("category") or "").strip(), task, str(row.get("notes") or "").strip(), duration)
+
+def validate_categories(entries, categories):
+    """
+    Raises ValueError if an entry has a category that is not configured.
+    Entries without a category (like 'start' or tasks ending with '*') are always accepted.
+    """
+    unknown = sorted({entry.category for entry in entries if entry.category and entry.category not in categories})
+    if unknown:
+        raise ValueError(f"Unknown categories: {', '.join(unknown)}")
+
+def plan_import(storage, entries):
+    """
+    Returns the entries to write, in chronological order: the imported entries plus the untracked
+    'start' and 'break**' entries needed for each imported duration to end up as given, since the
+    task log only stores finish times. An entry is only ever added after the existing entries
+    of its day, so the durations already in the log never change.
+    Raises ValueError if an imported entry overlaps an existing or another imported entry.
+    """
+    entries = sorted(entries, key=lambda e: e.finish)
+    if not entries:
+        return []
+    # Finish times per day of the existing entries on the days being imported
+    day_finishes = {}
+    for entry in storage.iter_entries(entries[0].finish.date(), entries[-1].finish.date(), include_untracked=True):
+        day_finishes.setdefault(entry.finish.date(), []).append(entry.finish)
+    last_existing = {day: finishes[-1] for day, finishes in day_finishes.items()}
+
+    planned = []
+    for entry in entries:
+        day = entry.finish.date()
+        if day in last_existing and entry.finish < last_existing[day]:
+            raise ValueError(f"{_describe(entry)} is earlier than an existing entry of the same day ({last_existing[day]:%H:%M})")
+        finishes = day_finishes.setdefault(day, [])
+        idx = bisect_right(finishes, entry.finish)
+        prev = finishes[idx - 1] if idx else None
+        if entry.duration:
+            start = entry.finish - entry.duration
+            if start.date() != day:
+                raise ValueError(f"{_describe(entry)} starts on the previous day")
+            if prev is not None and prev > start:
+                raise ValueError(f"{_describe(entry)} overlaps the entry finished at {prev:%H:%M}")
+            if prev is None or prev < start:
+                planned.append(TaskEntry(start, "", START_TASK if prev is None else GAP_TASK, "", datetime.timedelta(0)))
+                insort(finishes, start)
+        planned.append(entry)
+        insort(finishes, entry.finish)
+    return planned
+
+def _describe(entry):
+    return f"{entry.finish:%Y-%m-%d %H:%M} {entry.category or '(no category)'}: {entry.task}"
+
+def import_entries(tasks_file, entries, categories=None, dry_run=False):
+    """
+    Validates the entries against the configured categories (skipped if categories is None),
+    plans the extra untracked entries and writes everything to the task storage in one pass.
+    Returns the list of entries written (or that would be written if dry_run is True).
+    """
+    if categories is not None:
+        validate_categories(entries, categories)
+    storage = open_storage(tasks_file)
+    planned = plan_import(storage, entries)
+    if not dry_run:
+        storage.append_many(planned)
+    return planned
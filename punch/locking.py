@@ -0,0 +1,91 @@
+from collections import Counter
+from contextlib import contextmanager
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Files each thread holds shared locks on, {(st_dev, st_ino): count}, see lock_file
+_readers = threading.local()
+
+def get_lock_path(taskfile):
+    """
+    Returns the path of the lock file that belongs to taskfile, a hidden file next to the task log.
+    """
+    taskfile = os.path.abspath(taskfile)
+    return os.path.join(os.path.dirname(taskfile), f".{os.path.basename(taskfile)}.lock")
+
+@contextmanager
+def locked(taskfile, shared=False):
+    """
+    Holds an advisory lock on the task log for the duration of the block: exclusive for
+    writers, shared for readers taking a snapshot of the log.
+    The lock is taken on a sidecar file rather than on the log itself, because the log may not
+    exist yet and archiving or segmenting it replaces it with a new file. Back-dated inserts and
+    undo rewrite the tail of the log in place instead, waiting for readers with lock_file. Without fcntl (Windows) this does nothing, and readers
+    that cannot create the lock file (read-only data directory) go ahead without it.
+    """
+    if fcntl is None:
+        yield
+        return
+    try:
+        fd = os.open(get_lock_path(taskfile), os.O_RDWR | os.O_CREAT, 0o644)
+    except OSError:
+        if not shared:
+            raise
+        yield
+        return
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+def lock_file(f, shared=False):
+    """
+    Takes an advisory lock on an open task log file itself, released when f is closed
+    (or by unlock_file). Readers hold a shared one while they read, so a writer rewriting the file
+    in place (which takes an exclusive one) waits for them, while plain appends never do.
+    A thread that still holds a shared lock on the file, e.g. through an iter_tasklog generator
+    that was not exhausted or closed, would wait for itself forever: RuntimeError is raised instead.
+    Does nothing without fcntl.
+    """
+    if fcntl is None:
+        return
+    key = _file_key(f)
+    if shared:
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+        _held()[key] += 1
+    elif _held()[key]:
+        raise RuntimeError(
+            f"{os.path.basename(f.name)} is still being read by this thread (an open iter_tasklog generator?), "
+            "rewriting it would wait forever"
+        )
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+def unlock_file(f):
+    """
+    Releases a shared lock taken with lock_file, before f is closed.
+    """
+    if fcntl is None:
+        return
+    key = _file_key(f)
+    held = _held()
+    held[key] -= 1
+    if held[key] <= 0:
+        del held[key]
+    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def _held():
+    if not hasattr(_readers, "files"):
+        _readers.files = Counter()
+    return _readers.files
+
+def _file_key(f):
+    st = os.fstat(f.fileno())
+    return st.st_dev, st.st_ino
@@ -0,0 +1,189 @@
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import re
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+MOCK_SESSION_ID = "mock-session-id"
+
+# The most records the sObject Collections API accepts in one request
+MAX_RECORDS = 200
+
+_QUERY = re.compile(r"SELECT Id, (\w+) FROM (\w+) WHERE \1 IN \((.*)\)$")
+_LITERAL = re.compile(r"'((?:[^'\\]|\\.)*)'")
+
+class MockSalesforce:
+    """
+    A local stand-in for the parts of the Salesforce REST API used by the http submission backend,
+    to try and test it offline. Serves query and sObject Collections create requests on localhost:
+    Case records looked up by CaseNumber and User records by Name come from cases and users
+    ({value: Id}), created records are kept in records, one list per request.
+    Requests need the session id in a sid cookie or a bearer token.
+    Errors are simulated for records whose field_errors field (a description, by default)
+    is in failing, and for the requests whose number (from 1) is in failing_requests.
+    connections counts the TCP connections accepted.
+    """
+    def __init__(self, cases=None, users=None, session_id=MOCK_SESSION_ID, port=0):
+        self.cases = dict(cases or {})
+        self.users = dict(users or {})
+        self.session_id = session_id
+        self.records = []
+        self.failing = set()
+        self.failing_requests = set()
+        self.field_errors = "Description__c"
+        self.connections = 0
+        self.create_requests = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), _handler(self))
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def cookie(self):
+        """
+        Returns the session cookie as Playwright saves it in auth.json.
+        """
+        return {"name": "sid", "value": self.session_id, "domain": "127.0.0.1", "path": "/",
+                "expires": -1, "httpOnly": True, "secure": False, "sameSite": "Lax"}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def authorized(self, headers):
+        if headers.get("Authorization") == f"Bearer {self.session_id}":
+            return True
+        cookies = dict(
+            part.strip().split("=", 1) for part in headers.get("Cookie", "").split(";") if "=" in part
+        )
+        return cookies.get("sid") == self.session_id
+
+    def query(self, soql):
+        match = _QUERY.match(soql)
+        if match is None:
+            return 400, [{"errorCode": "MALFORMED_QUERY", "message": f"unsupported query: {soql}"}]
+        field, sobject, values = match.groups()
+        table = {("Case", "CaseNumber"): self.cases, ("User", "Name"): self.users}.get((sobject, field))
+        if table is None:
+            return 400, [{"errorCode": "INVALID_TYPE", "message": f"unsupported object: {sobject}.{field}"}]
+        records = []
+        for value in _LITERAL.findall(values):
+            value = re.sub(r"\\(.)", r"\1", value)
+            if value in table:
+                records.append({"attributes": {"type": sobject}, "Id": table[value], field: value})
+        return 200, {"totalSize": len(records), "done": True, "records": records}
+
+    def create(self, body):
+        with self.lock:
+            self.create_requests += 1
+            number = self.create_requests
+        if number in self.failing_requests:
+            return 503, [{"errorCode": "SERVER_UNAVAILABLE", "message": "simulated outage"}]
+        records = body.get("records", [])
+        if len(records) > MAX_RECORDS:
+            return 400, [{"errorCode": "EXCEEDED_ID_LIMIT", "message": f"record limit is {MAX_RECORDS}"}]
+        results, created = [], []
+        with self.lock:
+            for record in records:
+                if record.get(self.field_errors) in self.failing:
+                    results.append({"success": False, "errors": [
+                        {"statusCode": "FIELD_CUSTOM_VALIDATION_EXCEPTION", "message": "simulated validation error", "fields": []},
+                    ]})
+                    continue
+                record_id = f"a0X{sum(map(len, self.records)) + len(created):015d}"
+                created.append({**record, "Id": record_id})
+                results.append({"id": record_id, "success": True, "errors": []})
+            self.records.append(created)
+        return 200, results
+
+def _handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keeps connections alive
+
+        def setup(self):
+            super().setup()
+            with mock.lock:
+                mock.connections += 1
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            if not self._authorized():
+                return
+            if re.fullmatch(r"/services/data/v[\d.]+/query", parts.path):
+                self._reply(*mock.query(parse_qs(parts.query).get("q", [""])[0]))
+            else:
+                self._reply(404, [{"errorCode": "NOT_FOUND", "message": parts.path}])
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if not self._authorized():
+                return
+            if re.fullmatch(r"/services/data/v[\d.]+/composite/sobjects", urlsplit(self.path).path):
+                try:
+                    self._reply(*mock.create(json.loads(body)))
+                except ValueError as e:
+                    self._reply(400, [{"errorCode": "JSON_PARSER_ERROR", "message": str(e)}])
+            else:
+                self._reply(404, [{"errorCode": "NOT_FOUND", "message": self.path}])
+
+        def _authorized(self):
+            if mock.authorized(self.headers):
+                return True
+            self._reply(401, [{"errorCode": "INVALID_SESSION_ID", "message": "Session expired or invalid"}])
+            return False
+
+        def _reply(self, status, data):
+            payload = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Salesforce API for the http submission backend")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--case", action="append", default=[], metavar="NUMBER", help="Case number to accept")
+    parser.add_argument("--user", action="append", default=[], metavar="NAME", help="User name to accept")
+    args = parser.parse_args()
+    mock = MockSalesforce(
+        cases={number: f"500{i:015d}" for i, number in enumerate(args.case)},
+        users={name: f"005{i:015d}" for i, name in enumerate(args.user)},
+        port=args.port,
+    )
+    print(f"Mock Salesforce API at {mock.url}, session cookie: {json.dumps(mock.cookie())}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.server.server_close()
+        for request in mock.records:
+            for record in request:
+                print(json.dumps(record))
+
+if __name__ == "__main__":
+    main()
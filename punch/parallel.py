@@ -0,0 +1,152 @@
+from concurrent.futures import ProcessPoolExecutor
+import datetime
+import io
+import mmap
+import os
+
+from punch.archive import archive_blocks, is_archive, read_block
+from punch.tasks import TasklogState, _find_day_offset, _is_tracked, _iter_parsed, _snapshot, iter_tasklog
+
+# Ranges of the task log smaller than this are parsed faster by a single process
+PARALLEL_THRESHOLD = 32 * 1024 * 1024
+
+# Smallest chunk handed to a worker process
+MIN_CHUNK_SIZE = 1024 * 1024
+
+def read_tasklog_parallel(taskfile, date_from=None, date_to=None, workers=None, chunk_size=None):
+    """
+    Returns the same entries as punch.tasks.read_tasklog_range, parsed by a pool of worker processes.
+    The part of the log between date_from and date_to is split at line boundaries into chunks
+    of about chunk_size bytes (archive blocks are chunks of their own), which are parsed independently.
+    The first entry of a chunk is then given its duration from the last entry of the previous chunk
+    when both are on the same day, and chronological order is checked across chunk edges.
+    On a malformed or out of order log the range is re-read sequentially to report the offending line.
+    """
+    workers = workers or os.cpu_count() or 1
+    try:
+        # The snapshot keeps in-place rewrites from moving the chunks while the workers read them,
+        # and lines appended in the meantime out of them
+        with _snapshot(taskfile, date_from, date_to) as files:
+            chunks = plan_chunks(taskfile, date_from, date_to, workers, chunk_size, files)
+            args = [(path, start, end, block, date_from, date_to) for path, start, end, block in chunks]
+            if workers == 1 or len(chunks) <= 1:
+                results = [_parse_chunk(*a) for a in args]
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(_parse_chunk, *zip(*args)))
+        return _join_chunks(results, date_from)
+    except ValueError:
+        # Sequential parsing raises with the line number counted from the top of the file
+        for _ in iter_tasklog(taskfile, date_from, date_to):
+            pass
+        raise
+
+def plan_chunks(taskfile, date_from=None, date_to=None, workers=1, chunk_size=None, files=None):
+    """
+    Returns (path, start, end, block) tuples covering the part of the task log between
+    date_from and date_to, in chronological order. Text files are split into byte ranges
+    [start, end) ending on a newline, archives into the blocks overlapping the range.
+    files is the snapshot of the log to plan (see punch.tasks._snapshot), taken here if None:
+    nothing past the sizes it recorded is included, like in a sequential read.
+    """
+    if files is None:
+        with _snapshot(taskfile, date_from, date_to) as files:
+            return plan_chunks(taskfile, date_from, date_to, workers, chunk_size, files)
+    chunks = []
+    for path, f, st in files:
+        chunks.extend(_plan_file(path, f, st, date_from, date_to, workers, chunk_size))
+    return chunks
+
+def _plan_file(path, f, st, date_from, date_to, workers, chunk_size):
+    if is_archive(path):
+        return [(path, None, None, block) for _, block in archive_blocks(path, date_from, date_to)]
+    start, end = _byte_range(f, st.st_size, date_from, date_to)
+    if start >= end:
+        return []
+    chunks = []
+    size = chunk_size or max(MIN_CHUNK_SIZE, (end - start) // (workers * 4))
+    with mmap.mmap(f.fileno(), st.st_size, access=mmap.ACCESS_READ) as mm:
+        while start < end:
+            split = mm.find(b"\n", min(start + size, end) - 1, end)
+            split = end if split == -1 or split + 1 > end else split + 1
+            chunks.append((path, start, split, None))
+            start = split
+    return chunks
+
+def range_size(taskfile, date_from=None, date_to=None):
+    """
+    Returns the number of bytes read to parse the task log between date_from and date_to,
+    counting archive blocks by their compressed size.
+    """
+    return sum(
+        block["length"] if block else end - start
+        for _, start, end, block in plan_chunks(taskfile, date_from, date_to)
+    )
+
+def can_parse_in_parallel():
+    """
+    Returns False on a single core, where worker processes only add their start-up
+    and pickling costs to a sequential parse.
+    """
+    return (os.cpu_count() or 1) > 1
+
+def should_parse_in_parallel(taskfile, date_from=None, date_to=None, threshold=PARALLEL_THRESHOLD):
+    """
+    Returns True if the task log range is large enough for read_tasklog_parallel to pay off
+    on this machine.
+    """
+    if not can_parse_in_parallel():
+        return False
+    return range_size(taskfile, date_from, date_to) >= threshold
+
+def _byte_range(f, size, date_from, date_to):
+    """
+    Returns the [start, end) byte range of the lines of f, up to size, finished between
+    date_from and date_to.
+    """
+    start = _find_day_offset(f, date_from) if date_from is not None else 0
+    end = size
+    if date_to is not None:
+        end = _find_day_offset(f, date_to + datetime.timedelta(days=1))
+        # 0 may mean the binary search gave up on a malformed line, let the workers stop at date_to
+        end = end or size
+    return min(start, size), min(end, size)
+
+def _parse_chunk(path, start, end, block, date_from, date_to):
+    """
+    Parses one chunk with a fresh state, so the first entry of the chunk has no duration.
+    Returns (first entry, tracked entries after the first one, last entry, lines parsed).
+    """
+    with open(path, 'rb') as f:
+        if block is not None:
+            data = read_block(f, block)
+        else:
+            f.seek(start)
+            data = f.read(end - start)
+    state = TasklogState()
+    first = last = None
+    entries = []
+    for entry in _iter_parsed(state, io.BytesIO(data), until=date_to):
+        if first is None:
+            first = entry
+        elif _is_tracked(entry) and (date_from is None or entry.finish.date() >= date_from):
+            entries.append(entry)
+        last = entry
+    return first, entries, last, state.line_count
+
+def _join_chunks(results, date_from):
+    tasklog = []
+    prev = None
+    for first, entries, last, _ in results:
+        if first is None:
+            continue
+        if prev is not None:
+            if first.finish < prev.finish:
+                raise ValueError(f"Task log not in chronological order: ({first.finish} < {prev.finish})")
+            if first.finish.date() == prev.finish.date():
+                first.duration = first.finish - prev.finish
+        if _is_tracked(first) and (date_from is None or first.finish.date() >= date_from):
+            tasklog.append(first)
+        tasklog.extend(entries)
+        prev = last
+    return tasklog
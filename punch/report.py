@@ -1,52 +1,128 @@
 from rich.tree import Tree
 from rich.console import Console
 import datetime
-from punch.tasks import read_tasklog
+import itertools
+from punch.rollup import iter_rollup_days
+from punch.storage import TextStorage, open_storage
+from punch.tasklog import TaskLog
+from punch import vectorized
+
+NO_CATEGORY = "(no category)"
+
+# Fields aggregate can group entries by, and the metrics it computes over their minutes
+GROUP_FIELDS = ("day", "week", "month", "category", "task", "notes")
+METRICS = ("sum", "count", "min", "max")
+
+_GROUP_KEYS = {
+    "day": lambda day, category, task, notes: day,
+    "week": lambda day, category, task, notes: "%d-W%02d" % day.isocalendar()[:2],
+    "month": lambda day, category, task, notes: f"{day:%Y-%m}",
+    "category": lambda day, category, task, notes: category or NO_CATEGORY,
+    "task": lambda day, category, task, notes: task,
+    "notes": lambda day, category, task, notes: bool(notes),
+}
 
 def generate_report(tasks_file, date_from, date_to, collapse=True):
     """
     Generate a report of all tasks grouped by category between date_from and date_to (inclusive).
     date_to means all tasks finished before the end of that day.
     Assumes date_from and date_to are datetime.date objects.
-    If collapse is True, sum duration of all tasks with the same name (notes are ignored).
+    If collapse is True, sum duration of all tasks with the same name (notes are ignored),
+    which is aggregate grouped by category and task.
+    tasks_file may also be a TaskLog, in which case the totals are aggregated directly over its columns.
     Returns a dict: {category: [ (task, notes, duration) or (task, duration) ]}
     """
-    # Convert date_from and date_to to datetime for comparison
-    date_from_dt = datetime.datetime.combine(date_from, datetime.time.min)
-    date_to_dt = datetime.datetime.combine(date_to, datetime.time.max)
-
-    tasklog = read_tasklog(tasks_file)
-    # Filter tasks in the date range and skip tasks with duration 0 or ending with **
-    filtered = [
-        entry for entry in tasklog
-        if date_from_dt <= entry.finish <= date_to_dt
-        and entry.duration.total_seconds() > 0
-        and not entry.task.endswith("**")
-    ]
-
-    # Group by category
-    categories = {}
-    for entry in filtered:
-        cat = entry.category or "(no category)"
-        categories.setdefault(cat, []).append(entry)
-
-    report = {}
-    for cat, entries in sorted(categories.items()):
-        # Calculate category total
-        category_total = sum((entry.duration for entry in entries), datetime.timedelta(0))
-        
-        if collapse:
-            # Collapse: sum durations for each unique task name (notes ignored)
-            task_durations = {}
-            for entry in entries:
-                if entry.task not in task_durations:
-                    task_durations[entry.task] = datetime.timedelta(0)
-                task_durations[entry.task] += entry.duration
-            tasks = [(task, total_duration) for task, total_duration in sorted(task_durations.items())]
+    return {
+        category: {"tasks": tasks, "total": total}
+        for category, tasks, total in iter_report(tasks_file, date_from, date_to, collapse)
+    }
+
+def iter_report(tasks_file, date_from, date_to, collapse=True):
+    """
+    Yields the (category, tasks, total) of generate_report one category at a time, in order,
+    so that it can be printed before the whole report is built.
+    Collapsed, categories come straight out of aggregate, which is sorted by category.
+    Not collapsed, the entries in range are read once keeping only (task, notes, minutes) per entry,
+    and each category is turned into timedeltas only when yielded, then released.
+    """
+    if collapse:
+        groups = aggregate(tasks_file, date_from, date_to, ("category", "task"))
+        for cat, items in itertools.groupby(groups.items(), key=lambda item: item[0][0]):
+            tasks = [(task, datetime.timedelta(minutes=values["sum"])) for (_, task), values in items]
+            yield cat, tasks, sum((duration for _, duration in tasks), datetime.timedelta(0))
+        return
+
+    # Group by category in a single pass over the entries in range,
+    # tasks with duration 0 or ending with ** are already skipped by the storage
+    by_category = {}
+    for cat, task, notes, _, minutes in _iter_rows(tasks_file, date_from, date_to):
+        by_category.setdefault(cat or NO_CATEGORY, []).append((task, notes, minutes))
+    for cat in sorted(by_category):
+        rows = by_category.pop(cat)
+        tasks = [(task, notes, datetime.timedelta(minutes=minutes)) for task, notes, minutes in rows]
+        yield cat, tasks, datetime.timedelta(minutes=sum(minutes for _, _, minutes in rows))
+
+def aggregate(source, date_from=None, date_to=None, by=("category", "task"), metrics=("sum",)):
+    """
+    Groups the entries counting towards reports between date_from and date_to by any combination
+    of GROUP_FIELDS and computes the METRICS asked for over their minutes, in a single pass:
+    day is the datetime.date of the entry, week its ISO week ('2025-W07'), month 'YYYY-MM',
+    category the category or '(no category)' and notes whether the entry has notes.
+    source is the task storage path or a TaskLog. Unless grouping by notes, the text task log
+    is aggregated from its daily rollups (see punch.rollup) instead of its entries, and a TaskLog
+    is aggregated with NumPy when it is installed (see punch.vectorized).
+    One accumulator is kept per group, so memory grows with the number of groups, not of entries.
+    Returns {group key tuple: {metric: minutes or count}}, sorted by group key.
+    Raises ValueError on unknown fields or metrics.
+    """
+    unknown = [field for field in by if field not in GROUP_FIELDS] + [m for m in metrics if m not in METRICS]
+    if unknown:
+        raise ValueError(f"Unknown fields or metrics: {', '.join(unknown)}")
+    key_funcs = [_GROUP_KEYS[field] for field in by]
+    groups = {}
+    for day, category, task, notes, minutes, count, low, high in _iter_totals(source, date_from, date_to, by):
+        key = tuple(key_func(day, category, task, notes) for key_func in key_funcs)
+        acc = groups.get(key)
+        if acc is None:
+            groups[key] = [minutes, count, low, high]
+        else:
+            acc[0] += minutes
+            acc[1] += count
+            acc[2] = min(acc[2], low)
+            acc[3] = max(acc[3], high)
+    return {
+        key: {metric: acc[METRICS.index(metric)] for metric in metrics}
+        for key, acc in sorted(groups.items())
+    }
+
+def _iter_totals(source, date_from, date_to, by):
+    """
+    Yields (day, category, task, notes, minutes, count, min minutes, max minutes) partial totals:
+    one per entry, one per day, category and task when read from the daily rollups (notes is None),
+    or one per group of a TaskLog aggregated with NumPy.
+    """
+    need_notes = "notes" in by
+    if isinstance(source, TaskLog) and vectorized.available():
+        yield from vectorized.group_totals(source, date_from, date_to, by)
+        return
+    if not need_notes and not isinstance(source, TaskLog) and isinstance(open_storage(source), TextStorage):
+        for day, totals in iter_rollup_days(source, date_from, date_to):
+            for (category, task), (minutes, count, low, high) in totals.items():
+                yield day, category, task, None, minutes, count, low, high
+        return
+    for category, task, notes, finish, minutes in _iter_rows(source, date_from, date_to):
+        yield finish.date(), category, task, notes, minutes, 1, minutes, minutes
+
+def _iter_rows(source, date_from, date_to):
+    """
+    Yields (category, task, notes, finish, duration_minutes) for the entries in range,
+    straight from the columns of a TaskLog or streamed from the task storage.
+    """
+    if isinstance(source, TaskLog):
+        if vectorized.available():
+            yield from vectorized.iter_rows(source, date_from, date_to)
         else:
-            tasks = []
-            for entry in entries:
-                tasks.append((entry.task, entry.notes, entry.duration))
-        
-        report[cat] = {"tasks": tasks, "total": category_total}
-    return report
\ No newline at end of file
+            yield from source.rows(*source.index_range(date_from, date_to), tracked_only=True)
+        return
+    for entry in open_storage(source).iter_entries(date_from, date_to):
+        yield entry.category, entry.task, entry.notes, entry.finish, int(entry.duration.total_seconds() // 60)
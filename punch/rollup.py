@@ -0,0 +1,187 @@
+import datetime
+import io
+import os
+
+from punch.archive import archive_blocks, is_archive, read_block
+from punch.cache import file_id, load_rollup, save_rollup, tail_digest
+from punch.tasks import TasklogState, _is_tracked, _iter_parsed, _reverse_lines, _snapshot
+
+def rollup_days(taskfile, date_from=None, date_to=None):
+    """
+    Returns the daily rollup of the text task log between date_from and date_to (inclusive,
+    datetime.date objects or None for an open bound): {day: {(category, task): [minutes, count,
+    min minutes, max minutes]}} over the entries counting towards reports.
+    Every file of the log keeps its rollup next to it. Before use it is refreshed from the start
+    of its last day, the only one that can still be appended to, so closed days are never
+    recomputed. Writers rewriting the file cut it back to the day they change.
+    """
+    days = {}
+    for day, totals in iter_rollup_days(taskfile, date_from, date_to):
+        _merge_totals(days.setdefault(day, {}), totals)
+    return days
+
+def iter_rollup_days(taskfile, date_from=None, date_to=None):
+    """
+    Yields the (day, totals) pairs of rollup_days file by file, in chronological order.
+    As when reading the entries, raises ValueError if a file starts before the previous one ends.
+    """
+    prev_last = None
+    with _snapshot(taskfile, date_from, date_to) as files:
+        for path, f, st in files:
+            try:
+                rollup = refresh_rollup(path, f, st)
+            except ValueError as e:
+                if path == taskfile:
+                    raise
+                raise ValueError(f"{os.path.basename(path)}: {e}") from e
+            bounds = _file_bounds(path, f, st)
+            if bounds is not None:
+                first, last = bounds
+                if prev_last is not None and first < prev_last:
+                    raise ValueError(
+                        f"Task log not in chronological order: {os.path.basename(path)}: ({first} < {prev_last})"
+                    )
+                prev_last = last
+            for day, totals in sorted(rollup["days"].items()):
+                if (date_from is None or day >= date_from) and (date_to is None or day <= date_to):
+                    yield day, totals
+
+def _file_bounds(path, f, st):
+    """
+    Returns the finish times of the first and last lines of one file of a snapshot,
+    None if it has none: from the index of an archive, from the ends of a text file.
+    """
+    if is_archive(path):
+        blocks = [block for _, block in archive_blocks(path) if block["offset"] < st.st_size]
+        if not blocks:
+            return None
+        first, last = blocks[0]["first"], blocks[-1]["last"]
+    else:
+        last = next((raw for raw in _reverse_lines(f, st.st_size) if raw.strip()), None)
+        if last is None:
+            return None
+        f.seek(0)
+        first = next(raw for raw in f if raw.strip())
+        first, last = first[:16].decode('ascii', 'replace'), last[:16].decode('ascii', 'replace')
+    return datetime.datetime.fromisoformat(first), datetime.datetime.fromisoformat(last)
+
+def rollup_totals(taskfile, date_from=None, date_to=None):
+    """
+    Returns {(category, task): [minutes, count, min minutes, max minutes]} summed over
+    the days of the rollup between date_from and date_to.
+    """
+    totals = {}
+    for day_totals in rollup_days(taskfile, date_from, date_to).values():
+        _merge_totals(totals, day_totals)
+    return totals
+
+def refresh_rollup(path, f, st, use_stored=True):
+    """
+    Brings the rollup of one file of a snapshot (see punch.tasks._snapshot) up to its size in st,
+    stores it and returns it. With use_stored False the rollup is rebuilt from scratch.
+    """
+    rollup = load_rollup(path) if use_stored else None
+    if is_archive(path):
+        # The archive only ever gets whole days appended as new blocks
+        if rollup is None or rollup["offset"] > st.st_size:
+            rollup = {"offset": 0, "days": {}}
+        if rollup["offset"] < st.st_size:
+            for _, block in archive_blocks(path):
+                if rollup["offset"] <= block["offset"] < st.st_size:
+                    _rollup_into(rollup["days"], TasklogState(), io.BytesIO(read_block(f, block)))
+                    rollup["offset"] = block["offset"] + block["length"]
+            save_rollup(path, rollup)
+        return rollup
+
+    if rollup is not None and (rollup.get("size"), rollup.get("mtime_ns")) == (st.st_size, st.st_mtime_ns):
+        return rollup
+    if (rollup is None or rollup.get("file_id") != file_id(st) or rollup["offset"] > st.st_size
+            or tail_digest(f, rollup["offset"]) != rollup["tail_digest"]):
+        rollup = {"offset": 0, "days": {}}
+    f.seek(rollup["offset"])
+    # The refresh starts at a day boundary, so durations are those of the whole log
+    last_day_offset = _rollup_into(rollup["days"], TasklogState(offset=rollup["offset"]), f, st.st_size)
+    rollup.update(
+        offset=last_day_offset,
+        file_id=file_id(st),
+        tail_digest=tail_digest(f, last_day_offset),
+        size=st.st_size,
+        mtime_ns=st.st_mtime_ns,
+    )
+    save_rollup(path, rollup)
+    return rollup
+
+def _rollup_into(days, state, f, end=None):
+    """
+    Parses the lines of the binary file f from a day boundary and replaces the totals of every
+    day seen with the ones computed from its lines.
+    Returns the offset of the first line of the last day seen (state.offset if there was none).
+    """
+    last_day = None
+    last_day_offset = line_offset = state.offset
+    for entry in _iter_parsed(state, f, end=end):
+        day = entry.finish.date()
+        if day != last_day:
+            days[day] = {}
+            last_day = day
+            last_day_offset = line_offset
+        line_offset = state.offset
+        if _is_tracked(entry):
+            minutes = int(entry.duration.total_seconds() // 60)
+            _add_minutes(days[day], (entry.category, entry.task), minutes)
+    return last_day_offset
+
+def _add_minutes(totals, key, minutes):
+    total = totals.get(key)
+    if total is None:
+        totals[key] = [minutes, 1, minutes, minutes]
+    else:
+        total[0] += minutes
+        total[1] += 1
+        total[2] = min(total[2], minutes)
+        total[3] = max(total[3], minutes)
+
+def _merge_totals(totals, other):
+    for key, (minutes, count, low, high) in other.items():
+        total = totals.get(key)
+        if total is None:
+            totals[key] = [minutes, count, low, high]
+        else:
+            total[0] += minutes
+            total[1] += count
+            total[2] = min(total[2], low)
+            total[3] = max(total[3], high)
+
+def rebuild_rollups(taskfile):
+    """
+    Rebuilds the rollups of every file of the task log from scratch.
+    Returns the number of days rolled up.
+    """
+    with _snapshot(taskfile) as files:
+        return sum(len(refresh_rollup(path, f, st, use_stored=False)["days"]) for path, f, st in files)
+
+def verify_rollups(taskfile):
+    """
+    Compares the stored rollups, brought up to date, with a full recompute from the task log.
+    Returns a list of problems, empty if every day matches.
+    """
+    problems = []
+    with _snapshot(taskfile) as files:
+        for path, f, st in files:
+            stored = refresh_rollup(path, f, st)["days"]
+            expected = {}
+            if is_archive(path):
+                for _, block in archive_blocks(path):
+                    _rollup_into(expected, TasklogState(), io.BytesIO(read_block(f, block)))
+            else:
+                f.seek(0)
+                _rollup_into(expected, TasklogState(), f, st.st_size)
+            name = os.path.basename(path)
+            for day in sorted(set(stored) | set(expected)):
+                if day not in expected:
+                    problems.append(f"{name}: {day}: in the rollup but not in the log")
+                elif day not in stored:
+                    problems.append(f"{name}: {day}: missing from the rollup")
+                elif stored[day] != expected[day]:
+                    problems.append(f"{name}: {day}: rollup totals differ from the log")
+    return problems
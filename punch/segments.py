@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from punch.locking import locked
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+_TIMESTAMP_PREFIX = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}')
+
+def get_segment_dir(taskfile):
+    """
+    Returns the directory holding the monthly segments of taskfile (tasks.txt -> tasks.d).
+    """
+    return os.path.splitext(taskfile)[0] + ".d"
+
+def get_manifest_path(taskfile):
+    return os.path.join(get_segment_dir(taskfile), MANIFEST_FILE)
+
+def is_segmented(taskfile):
+    """
+    Returns True if the task log uses the segmented layout: one file per month plus a manifest.
+    """
+    return os.path.exists(get_manifest_path(taskfile))
+
+def load_manifest(taskfile):
+    """
+    Returns the manifest of a segmented task log:
+    {"version": 1, "segments": [{"file", "first", "last", "lines", "sha256"}, ...]},
+    with segments sorted by month and first/last being the 'YYYY-MM-DD HH:MM' timestamps
+    of their first and last line.
+    """
+    with open(get_manifest_path(taskfile), 'r') as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported task log manifest version: {manifest.get('version')}")
+    return manifest
+
+def save_manifest(taskfile, manifest):
+    """
+    Atomically replaces the manifest of a segmented task log.
+    """
+    _write_json_atomic(get_manifest_path(taskfile), manifest)
+
+def segment_paths(taskfile, date_from=None, date_to=None):
+    """
+    Returns the paths of the segments whose date range overlaps date_from..date_to
+    (inclusive, datetime.date objects or None for an open bound), in chronological order.
+    """
+    segment_dir = get_segment_dir(taskfile)
+    paths = []
+    for segment in load_manifest(taskfile)["segments"]:
+        if date_from is not None and segment["last"][:10] < date_from.isoformat():
+            continue
+        if date_to is not None and segment["first"][:10] > date_to.isoformat():
+            continue
+        paths.append(os.path.join(segment_dir, segment["file"]))
+    return paths
+
+def segment_name(timestamp):
+    """
+    Returns the file name of the segment holding a 'YYYY-MM-DD HH:MM' timestamp.
+    """
+    return f"{timestamp[:7]}.txt"
+
+def update_manifest(taskfile, added):
+    """
+    Records lines written to segments in the manifest: added maps segment file names to the
+    formatted lines that were appended or inserted into them.
+    """
+    segment_dir = get_segment_dir(taskfile)
+    manifest = load_manifest(taskfile)
+    segments = manifest["segments"]
+    for name, lines in added.items():
+        timestamps = [line[:16] for line in lines]
+        segment = next((s for s in segments if s["file"] == name), None)
+        if segment is None:
+            segment = {"file": name, "first": min(timestamps), "last": max(timestamps), "lines": 0}
+            segments.append(segment)
+            segments.sort(key=lambda s: s["file"])
+        segment["first"] = min([segment["first"]] + timestamps)
+        segment["last"] = max([segment["last"]] + timestamps)
+        segment["lines"] += len(lines)
+        segment["sha256"] = _file_sha256(os.path.join(segment_dir, name))
+    save_manifest(taskfile, manifest)
+
+def refresh_segment(taskfile, name):
+    """
+    Recomputes the manifest entry of a segment whose last lines were removed or rewritten,
+    dropping the segment (and deleting its file) if it is now empty.
+    """
+    path = os.path.join(get_segment_dir(taskfile), name)
+    manifest = load_manifest(taskfile)
+    with open(path, 'r') as f:
+        timestamps = [line[:16] for line in f]
+    if not timestamps:
+        manifest["segments"] = [s for s in manifest["segments"] if s["file"] != name]
+        save_manifest(taskfile, manifest)
+        os.unlink(path)
+        return
+    segment = next(s for s in manifest["segments"] if s["file"] == name)
+    segment["first"] = timestamps[0]
+    segment["last"] = timestamps[-1]
+    segment["lines"] = len(timestamps)
+    segment["sha256"] = _file_sha256(path)
+    save_manifest(taskfile, manifest)
+
+def segment_tasklog(taskfile):
+    """
+    Splits a monolithic task log into one file per month plus a manifest recording each
+    segment's date range, line count and checksum. The original file is kept as taskfile + '.bak'.
+    Returns the manifest.
+    Raises ValueError if a line has no 'YYYY-MM-DD HH:MM' prefix or the log is not in chronological order.
+    """
+    with locked(taskfile):
+        return _segment_tasklog(taskfile)
+
+def _segment_tasklog(taskfile):
+    segment_dir = get_segment_dir(taskfile)
+    backup_path = taskfile + ".bak"
+    if os.path.exists(segment_dir):
+        raise FileExistsError(f"{segment_dir} already exists")
+    if os.path.exists(backup_path):
+        raise FileExistsError(f"{backup_path} already exists")
+
+    tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(taskfile)), prefix=".punch-segments-")
+    segments = []
+    out = None
+    try:
+        prev_timestamp = None
+        with open(taskfile, 'r') as f:
+            for line_no, line in enumerate(f, 1):
+                timestamp = line[:16]
+                if not _TIMESTAMP_PREFIX.fullmatch(timestamp):
+                    raise ValueError(f"Invalid task entry format: line {line_no}: {line.strip()}")
+                if prev_timestamp and timestamp < prev_timestamp:
+                    raise ValueError(
+                        f"Task log not in chronological order: line {line_no}: ({timestamp} < {prev_timestamp})"
+                    )
+                prev_timestamp = timestamp
+                if not line.endswith("\n"):
+                    line += "\n"
+                name = segment_name(timestamp)
+                if not segments or segments[-1]["file"] != name:
+                    if out:
+                        out.close()
+                    out = open(os.path.join(tmp_dir, name), 'w')
+                    segments.append({"file": name, "first": timestamp, "last": timestamp, "lines": 0})
+                out.write(line)
+                segments[-1]["last"] = timestamp
+                segments[-1]["lines"] += 1
+        if out:
+            out.close()
+            out = None
+        for segment in segments:
+            segment["sha256"] = _file_sha256(os.path.join(tmp_dir, segment["file"]))
+        manifest = {"version": MANIFEST_VERSION, "segments": segments}
+        _write_json_atomic(os.path.join(tmp_dir, MANIFEST_FILE), manifest)
+        os.rename(tmp_dir, segment_dir)
+    except BaseException:
+        if out:
+            out.close()
+        for name in os.listdir(tmp_dir):
+            os.unlink(os.path.join(tmp_dir, name))
+        os.rmdir(tmp_dir)
+        raise
+    os.rename(taskfile, backup_path)
+    return manifest
+
+def verify_manifest(taskfile):
+    """
+    Checks every segment against the manifest: that it exists, its line count, checksum,
+    that all its lines belong to its month, and that segments do not overlap.
+    Returns a list of problems, empty if the segmented log is consistent.
+    """
+    problems = []
+    segment_dir = get_segment_dir(taskfile)
+    prev_last = None
+    for segment in load_manifest(taskfile)["segments"]:
+        path = os.path.join(segment_dir, segment["file"])
+        if not os.path.exists(path):
+            problems.append(f"{segment['file']}: missing")
+            continue
+        if _file_sha256(path) != segment.get("sha256"):
+            problems.append(f"{segment['file']}: checksum mismatch")
+        month = segment["file"][:7]
+        with open(path, 'r') as f:
+            lines = f.readlines()
+        if len(lines) != segment["lines"]:
+            problems.append(f"{segment['file']}: {len(lines)} lines, manifest says {segment['lines']}")
+        if any(not line.startswith(month) for line in lines):
+            problems.append(f"{segment['file']}: contains entries from another month")
+        if prev_last and segment["first"] < prev_last:
+            problems.append(f"{segment['file']}: overlaps the previous segment")
+        prev_last = segment["last"]
+    return problems
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _write_json_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".punch-")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
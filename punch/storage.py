@@ -0,0 +1,309 @@
+import datetime
+import os
+import sqlite3
+
+from punch.tasks import RECENT_TASKS_HORIZON, RECENT_TASKS_LIMIT, TaskEntry, amend_task, format_task_line, get_recent_tasks, iter_tasklog, undo_tasks, write_task, write_tasks
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+_FINISH_FORMAT = '%Y-%m-%d %H:%M'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    finish TEXT NOT NULL,
+    category TEXT NOT NULL,
+    task TEXT NOT NULL,
+    notes TEXT NOT NULL,
+    duration INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_finish ON entries (finish, id);
+CREATE INDEX IF NOT EXISTS entries_category ON entries (category, finish);
+CREATE INDEX IF NOT EXISTS entries_task ON entries (task);
+"""
+
+# Entries that count towards reports, see punch.tasks._is_tracked
+_TRACKED = "duration > 0 AND substr(task, -2) != '**'"
+
+def open_storage(path):
+    """
+    Returns the storage backend for path: SQLiteStorage for SQLite databases
+    (.db, .sqlite, .sqlite3), TextStorage for everything else.
+    """
+    if str(path).endswith(SQLITE_SUFFIXES):
+        return SQLiteStorage(path)
+    return TextStorage(path)
+
+class TextStorage:
+    """
+    The plain text task log, one '<finish> | <category> | <task> | <notes>' line per entry.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def iter_entries(self, date_from=None, date_to=None, categories=None, include_untracked=False):
+        """
+        Yields the entries between date_from and date_to (inclusive), see punch.tasks.iter_tasklog.
+        """
+        return iter_tasklog(self.path, date_from, date_to, categories, include_untracked)
+
+    def append(self, category, task, notes, finish=None):
+        write_task(self.path, category, task, notes, finish)
+
+    def append_many(self, entries):
+        """
+        Writes many entries in one pass, see punch.tasks.write_tasks.
+        """
+        write_tasks(self.path, entries)
+
+    def remove_last(self, count=1):
+        """
+        Removes the last count entries and returns them, see punch.tasks.undo_tasks.
+        """
+        return undo_tasks(self.path, count)
+
+    def amend_last(self, category=None, task=None, notes=None, time=None):
+        """
+        Changes the last entry and returns the old and the new one, see punch.tasks.amend_task.
+        """
+        return amend_task(self.path, category, task, notes, time)
+
+    def recent_tasks(self, category, limit=RECENT_TASKS_LIMIT, horizon=RECENT_TASKS_HORIZON):
+        """
+        Returns the recent distinct tasks of a category, see punch.tasks.get_recent_tasks.
+        """
+        return get_recent_tasks(self.path, category, limit, horizon)
+
+class SQLiteStorage:
+    """
+    Task log stored in a local SQLite database, with indexes on finish time, category and task.
+    Durations are computed when an entry is inserted (relative to the previous entry of the same day),
+    so queries never have to look at entries outside the requested range.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        dirname = os.path.dirname(self.path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def iter_entries(self, date_from=None, date_to=None, categories=None, include_untracked=False):
+        """
+        Yields the entries between date_from and date_to (inclusive, datetime.date objects or None
+        for an open bound) as TaskEntry objects, using the index on finish time.
+        Like the text backend, tasks ending with '**' or with a duration of 0 are skipped
+        unless include_untracked is True.
+        """
+        conditions = []
+        params = []
+        if not include_untracked:
+            conditions.append(_TRACKED)
+        if date_from is not None:
+            conditions.append("finish >= ?")
+            params.append(date_from.isoformat())
+        if date_to is not None:
+            conditions.append("finish < ?")
+            params.append((date_to + datetime.timedelta(days=1)).isoformat())
+        if categories is not None:
+            categories = list(categories)
+            conditions.append(f"category IN ({', '.join('?' * len(categories))})")
+            params.extend(categories)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                f"SELECT finish, category, task, notes, duration FROM entries {where} ORDER BY finish, id",
+                params,
+            )
+            for row in cursor:
+                yield _row_to_entry(row)
+        finally:
+            conn.close()
+
+    def append(self, category, task, notes, finish=None):
+        """
+        Inserts a new entry. Entries may be inserted out of order: the duration of the
+        following entry of the same day is updated accordingly.
+        """
+        finish = finish or datetime.datetime.now()
+        conn = self._connect()
+        try:
+            with conn:
+                _insert_entry(conn, finish, category, task, notes)
+        finally:
+            conn.close()
+
+    def append_many(self, entries):
+        """
+        Inserts many entries in a single transaction.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                for entry in sorted(entries, key=lambda e: e.finish):
+                    _insert_entry(conn, entry.finish, entry.category, entry.task, entry.notes)
+        finally:
+            conn.close()
+
+    def remove_last(self, count=1):
+        """
+        Removes the last count entries and returns them, oldest first.
+        Raises ValueError if there are fewer than count entries.
+        """
+        if count < 1:
+            raise ValueError("Nothing to undo")
+        conn = self._connect()
+        try:
+            with conn:
+                rows = conn.execute(
+                    "SELECT id, finish, category, task, notes, duration FROM entries ORDER BY finish DESC, id DESC LIMIT ?",
+                    (count,),
+                ).fetchall()
+                if len(rows) < count:
+                    raise ValueError(f"The task database has only {len(rows)} entries")
+                conn.executemany("DELETE FROM entries WHERE id = ?", [(row[0],) for row in rows])
+            return [_row_to_entry(row[1:]) for row in reversed(rows)]
+        finally:
+            conn.close()
+
+    def amend_last(self, category=None, task=None, notes=None, time=None):
+        """
+        Changes whichever of category, task, notes and finish time (a datetime.time,
+        the entry stays on its day) are given of the last entry, with its duration recomputed.
+        Returns the old and the new entry.
+        Raises ValueError if there are no entries or the new time is before the previous entry.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                rows = conn.execute(
+                    "SELECT id, finish, category, task, notes, duration FROM entries ORDER BY finish DESC, id DESC LIMIT 2"
+                ).fetchall()
+                if not rows:
+                    raise ValueError("The task database has no entries")
+                old = _row_to_entry(rows[0][1:])
+                new = TaskEntry(
+                    old.finish if time is None else datetime.datetime.combine(old.finish.date(), time),
+                    old.category if category is None else category,
+                    old.task if task is None else task,
+                    old.notes if notes is None else notes.strip(),
+                    datetime.timedelta(0),
+                )
+                if len(rows) > 1 and new.finish.strftime(_FINISH_FORMAT) < rows[1][1]:
+                    raise ValueError(f"The new time is before the previous entry ({rows[1][1]})")
+                conn.execute("DELETE FROM entries WHERE id = ?", (rows[0][0],))
+                _insert_entry(conn, new.finish, new.category, new.task, new.notes)
+            return old, new
+        finally:
+            conn.close()
+
+    def recent_tasks(self, category, limit=RECENT_TASKS_LIMIT, horizon=RECENT_TASKS_HORIZON):
+        """
+        Returns a list of recent tasks for a given category, with duplicates removed (most recent first),
+        at most limit of them and none finished more than horizon days before the last entry
+        (None disables either bound).
+        """
+        conditions = ["category = ?", _TRACKED]
+        params = [category]
+        if horizon is not None:
+            conditions.append("finish >= (SELECT date(MAX(finish), ?) FROM entries)")
+            params.append(f"-{int(horizon)} days")
+        query = (
+            # SQLite returns the other columns of the row holding MAX(finish)
+            f"SELECT MAX(finish), category, task, notes, duration FROM entries "
+            f"WHERE {' AND '.join(conditions)} GROUP BY task ORDER BY 1 DESC"
+        )
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        conn = self._connect()
+        try:
+            cursor = conn.execute(query, params)
+            return [_row_to_entry(row) for row in cursor]
+        finally:
+            conn.close()
+
+def _row_to_entry(row):
+    finish, category, task, notes, duration = row
+    return TaskEntry(
+        datetime.datetime.strptime(finish, _FINISH_FORMAT),
+        category,
+        task,
+        notes,
+        datetime.timedelta(minutes=duration),
+    )
+
+def _insert_entry(conn, finish, category, task, notes):
+    finish_str = finish.strftime(_FINISH_FORMAT)
+    day_start = finish.date().isoformat()
+    next_day = (finish.date() + datetime.timedelta(days=1)).isoformat()
+
+    prev = conn.execute(
+        "SELECT finish FROM entries WHERE finish <= ? AND finish >= ? ORDER BY finish DESC, id DESC LIMIT 1",
+        (finish_str, day_start),
+    ).fetchone()
+    duration = _minutes_between(prev[0], finish_str) if prev else 0
+    conn.execute(
+        "INSERT INTO entries (finish, category, task, notes, duration) VALUES (?, ?, ?, ?, ?)",
+        (finish_str, category, task, (notes or "").strip(), duration),
+    )
+
+    # A back-dated entry shortens the entry that follows it on the same day
+    following = conn.execute(
+        "SELECT id, finish FROM entries WHERE finish > ? AND finish < ? ORDER BY finish, id LIMIT 1",
+        (finish_str, next_day),
+    ).fetchone()
+    if following:
+        conn.execute(
+            "UPDATE entries SET duration = ? WHERE id = ?",
+            (_minutes_between(finish_str, following[1]), following[0]),
+        )
+
+def _minutes_between(start, end):
+    delta = datetime.datetime.strptime(end, _FINISH_FORMAT) - datetime.datetime.strptime(start, _FINISH_FORMAT)
+    return int(delta.total_seconds() // 60)
+
+def migrate_text_to_sqlite(text_path, db_path):
+    """
+    Bulk-loads every line of the text task log into a new SQLite database in a single transaction.
+    Returns the number of entries loaded.
+    Raises FileExistsError if the database already exists and ValueError if the text log is invalid.
+    """
+    if os.path.exists(db_path):
+        raise FileExistsError(f"{db_path} already exists")
+    rows = (
+        (entry.finish.strftime(_FINISH_FORMAT), entry.category, entry.task, entry.notes,
+         int(entry.duration.total_seconds() // 60))
+        for entry in iter_tasklog(text_path, include_untracked=True)
+    )
+    conn = SQLiteStorage(db_path)._connect()
+    try:
+        with conn:
+            cursor = conn.executemany(
+                "INSERT INTO entries (finish, category, task, notes, duration) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            count = cursor.rowcount
+    except BaseException:
+        conn.close()
+        os.unlink(db_path)
+        raise
+    conn.close()
+    return count
+
+def export_sqlite_to_text(db_path, text_path):
+    """
+    Writes every entry of the SQLite database to a text task log, in chronological order.
+    Returns the number of entries written.
+    Raises FileExistsError if the text log already exists.
+    """
+    count = 0
+    with open(text_path, 'x') as f:
+        for entry in SQLiteStorage(db_path).iter_entries(include_untracked=True):
+            f.write(format_task_line(entry.finish, entry.category, entry.task, entry.notes))
+            count += 1
+    return count
@@ -0,0 +1,84 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+
+from punch.tasks import append_bytes
+
+SUBMISSIONS_FILE = "submissions.jsonl"
+
+def timecard_key(timecard):
+    """
+    Returns the stable key of a TimecardEntry in the submission journal: a hash of its case,
+    start date and time, minutes and description, which together identify a timecard.
+    """
+    fields = [
+        timecard.case_no,
+        f"{timecard.start_date.isoformat()} {timecard.start_time:%H:%M}",
+        str(timecard.minutes),
+        timecard.work_performed,
+    ]
+    return hashlib.sha256("\x1f".join(fields).encode("utf-8")).hexdigest()
+
+class SubmissionJournal:
+    """
+    Append-only record of the timecards saved by punch submit, one JSON object per line.
+    Each line is written with a single O_APPEND write and fsynced as soon as a timecard is saved,
+    so after a crash the journal lists exactly the timecards that made it. A line cut short
+    by a crash is ignored. Safe to record from several submission threads.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._keys = set()
+        # A line cut short must not swallow the next one
+        self._cut_short = False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._keys.add(json.loads(line)["key"])
+                    except (ValueError, KeyError, TypeError):
+                        pass
+                    self._cut_short = not line.endswith("\n")
+        except FileNotFoundError:
+            pass
+
+    def __contains__(self, timecard):
+        return timecard_key(timecard) in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def pending(self, timecards):
+        """
+        Returns the timecards not saved yet, in order.
+        """
+        return [timecard for timecard in timecards if timecard not in self]
+
+    def record(self, timecard):
+        """
+        Records a timecard once it has been saved.
+        """
+        key = timecard_key(timecard)
+        line = json.dumps({
+            "key": key,
+            "case_no": timecard.case_no,
+            "start": f"{timecard.start_date.isoformat()} {timecard.start_time:%H:%M}",
+            "minutes": timecard.minutes,
+            "description": timecard.work_performed,
+            "submitted_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        }, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._cut_short:
+                line = "\n" + line
+                self._cut_short = False
+            append_bytes(self.path, line.encode("utf-8"), fsync=True)
+            self._keys.add(key)
+
+def open_journal(data_dir):
+    """
+    Returns the submission journal kept in the data directory.
+    """
+    return SubmissionJournal(os.path.join(data_dir, SUBMISSIONS_FILE))
@@ -0,0 +1,146 @@
+from array import array
+from bisect import bisect_left, bisect_right
+import datetime
+
+from punch.storage import open_storage
+from punch.tasks import TaskEntry
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+_MINUTES_PER_DAY = 24 * 60
+
+def to_epoch_minutes(dt):
+    """
+    Converts a naive datetime to the number of minutes since 1970-01-01 00:00 (seconds are dropped).
+    """
+    return (dt.toordinal() - _EPOCH_ORDINAL) * _MINUTES_PER_DAY + dt.hour * 60 + dt.minute
+
+def from_epoch_minutes(minutes):
+    """
+    Converts minutes since 1970-01-01 00:00 back to a naive datetime.
+    """
+    days, minutes = divmod(minutes, _MINUTES_PER_DAY)
+    day = datetime.date.fromordinal(_EPOCH_ORDINAL + days)
+    return datetime.datetime(day.year, day.month, day.day, minutes // 60, minutes % 60)
+
+class StringTable:
+    """
+    Interned strings: every distinct string is stored once and referenced by its index.
+    """
+    def __init__(self):
+        self.strings = []
+        self._index = {}
+
+    def intern(self, s):
+        """
+        Returns the index of s, adding it to the table if needed.
+        """
+        idx = self._index.get(s)
+        if idx is None:
+            idx = len(self.strings)
+            self._index[s] = idx
+            self.strings.append(s)
+        return idx
+
+    def __getitem__(self, idx):
+        return self.strings[idx]
+
+    def __len__(self):
+        return len(self.strings)
+
+class TaskLog:
+    """
+    Compact, columnar in-memory task log.
+    Finish times are stored as epoch minutes and durations as integer minutes in array columns,
+    category, task and notes as indices into interned string tables.
+    Entries must be appended in chronological order. TaskEntry objects are only created
+    when an entry is accessed, aggregations work directly on the columns.
+    """
+    def __init__(self):
+        self.finish_minutes = array('q')
+        self.duration_minutes = array('i')
+        self.category_ids = array('I')
+        self.task_ids = array('I')
+        self.notes_ids = array('I')
+        self.categories = StringTable()
+        self.tasks = StringTable()
+        self.notes = StringTable()
+
+    @classmethod
+    def load(cls, taskfile, date_from=None, date_to=None, categories=None, include_untracked=False):
+        """
+        Loads the entries of the task storage for the given range and categories.
+        With include_untracked, tasks ending with '**' and with a duration of 0 are loaded too.
+        """
+        return cls.from_entries(open_storage(taskfile).iter_entries(date_from, date_to, categories, include_untracked))
+
+    @classmethod
+    def from_entries(cls, entries):
+        tasklog = cls()
+        for entry in entries:
+            tasklog.append(entry)
+        return tasklog
+
+    def append(self, entry):
+        """
+        Appends a TaskEntry, which must not finish before the last entry of the log.
+        """
+        finish = to_epoch_minutes(entry.finish)
+        if self.finish_minutes and finish < self.finish_minutes[-1]:
+            raise ValueError(f"Task log not in chronological order: ({entry.finish} < {self[-1].finish})")
+        self.finish_minutes.append(finish)
+        self.duration_minutes.append(int(entry.duration.total_seconds() // 60))
+        self.category_ids.append(self.categories.intern(entry.category))
+        self.task_ids.append(self.tasks.intern(entry.task))
+        self.notes_ids.append(self.notes.intern(entry.notes))
+
+    def __len__(self):
+        return len(self.finish_minutes)
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("TaskLog index out of range")
+        return TaskEntry(
+            from_epoch_minutes(self.finish_minutes[idx]),
+            self.categories[self.category_ids[idx]],
+            self.tasks[self.task_ids[idx]],
+            self.notes[self.notes_ids[idx]],
+            datetime.timedelta(minutes=self.duration_minutes[idx]),
+        )
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def index_range(self, date_from=None, date_to=None):
+        """
+        Returns the (start, stop) indices of the entries finished between date_from and date_to
+        (inclusive, datetime.date objects or None for an open bound), using a binary search
+        on the finish column.
+        """
+        start, stop = 0, len(self)
+        if date_from is not None:
+            start = bisect_left(self.finish_minutes, (date_from.toordinal() - _EPOCH_ORDINAL) * _MINUTES_PER_DAY)
+        if date_to is not None:
+            end_of_day = (date_to.toordinal() - _EPOCH_ORDINAL + 1) * _MINUTES_PER_DAY - 1
+            stop = bisect_right(self.finish_minutes, end_of_day)
+        return start, max(start, stop)
+
+    def rows(self, start=0, stop=None, tracked_only=False):
+        """
+        Yields (category, task, notes, finish, duration_minutes) tuples for the entries in [start, stop),
+        without creating TaskEntry objects. With tracked_only, tasks ending with '**' and with
+        a duration of 0 are skipped.
+        """
+        stop = len(self) if stop is None else stop
+        for idx in range(start, stop):
+            if tracked_only and (self.duration_minutes[idx] <= 0 or self.tasks[self.task_ids[idx]].endswith("**")):
+                continue
+            yield (
+                self.categories[self.category_ids[idx]],
+                self.tasks[self.task_ids[idx]],
+                self.notes[self.notes_ids[idx]],
+                from_epoch_minutes(self.finish_minutes[idx]),
+                self.duration_minutes[idx],
+            )
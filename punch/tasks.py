@@ -1,7 +1,18 @@
-from dataclasses import dataclass
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 import datetime
+import heapq
+import io
+import mmap
 import os
 import re
+import tempfile
+
+from punch.archive import archive_blocks, get_archive_path, has_archive, is_archive, load_index, read_block
+from punch.cache import invalidate_cache, invalidate_rollup, load_cache, save_cache, trim_rollup
+from punch.locking import lock_file, locked, unlock_file
+from punch.segments import get_segment_dir, is_segmented, load_manifest, refresh_segment, segment_name, segment_paths, update_manifest
 
 @dataclass
 class TaskEntry:
@@ -31,52 +42,309 @@ def split_unescaped(s: str, sep: str) -> list[str]:
     # Replace escaped separators (e.g. "\,") with the literal separator
     return [p.replace(f'\\{sep}', sep) for p in parts]
 
-def read_tasklog(taskfile, count_lines=False):
+@dataclass
+class TasklogState:
+    """
+    Everything read_tasklog needs to resume parsing a task log:
+    the entries parsed so far (already filtered), the number of lines and bytes consumed,
+    and the per-day state used to compute durations of the following lines.
+    """
+    entries: list = field(default_factory=list)
+    line_count: int = 0
+    offset: int = 0
+    prev_finish: datetime.datetime | None = None
+    prev_entry_by_day: dict = field(default_factory=dict)
+
+def read_tasklog(taskfile, count_lines=False, use_cache=True):
     """
     Reads the task log from a file and returns a list of TaskEntry objects.
     The first task of each day will have a duration of 0, subsequent tasks will have duration relative to the previous task of that day.
     Removes tasks ending with '**' and with duration == 0.
     If count_lines is True, also returns the total number of lines read (before filtering).
     Checks that all entries are in chronological order by 'finish'.
+    If use_cache is True, the parsed log is kept in a cache next to the task file and
+    only lines appended since the previous call are parsed. The whole log is re-parsed
+    when it was modified in any other way, short of the edits punch.cache.TAIL_DIGEST_BYTES describes.
+    A segmented task log is read segment by segment, each with its own cache.
+    Archived entries (see punch.archive) come first.
+    Lines appended by other processes while the log is being read are left for the next call.
     """
     tasklog = []
-    prev_entry_by_day = {}
     line_count = 0
-    prev_finish = None
-    try:
-        with open(taskfile, 'r') as f:
-            for line in f:
-                line_count += 1
-                entry = parse_task(line, line_count)
-                if prev_finish and entry.finish < prev_finish:
-                    raise ValueError(
-                        f"Task log not in chronological order: line {line_count}: ({entry.finish} < {prev_finish})"
-                    )
-                prev_finish = entry.finish
-                day = entry.finish.date()
-                if day in prev_entry_by_day:
-                    prev_entry = prev_entry_by_day[day]
-                    duration = entry.finish - prev_entry.finish
-                else:
-                    duration = datetime.timedelta(0)
-                # Create a new TaskEntry with the correct duration
-                entry = TaskEntry(entry.finish, entry.category, entry.task, entry.notes, duration)
-                tasklog.append(entry)
-                prev_entry_by_day[day] = entry
-    except FileNotFoundError:
-        pass
-    # Remove tasks ending with '**' and with duration == 0
-    tasklog = [
-        entry for entry in tasklog
-        if entry.duration.total_seconds() > 0 and not entry.task.endswith("**")
-    ]
+    with _snapshot(taskfile) as files:
+        for path, f, st in files:
+            try:
+                state = _read_file_state(path, f, st, use_cache)
+            except ValueError as e:
+                if path == taskfile:
+                    raise
+                raise ValueError(f"{os.path.basename(path)}: {e}") from e
+            tasklog.extend(state.entries)
+            line_count += state.line_count
     if count_lines:
         return tasklog, line_count
     return tasklog
 
+def _read_file_state(path, f, st, use_cache):
+    """
+    Parses a single task log file opened by _snapshot, up to its size in st,
+    resuming from its cache if use_cache is True.
+    Returns the TasklogState after the last line.
+    """
+    state = TasklogState()
+    if use_cache:
+        state = load_cache(path, f, st) or state
+    if state.offset < st.st_size and is_archive(path):
+        _parse_archive_into(state, path, f)
+        if use_cache:
+            save_cache(path, f, st, state)
+    elif state.offset < st.st_size:
+        f.seek(state.offset)
+        complete = _parse_into(state, f, st.st_size)
+        # Never cache a trailing line without a newline, it may still be incomplete
+        if use_cache and complete:
+            save_cache(path, f, st, state)
+    return state
+
+def _parse_archive_into(state, path, f):
+    """
+    Parses the archive blocks starting at or after state.offset, which for an archive
+    is the compressed size already parsed, so blocks appended since the last parse are
+    the only ones decompressed.
+    """
+    for first_line, block in archive_blocks(path):
+        if block["offset"] < state.offset:
+            continue
+        state.line_count = first_line
+        for entry in _iter_parsed(state, io.BytesIO(read_block(f, block))):
+            if _is_tracked(entry):
+                state.entries.append(entry)
+        state.offset = block["offset"] + block["length"]
+
+def _log_files(taskfile, date_from=None, date_to=None):
+    """
+    Returns the files holding the entries of the task log between date_from and date_to,
+    in chronological order: the archive if there is one, then the task file itself
+    or the overlapping monthly segments.
+    """
+    files = [get_archive_path(taskfile)] if has_archive(taskfile) else []
+    if is_segmented(taskfile):
+        return files + segment_paths(taskfile, date_from, date_to)
+    return files + [taskfile]
+
+@contextmanager
+def _snapshot(taskfile, date_from=None, date_to=None):
+    """
+    Opens the files of the task log between date_from and date_to (see _log_files) while holding
+    a shared lock, so no writer is halfway through an append or a rewrite, and yields a list of
+    (path, binary file, os.stat_result) tuples. Readers stop at the size in the stat result,
+    which gives them a consistent snapshot of the log even while lines are being appended.
+    Each file also stays locked (shared) until the files are closed when the block exits,
+    holding back back-dated inserts that would rewrite its tail in place.
+    Appending to the log from the same thread while iterating over a snapshot is fine,
+    inserting a back-dated entry, amending or undoing raises RuntimeError (see lock_file)
+    instead of waiting for the snapshot to be closed.
+    """
+    paths = _log_files(taskfile, date_from, date_to)
+    if not any(os.path.exists(path) for path in paths):
+        # Nothing to read, and no reason to leave a lock file behind
+        yield []
+        return
+    if any(os.path.exists(_get_journal_path(path)) for path in paths):
+        # A writer was interrupted halfway through an insert
+        with locked(taskfile):
+            for path in paths:
+                _recover_tail(path)
+    files = []
+    try:
+        with locked(taskfile, shared=True):
+            for path in paths:
+                try:
+                    f = open(path, 'rb')
+                except FileNotFoundError:
+                    continue
+                files.append((path, f, os.fstat(f.fileno())))
+                lock_file(f, shared=True)
+        yield files
+    finally:
+        for _, f, _ in files:
+            unlock_file(f)
+            f.close()
+
+def iter_tasklog(taskfile, date_from=None, date_to=None, categories=None, include_untracked=False):
+    """
+    Lazily yields the TaskEntry objects of the task log that are finished between date_from
+    and date_to (inclusive, datetime.date objects or None for an open bound) and whose category
+    is in categories (any iterable of category names, None for all categories).
+    Durations are computed while parsing and, like read_tasklog, tasks ending with '**'
+    or with a duration of 0 are skipped, unless include_untracked is True.
+    Reading starts at the first line of date_from, located with a binary search on the
+    memory-mapped log, and stops at the first line finished after date_to.
+    Since the first task of a day always has a duration of 0, starting at a day boundary
+    yields exactly the same durations as a full read.
+    Chronological order is only checked within the range that is read.
+    For a segmented task log only the segments overlapping the range are opened,
+    and only the archive blocks overlapping the range are decompressed.
+    """
+    if categories is not None:
+        categories = set(categories)
+    state = TasklogState()
+    with _snapshot(taskfile, date_from, date_to) as files:
+        for path, f, st in files:
+            try:
+                for entry in _iter_file(path, f, st, state, date_from, date_to):
+                    if not include_untracked and not _is_tracked(entry):
+                        continue
+                    if date_from is not None and entry.finish.date() < date_from:
+                        continue
+                    if categories is not None and entry.category not in categories:
+                        continue
+                    yield entry
+            except ValueError as e:
+                if path == taskfile:
+                    raise
+                raise ValueError(f"{os.path.basename(path)}: {e}") from e
+
+def _iter_file(path, f, st, state, date_from=None, date_to=None):
+    """
+    Yields every entry of a single task log file opened by _snapshot between date_from and date_to,
+    seeking to date_from and stopping after date_to or at the size in st.
+    state carries the previous entry over from the preceding file of a segmented log.
+    """
+    if is_archive(path):
+        for first_line, block in archive_blocks(path, date_from, date_to):
+            state.line_count = first_line
+            yield from _iter_parsed(state, io.BytesIO(read_block(f, block)), until=date_to)
+        return
+    start = 0
+    if date_from is not None:
+        start = _find_day_offset(f, date_from)
+    f.seek(start)
+    state.line_count = 0
+    state.offset = start
+    prev_finish = state.prev_finish
+    try:
+        yield from _iter_parsed(state, f, until=date_to, end=st.st_size)
+    except ValueError:
+        # Report the error with the line number counted from the top of the file
+        recount = TasklogState(line_count=_count_lines(f, start), offset=start, prev_finish=prev_finish)
+        f.seek(start)
+        for _ in _iter_parsed(recount, f, until=date_to, end=st.st_size):
+            pass
+        raise
+
+def read_tasklog_range(taskfile, date_from=None, date_to=None):
+    """
+    Returns the entries yielded by iter_tasklog for the given date range as a list.
+    """
+    return list(iter_tasklog(taskfile, date_from, date_to))
+
+_DATE_PREFIX = re.compile(rb'\d{4}-\d{2}-\d{2}')
+
+def _find_day_offset(f, day):
+    """
+    Returns the byte offset of the first line of the binary file f finished on or after day.
+    """
+    return _find_offset(f, day.isoformat().encode())
+
+def _find_offset(f, key, after=False):
+    """
+    Returns the byte offset of the first line of the binary file f whose timestamp prefix
+    (as long as key, b'YYYY-MM-DD' or b'YYYY-MM-DD HH:MM') is >= key, or > key if after is True.
+    Binary searches the memory-mapped file on line starts, relying on the fixed-width
+    'YYYY-MM-DD HH:MM' prefix of every line and on the log being in chronological order.
+    Falls back to 0 (a scan from the top) if a probed line has no date prefix.
+    """
+    size = os.fstat(f.fileno()).st_size
+    if size == 0:
+        return 0
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        lo, hi = 0, size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            # Start of the line containing mid
+            line_start = mm.rfind(b"\n", 0, mid) + 1
+            prefix = mm[line_start:line_start + len(key)]
+            if not _DATE_PREFIX.fullmatch(prefix[:10]):
+                return 0
+            if prefix < key or (after and prefix == key):
+                line_end = mm.find(b"\n", mid)
+                lo = size if line_end == -1 else line_end + 1
+            else:
+                hi = line_start
+        return lo
+
+def _count_lines(f, offset):
+    """
+    Returns the number of lines in the binary file f before offset.
+    """
+    f.seek(0)
+    count = 0
+    remaining = offset
+    while remaining > 0:
+        chunk = f.read(min(remaining, 1 << 20))
+        if not chunk:
+            break
+        count += chunk.count(b"\n")
+        remaining -= len(chunk)
+    return count
+
+def _parse_into(state, f, end=None):
+    """
+    Parses the lines of the binary file f from its current position (up to end) and adds
+    the entries that count towards reports to state.
+    Returns True if the last line read was terminated by a newline.
+    """
+    for entry in _iter_parsed(state, f, end=end):
+        if _is_tracked(entry):
+            state.entries.append(entry)
+    if state.offset == 0:
+        return True
+    f.seek(state.offset - 1)
+    return f.read(1) == b"\n"
+
+def _iter_parsed(state, f, until=None, end=None):
+    """
+    Parses the lines of the binary file f from its current position and yields every entry
+    with its duration computed from the per-day state, which is updated as lines are consumed.
+    If until is given (a datetime.date), stops at the first line finished after that day.
+    If end is given, stops at the first line reaching past that offset (state.offset being
+    the offset of the current position), i.e. at lines appended after a snapshot was taken.
+    Raises ValueError on malformed lines and on entries out of chronological order.
+    """
+    for raw in f:
+        if end is not None and state.offset + len(raw) > end:
+            return
+        state.line_count += 1
+        entry = parse_task(raw.decode('utf-8'), state.line_count)
+        if until is not None and entry.finish.date() > until:
+            return
+        if state.prev_finish and entry.finish < state.prev_finish:
+            raise ValueError(
+                f"Task log not in chronological order: line {state.line_count}: ({entry.finish} < {state.prev_finish})"
+            )
+        state.prev_finish = entry.finish
+        day = entry.finish.date()
+        if day in state.prev_entry_by_day:
+            prev_entry = state.prev_entry_by_day[day]
+            duration = entry.finish - prev_entry.finish
+        else:
+            duration = _NO_DURATION
+        # parse_task returns a fresh entry, set its duration in place
+        entry.duration = duration
+        state.prev_entry_by_day[day] = entry
+        state.offset += len(raw)
+        yield entry
+
+def _is_tracked(entry):
+    """
+    Returns True if the entry counts towards reports: tasks ending with '**'
+    and tasks with a duration of 0 (e.g. the first task of a day) do not.
+    """
+    return entry.duration.total_seconds() > 0 and not entry.task.endswith("**")
+
 def parse_task(line, line_no=-1):
-    parts = line.strip().split(SEPARATOR)
-    parts = [s.strip() for s in parts]
+    parts = [s.strip() for s in line.split(SEPARATOR)]
     # Handle different possible formats
     if len(parts) == 2:
         finish_str, task = parts
@@ -89,32 +357,106 @@ def parse_task(line, line_no=-1):
         finish_str, category, task, notes = parts[:4]
     else:
         raise ValueError(f"Invalid task entry format: line {line_no}: {line.strip()}")
-    finish = datetime.datetime.strptime(finish_str.strip(), '%Y-%m-%d %H:%M')
-    return TaskEntry(finish, category, task, notes, duration=datetime.timedelta(0))
+    finish = parse_finish(finish_str)
+    return TaskEntry(finish, category, task, notes, duration=_NO_DURATION)
+
+_NO_DURATION = datetime.timedelta(0)
 
-def get_recent_tasks(taskfile, category):
+# Dates already seen by parse_finish, keyed by their 'YYYY-MM-DD' string
+_DAY_CACHE = {}
+_DAY_CACHE_SIZE = 4096
+
+def parse_finish(finish_str):
+    """
+    Parses a 'YYYY-MM-DD HH:MM' timestamp into a datetime.
+    Timestamps in the fixed-width format written by write_task are sliced into integers,
+    with the datetime.date of each day cached, which is much faster than strptime.
+    Anything else goes through datetime.strptime, so both paths accept and reject the same input.
+    """
+    if (len(finish_str) == 16 and finish_str.isascii()
+            and finish_str[4] == '-' and finish_str[7] == '-'
+            and finish_str[10] == ' ' and finish_str[13] == ':'):
+        day = _DAY_CACHE.get(finish_str[:10])
+        if day is None and finish_str[:4].isdigit() and finish_str[5:7].isdigit() and finish_str[8:10].isdigit():
+            day = datetime.date(int(finish_str[:4]), int(finish_str[5:7]), int(finish_str[8:10]))
+            if len(_DAY_CACHE) >= _DAY_CACHE_SIZE:
+                _DAY_CACHE.clear()
+            _DAY_CACHE[finish_str[:10]] = day
+        hours = finish_str[11:13]
+        minutes = finish_str[14:16]
+        if day is not None and hours.isdigit() and minutes.isdigit():
+            return datetime.datetime(day.year, day.month, day.day, int(hours), int(minutes))
+    return datetime.datetime.strptime(finish_str, '%Y-%m-%d %H:%M')
+
+# Bounds of get_recent_tasks, overridden by the recent_tasks_limit and recent_tasks_horizon config keys
+RECENT_TASKS_LIMIT = 50
+RECENT_TASKS_HORIZON = 365
+
+def get_recent_tasks(taskfile, category, limit=RECENT_TASKS_LIMIT, horizon=RECENT_TASKS_HORIZON):
     """
     Returns a list of recent tasks for a given category, with duplicates removed (most recent first).
+    The log is read backwards from the end and reading stops at limit distinct tasks, or at the
+    entries finished more than horizon days before the last entry of the log, so the cost depends on
+    how far back the tasks are, not on the size of the log. None disables either bound.
+    As in read_tasklog, only tasks counting towards reports are returned.
     """
-    tasklog = read_tasklog(taskfile)
     seen = set()
     recent_tasks = []
-    for entry in reversed(tasklog):
-        if entry.category == category and entry.task not in seen:
-            recent_tasks.append(entry)
-            seen.add(entry.task)
+    horizon_start = None
+    # The entry after the current line, whose duration the current line gives
+    newer = None
+    with _snapshot(taskfile) as files:
+        for raw in _iter_lines_reversed(files):
+            entry = parse_task(raw.decode('utf-8'))
+            if newer is None:
+                if horizon is not None:
+                    horizon_start = datetime.datetime.combine(entry.finish.date() - datetime.timedelta(days=horizon), datetime.time.min)
+            else:
+                if entry.finish > newer.finish:
+                    raise ValueError(f"Task log not in chronological order: ({newer.finish} < {entry.finish})")
+                if entry.finish.date() == newer.finish.date():
+                    newer.duration = newer.finish - entry.finish
+                if newer.category == category and newer.task not in seen and _is_tracked(newer):
+                    recent_tasks.append(newer)
+                    seen.add(newer.task)
+                    if limit is not None and len(recent_tasks) >= limit:
+                        break
+            if horizon_start is not None and entry.finish < horizon_start:
+                break
+            newer = entry
     return recent_tasks
 
-def write_task(taskfile, category, task, notes, finish=None):
+def _iter_lines_reversed(files):
     """
-    Writes a new task entry to the task log.
-    If category is empty, omit it from the output.
+    Yields the lines of the files of a snapshot (see _snapshot) from the last one to the first.
     """
-    finish = finish or datetime.datetime.now()
+    for path, f, st in reversed(files):
+        if is_archive(path):
+            for _, block in reversed(archive_blocks(path)):
+                if block["offset"] < st.st_size:
+                    yield from reversed(io.BytesIO(read_block(f, block)).readlines())
+        else:
+            yield from _reverse_lines(f, st.st_size)
 
-    # Ensure the target directory exists
-    os.makedirs(os.path.dirname(taskfile), exist_ok=True)
+def _reverse_lines(f, end, block_size=64 * 1024):
+    """
+    Yields the lines of the binary file f before offset end, last line first, reading backwards in blocks.
+    """
+    rest = b""
+    while end > 0:
+        start = max(0, end - block_size)
+        f.seek(start)
+        lines = io.BytesIO(f.read(end - start) + rest).readlines()
+        end = start
+        # The first line may start in the block before
+        rest = lines.pop(0) if start > 0 else b""
+        yield from reversed(lines)
 
+def format_task_line(finish, category, task, notes):
+    """
+    Formats a task log line, terminated by a newline.
+    If category is empty, omit it from the output.
+    """
     entry_parts = [finish.strftime('%Y-%m-%d %H:%M')]
     if category:
         entry_parts.append(category)
@@ -123,10 +465,352 @@ def write_task(taskfile, category, task, notes, finish=None):
     line = f" {SEPARATOR} ".join(entry_parts)
     if notes and notes.strip():
         line += f" {SEPARATOR} {notes.strip()}"
-    line += "\n"
+    return line + "\n"
 
-    with open(taskfile, 'a') as f:
-        f.write(line)
+def write_task(taskfile, category, task, notes, finish=None):
+    """
+    Writes a new task entry to the task log, or to the segment of its month if the log is segmented.
+    If category is empty, omit it from the output.
+    A back-dated entry is inserted at its place in the log.
+    Safe against concurrent writers: see _commit_lines.
+    """
+    finish = finish or datetime.datetime.now()
+
+    # Ensure the target directory exists
+    os.makedirs(os.path.dirname(taskfile), exist_ok=True)
+
+    line = format_task_line(finish, category, task, notes)
+
+    with locked(taskfile):
+        _check_after_archive(taskfile, line)
+        if is_segmented(taskfile):
+            _commit_segment_lines(taskfile, [line])
+        else:
+            _commit_lines(taskfile, [line])
+
+def write_tasks(taskfile, entries):
+    """
+    Writes many task entries (anything with finish, category, task and notes) in a single pass.
+    If none of them finishes before the last line of the log they are appended with one write,
+    otherwise they are merged into the tail of the log from the first one on, see _commit_lines.
+    Either way the data is fsynced before returning.
+    Entries before the end of the archive raise ValueError.
+    """
+    lines = [format_task_line(e.finish, e.category, e.task, e.notes) for e in sorted(entries, key=lambda e: e.finish)]
+    if not lines:
+        return
+    os.makedirs(os.path.dirname(taskfile), exist_ok=True)
+
+    with locked(taskfile):
+        _check_after_archive(taskfile, lines[0])
+        if is_segmented(taskfile):
+            _commit_segment_lines(taskfile, lines, fsync=True)
+        else:
+            _commit_lines(taskfile, lines, fsync=True)
+
+def undo_tasks(taskfile, count=1):
+    """
+    Removes the last count entries of the task log (of its last segments if the log is segmented)
+    and returns them, oldest first, as TaskEntry objects without durations.
+    The lines are found by reading backwards from the end of the file and cut off in place,
+    so the cost does not depend on the length of the history. Archived entries cannot be undone.
+    Safe against concurrent writers: an append either lands before and is undone, or waits.
+    Raises ValueError if there are fewer than count entries outside the archive.
+    """
+    if count < 1:
+        raise ValueError("Nothing to undo")
+    with locked(taskfile):
+        if not is_segmented(taskfile):
+            removed = _rewrite_tail(taskfile, count, lambda prev, lines: [])
+        else:
+            segments = load_manifest(taskfile)["segments"]
+            total = sum(segment["lines"] for segment in segments)
+            if total < count:
+                raise ValueError(f"The task log has only {total} entries")
+            removed = []
+            for segment in reversed(segments):
+                if len(removed) == count:
+                    break
+                path = os.path.join(get_segment_dir(taskfile), segment["file"])
+                removed[:0] = _rewrite_tail(path, min(segment["lines"], count - len(removed)), lambda prev, lines: [])
+                refresh_segment(taskfile, segment["file"])
+    return [parse_task(line.decode('utf-8')) for line in removed]
+
+def amend_task(taskfile, category=None, task=None, notes=None, time=None):
+    """
+    Rewrites the last entry of the task log in place, changing whichever of category, task,
+    notes and finish time (a datetime.time, the entry stays on its day) are given.
+    Returns the old and the new entry as TaskEntry objects without durations.
+    Raises ValueError if the log is empty or the new time is before the previous entry.
+    """
+    amended = []
+
+    def rewrite(prev, lines):
+        old = parse_task(lines[0].decode('utf-8'))
+        new = TaskEntry(
+            old.finish if time is None else datetime.datetime.combine(old.finish.date(), time),
+            old.category if category is None else category,
+            old.task if task is None else task,
+            old.notes if notes is None else notes.strip(),
+            _NO_DURATION,
+        )
+        line = format_task_line(new.finish, new.category, new.task, new.notes)
+        if prev is not None and line[:16] < prev[:16].decode('utf-8'):
+            raise ValueError(f"The new time is before the previous entry ({prev[:16].decode('utf-8')})")
+        _check_after_archive(taskfile, line)
+        amended[:] = [old, new]
+        return [line.encode('utf-8')]
+
+    with locked(taskfile):
+        if not is_segmented(taskfile):
+            _rewrite_tail(taskfile, 1, rewrite)
+        else:
+            segments = load_manifest(taskfile)["segments"]
+            if not segments:
+                raise ValueError("The task log has no entries")
+            # The day does not change, so neither does the segment
+            _rewrite_tail(os.path.join(get_segment_dir(taskfile), segments[-1]["file"]), 1, rewrite)
+            refresh_segment(taskfile, segments[-1]["file"])
+    return tuple(amended)
+
+def _check_after_archive(taskfile, line):
+    if has_archive(taskfile):
+        archived_until = load_index(get_archive_path(taskfile))["blocks"][-1]["last"]
+        if line[:16] < archived_until:
+            raise ValueError(f"Cannot insert entries before the end of the archive ({archived_until})")
+
+def _commit_segment_lines(taskfile, lines, fsync=False):
+    """
+    Commits sorted, formatted lines to the segments of their months and records them in the manifest.
+    """
+    by_segment = {}
+    for line in lines:
+        by_segment.setdefault(segment_name(line), []).append(line)
+    segment_dir = get_segment_dir(taskfile)
+    for name, segment_lines in by_segment.items():
+        _commit_lines(os.path.join(segment_dir, name), segment_lines, fsync)
+    update_manifest(taskfile, by_segment)
+
+def _commit_lines(path, lines, fsync=False):
+    """
+    Commits sorted, formatted lines to a text log file (the task log or one of its segments).
+    The caller holds the exclusive lock.
+    Lines that do not finish before the last line of the file are appended with a single
+    O_APPEND write, so they land at the end of the file in one piece.
+    Back-dated lines (a late write, or punch add -t with an earlier time) are inserted
+    at their place instead, see _insert_lines, so the log stays in chronological order.
+    """
+    _recover_tail(path)
+    last = _last_timestamp(path)
+    if last is None or lines[0][:16] >= last:
+        append_bytes(path, "".join(lines).encode('utf-8'), fsync)
+    else:
+        _insert_lines(path, lines)
+
+def append_bytes(path, data, fsync=False):
+    """
+    Appends data to the file at path, creating it if needed, with O_APPEND writes, so that it lands
+    at the end of the file even with other processes appending too. With fsync the data is
+    flushed to disk before returning.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            # Regular files only take short writes when the disk is full
+            view = view[os.write(fd, view):]
+        if fsync:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _insert_lines(path, lines):
+    """
+    Inserts sorted, formatted lines into a text log file, rewriting it in place from the
+    first line finished after lines[0], found with a binary search, to the end of the file.
+    The part of the file before is not touched, so the cost depends on how far back
+    the insert goes, not on the size of the log.
+    The original tail is saved in a journal first, so an interrupted rewrite is rolled back
+    by the next reader or writer. The parse cache and the daily rollup are kept up to the start
+    of the day of lines[0].
+    """
+    with open(path, 'r+b') as f:
+        # Wait for readers of the file, they must not see the tail change under them
+        lock_file(f)
+        st = os.fstat(f.fileno())
+        offset = _find_offset(f, lines[0][:16].encode('utf-8'), after=True)
+        day = parse_finish(lines[0][:16]).date()
+        state = _trim_cached_state(path, f, st, day)
+        trim_rollup(path, f, day, _find_day_offset(f, day))
+        f.seek(offset)
+        tail = f.read()
+        _save_journal(path, offset, st.st_size, tail)
+
+        existing = (tail if tail.endswith(b"\n") else tail + b"\n").splitlines(keepends=True) if tail else []
+        # Stable: existing lines go first among lines with the same timestamp
+        merged = heapq.merge(existing, [line.encode('utf-8') for line in lines], key=lambda line: line[:16])
+        f.seek(offset)
+        f.write(b"".join(merged))
+        f.flush()
+        os.fsync(f.fileno())
+        os.unlink(_get_journal_path(path))
+
+        if state is None:
+            invalidate_cache(path)
+        else:
+            save_cache(path, f, os.fstat(f.fileno()), state)
+
+def _rewrite_tail(path, count, rewrite):
+    """
+    Replaces the last count lines of a text log file with the lines returned by rewrite(prev, lines),
+    prev being the line before them (None at the start of the file) and lines the old ones,
+    and returns the old lines. The caller holds the exclusive lock.
+    The lines are found by reading backwards from the end of the file and, as in _insert_lines,
+    the original tail is saved in a journal before the file is rewritten in place from there.
+    Raises ValueError if the file has fewer than count lines.
+    """
+    _recover_tail(path)
+    try:
+        f = open(path, 'r+b')
+    except FileNotFoundError:
+        raise ValueError(f"{os.path.basename(path)} has no entries") from None
+    with f:
+        # Wait for readers of the file, they must not see the tail change under them
+        lock_file(f)
+        st = os.fstat(f.fileno())
+        offset, lines = _read_last_lines(f, count + 1)
+        prev = lines.pop(0) if len(lines) > count else None
+        if len(lines) < count:
+            raise ValueError(f"{os.path.basename(path)} has only {len(lines)} entries")
+        if prev is not None:
+            offset += len(prev)
+        new_lines = rewrite(prev, lines)
+        day = parse_finish(min(line[:16] for line in lines + new_lines).decode('utf-8')).date()
+        state = _trim_cached_state(path, f, st, day)
+        trim_rollup(path, f, day, _find_day_offset(f, day))
+        _save_journal(path, offset, st.st_size, b"".join(lines))
+
+        f.seek(offset)
+        f.write(b"".join(new_lines))
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+        os.unlink(_get_journal_path(path))
+
+        if state is None:
+            invalidate_cache(path)
+        else:
+            save_cache(path, f, os.fstat(f.fileno()), state)
+    return lines
+
+def _read_last_lines(f, count):
+    """
+    Returns the offset of the last count lines of the binary file f and the lines themselves,
+    reading backwards from the end in growing blocks. Fewer lines are returned if the file is shorter.
+    """
+    end = os.fstat(f.fileno()).st_size
+    start = end
+    data = b""
+    block = 4096
+    # count newlines before the one ending the file mark the start of the first line wanted
+    while start > 0 and data.count(b"\n", 0, max(len(data) - 1, 0)) < count:
+        read_from = max(0, start - block)
+        f.seek(read_from)
+        data = f.read(start - read_from) + data
+        start = read_from
+        block *= 2
+    lines = io.BytesIO(data).readlines()[-count:]
+    return end - sum(len(line) for line in lines), lines
+
+def _trim_cached_state(path, f, st, day):
+    """
+    Returns the cached parse state of the file, if still valid, cut back to the first line of day:
+    an insert on day changes the durations of that day and shifts every line after it,
+    but leaves everything before the day as it was. Returns None if there is no usable cache.
+    """
+    state = load_cache(path, f, st)
+    if state is None:
+        return None
+    day_offset = _find_day_offset(f, day)
+    if state.offset <= day_offset:
+        return state
+    f.seek(day_offset)
+    state.line_count -= f.read(state.offset - day_offset).count(b"\n")
+    day_start = datetime.datetime(day.year, day.month, day.day)
+    del state.entries[bisect_left(state.entries, day_start, key=lambda e: e.finish):]
+    state.prev_entry_by_day = {d: e for d, e in state.prev_entry_by_day.items() if d < day}
+    state.prev_finish = max((e.finish for e in state.prev_entry_by_day.values()), default=None)
+    state.offset = day_offset
+    return state
+
+def _get_journal_path(path):
+    path = os.path.abspath(path)
+    return os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.journal")
+
+def _save_journal(path, offset, size, tail):
+    """
+    Atomically saves what is needed to undo a tail rewrite: the offset it starts at,
+    the original size of the file and the original bytes from offset on.
+    """
+    journal_path = _get_journal_path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(journal_path), prefix=".punch-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(f"{offset} {size}\n".encode('ascii'))
+            f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, journal_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def _recover_tail(path):
+    """
+    Rolls back a tail rewrite that was interrupted, if its journal is still there.
+    The caller holds the exclusive lock.
+    """
+    journal_path = _get_journal_path(path)
+    try:
+        with open(journal_path, 'rb') as jf:
+            offset, size = (int(n) for n in jf.readline().split())
+            tail = jf.read()
+    except FileNotFoundError:
+        return
+    with open(path, 'r+b') as f:
+        lock_file(f)
+        f.seek(offset)
+        f.write(tail)
+        f.truncate(size)
+        f.flush()
+        os.fsync(f.fileno())
+    invalidate_cache(path)
+    invalidate_rollup(path)
+    os.unlink(journal_path)
+
+def _last_timestamp(taskfile):
+    """
+    Returns the 'YYYY-MM-DD HH:MM' prefix of the last line of taskfile, None if it is empty or missing.
+    """
+    try:
+        f = open(taskfile, 'rb')
+    except FileNotFoundError:
+        return None
+    with f:
+        end = os.fstat(f.fileno()).st_size
+        block = 4096
+        while end > 0:
+            start = max(0, end - block)
+            f.seek(start)
+            data = f.read(end - start).rstrip(b"\n")
+            line_start = data.rfind(b"\n")
+            if line_start != -1 or start == 0:
+                return data[line_start + 1:line_start + 17].decode('utf-8') or None
+            block *= 2
+    return None
 
 def parse_new_task_string(task_string, categories):
     """
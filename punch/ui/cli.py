@@ -15,15 +15,21 @@ import dateparser
 import yaml
 from rich.console import Console
 
-from punch.commands import get_category_by_short, handle_add, handle_export, handle_help, handle_login, handle_report, handle_start, handle_submit, time_to_current_datetime
-from punch.config import get_config_path, get_tasks_file, load_config
-from punch.tasks import CMDLINE_SEPARATOR, escape_separators, get_recent_tasks, parse_new_task_string, split_unescaped, write_task
+from punch.commands import get_category_by_short, handle_add, handle_amend, handle_archive, handle_browserd, handle_db_export_text, handle_db_migrate, handle_export, handle_help, handle_import, handle_log_segment, handle_log_verify, handle_login, handle_report, handle_rollup_rebuild, handle_rollup_verify, handle_start, handle_submit, handle_undo, time_to_current_datetime
+from punch.config import get_config_path, get_data_dir, get_tasks_file, load_config
+from punch.tasks import CMDLINE_SEPARATOR, RECENT_TASKS_HORIZON, RECENT_TASKS_LIMIT, escape_separators, get_recent_tasks, parse_new_task_string, split_unescaped, write_task
 from punch.ui.interactive import run_interactive_mode
 from punch import __version__, _DISTRIBUTION
 
 app = typer.Typer(help="punch - a CLI tool for managing your tasks")
 config_app = typer.Typer(help="Manage configuration options.")
 app.add_typer(config_app, name="config")
+db_app = typer.Typer(help="Manage the SQLite task storage.")
+app.add_typer(db_app, name="db")
+log_app = typer.Typer(help="Manage the layout of the text task log.")
+app.add_typer(log_app, name="log")
+rollup_app = typer.Typer(help="Manage the daily rollups used by reports.")
+app.add_typer(rollup_app, name="rollup")
 
 HUMAN_DATE_SHORTCUTS = ["today", "yesterday", "tomorrow", "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
 
@@ -90,9 +96,14 @@ def select_from_list(console, items, prompt, style="bold yellow"):
         console.print("Invalid input. Please enter a number.", style="bold red")
         return None
 
-def interactive_mode(categories, tasks_file, selected_category=None):
+def interactive_mode(categories, tasks_file, selected_category=None, config=None):
     """Launch the interactive Textual interface for task entry."""
-    task = run_interactive_mode(categories, tasks_file, selected_category)
+    config = config or {}
+    task = run_interactive_mode(
+        categories, tasks_file, selected_category,
+        recent_limit=config.get('recent_tasks_limit', RECENT_TASKS_LIMIT),
+        recent_horizon=config.get('recent_tasks_horizon', RECENT_TASKS_HORIZON),
+    )
     if task is None:
         raise typer.Exit(1)
     return task
@@ -196,10 +207,10 @@ def add(
     console = Console()
 
     if task_args is None:
-        task = interactive_mode(categories, tasks_file)
+        task = interactive_mode(categories, tasks_file, config=config)
     elif (cn := resolve_category(task_str, categories, console)) is not None:
         _, name = cn
-        task = interactive_mode(categories, tasks_file, name)
+        task = interactive_mode(categories, tasks_file, name, config)
     else:
         task = parse_new_task_string(task_str, categories)
 
@@ -213,6 +224,42 @@ def add(
         console
     )
 
+@app.command()
+def amend(
+    time: Annotated[str | None, typer.Option("-t", "--time", help="Change the finish time (HH:MM), the day stays the same")] = None,
+    notes: Annotated[str | None, typer.Option("--notes", help="Change only the notes")] = None,
+    task_args: Annotated[list[str] | None, typer.Argument(help="<category> : <task> [: <notes>] replacing the last entry's")] = None,
+    verbose: Annotated[bool, typer.Option("-v", "--verbose", help="Enable verbose output")] = False,
+):
+    """
+    Change the last task in place.
+    """
+    config = load_config(get_config_path())
+    categories = config.get('categories', {})
+    console = Console()
+
+    if task_args is None and time is None and notes is None:
+        typer.secho("Nothing to amend: pass a task, --notes or --time.", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+    try:
+        task = parse_new_task_string(" ".join([escape_separators(s) for s in task_args]), categories) if task_args else None
+        finish_time = datetime.strptime(time, "%H:%M").time() if time else None
+    except ValueError as e:
+        typer.secho(f"Invalid amend arguments: {e}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+
+    handle_amend(SimpleNamespace(task=task, notes=notes, time=finish_time, verbose=verbose), get_tasks_file(), console)
+
+@app.command()
+def undo(
+    count: int = typer.Argument(1, min=1, help="Number of entries to remove"),
+):
+    """
+    Remove the last task(s).
+    """
+    console = Console()
+    handle_undo(SimpleNamespace(count=count), get_tasks_file(), console)
+
 
 def resolve_category(task_str, categories, console):
     match split_unescaped(task_str, CMDLINE_SEPARATOR):
@@ -222,6 +269,14 @@ def resolve_category(task_str, categories, console):
                 return cat_full, name
 
 
+def split_list_option(value: Optional[str]) -> Optional[list[str]]:
+    """
+    Splits a comma-separated option value ("week, category") into a list, None if not given.
+    """
+    if value is None:
+        return None
+    return [item.strip().lower() for item in value.split(",") if item.strip()]
+
 def resolve_date_range(day: Optional[str], from_date: Optional[str], to_date: Optional[str], ctx_name: str = "report"):
     """
     Validate and resolve day/from_date/to_date logic for report/export/submit commands.
@@ -271,12 +326,31 @@ def report(
         None, "-t", "--to", help="End date for the report (defaults to today if --from is given).",
         callback=check_human_date
     ),
+    parallel: bool = typer.Option(
+        False, "--parallel", help="Parse the task log entries with several processes instead of summing the daily rollups",
+    ),
+    by: Optional[str] = typer.Option(
+        None, "--by", help="Group by a comma-separated list of: day, week, month, category, task, notes",
+    ),
+    metrics: str = typer.Option(
+        "sum", "--metrics", help="Comma-separated metrics of the minutes of each group: sum, count, min, max",
+    ),
+    collapse: bool = typer.Option(
+        True, "--collapse/--no-collapse", help="Sum the entries of each task, or list every entry with its notes",
+    ),
+    plain: bool = typer.Option(
+        False, "--plain", help="Print tab-separated lines without markup, totals or pager",
+    ),
 ):
     """
     Show report for a specific day or date range.
     """
     day_obj, from_obj, to_obj = resolve_date_range(day, from_date, to_date, ctx_name="report")
-    parser_args = SimpleNamespace(day=day_obj, from_=from_obj, to=to_obj)
+    parser_args = SimpleNamespace(
+        day=day_obj, from_=from_obj, to=to_obj, parallel=parallel,
+        by=split_list_option(by), metrics=split_list_option(metrics),
+        collapse=collapse, plain=plain,
+    )
     tasks_file = get_tasks_file()
     console = Console()
     handle_report(parser_args, tasks_file, console)
@@ -286,19 +360,43 @@ def export(
     day: str = typer.Option(None, "-d", "--day", help="Specify a single day for the report (sets --from and --to to this date)", callback=check_human_date),
     from_: str = typer.Option(None, "-f", "--from", help="Specify the start date for the export (YYYY-MM-DD)", callback=check_valid_date),
     to: str = typer.Option(None, "-t", "--to", help="Specify the end date for the export (YYYY-MM-DD)", callback=check_valid_date),
-    format: str = typer.Option("json", "--format", help="Specify the format for export", show_choices=True, case_sensitive=False),
+    format: str = typer.Option("json", "--format", help="Specify the format for export: json, ndjson or csv", show_choices=True, case_sensitive=False),
     output: str = typer.Option(None, "-o", "--output", help="Specify the output file for export"),
+    gzip: bool = typer.Option(False, "--gzip", help="Compress the export with gzip (implied by an output file ending in .gz)"),
+    since_last: str = typer.Option(None, "--since-last", metavar="NAME", help="Only export the entries added since the last export with this watermark name"),
+    parallel: Optional[bool] = typer.Option(None, "--parallel/--no-parallel", help="Parse the task log with several processes into memory instead of streaming it (by default only for large ranges)"),
     verbose: bool = typer.Option(False, "-v", "--verbose", help="Enable verbose output"),
 ):
     """
     Export tasks for a specific day or date range.
     """
+    if since_last and (day or from_ or to):
+        typer.secho("Use either --since-last or --day/--from/--to, not both in export.", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
     day_obj, from_obj, to_obj = resolve_date_range(day, from_, to, ctx_name="export")
-    parser_args = SimpleNamespace(day=day_obj, from_=from_obj, to=to_obj, format=format, output=output, verbose=verbose)
+    parser_args = SimpleNamespace(
+        day=day_obj, from_=from_obj, to=to_obj, format=format.lower(), output=output, gzip=gzip,
+        since_last=since_last, parallel=parallel, verbose=verbose,
+    )
     tasks_file = get_tasks_file()
     console = Console()
     handle_export(parser_args, tasks_file, console)
 
+@app.command("import")
+def import_cmd(
+    input: str = typer.Argument("-", help="File to import, '-' for stdin"),
+    format: str = typer.Option("json", "--format", help="Input format: json, ndjson, csv (as written by export) or lines (task log lines)", case_sensitive=False),
+    dry_run: bool = typer.Option(False, "-n", "--dry-run", help="Validate and show what would be written without changing the task log"),
+    verbose: bool = typer.Option(False, "-v", "--verbose", help="Enable verbose output"),
+):
+    """
+    Import tasks in bulk, merged into the task log in chronological order.
+    """
+    config = load_config(get_config_path())
+    console = Console()
+    parser_args = SimpleNamespace(input=input, format=format.lower(), dry_run=dry_run, verbose=verbose or dry_run)
+    handle_import(parser_args, config, get_tasks_file(), console)
+
 @app.command()
 def login(
     verbose: bool = typer.Option(False, "-v", "--verbose", help="Enable verbose output"),
@@ -310,6 +408,20 @@ def login(
     console = Console()
     handle_login(SimpleNamespace(verbose=verbose), config, console)
 
+@app.command()
+def browserd(
+    headed: bool = typer.Option(False, "--headed", help="Run the browser in headed mode, needed to log in through it"),
+    status: bool = typer.Option(False, "--status", help="Show whether punch browserd is running"),
+    stop: bool = typer.Option(False, "--stop", help="Stop the running punch browserd"),
+    verbose: bool = typer.Option(False, "-v", "--verbose", help="Enable verbose output"),
+):
+    """
+    Keep a logged in browser running for login and submit, until stopped.
+    """
+    config = load_config(get_config_path())
+    console = Console()
+    handle_browserd(SimpleNamespace(headed=headed, status=status, stop=stop, verbose=verbose), config, console)
+
 @app.command()
 def submit(
     day: str = typer.Option(None, "-d", "--day", help="Specify a single day for the report (sets --from and --to to this date)", callback=check_human_date),
@@ -319,18 +431,32 @@ def submit(
     headed: bool = typer.Option(False, "--headed", help="Run the browser in headed mode"),
     interactive: bool = typer.Option(False, "-i", "--interactive", help="Run in interactive mode (implies --headed)"),
     sleep: float = typer.Option(0, "--sleep", help="Sleep for X seconds after filling out the form"),
+    force: bool = typer.Option(False, "--force", help="Submit timecards again even if the submission journal has them as saved"),
+    backend: Optional[str] = typer.Option(None, "--backend", help="Submission backend: browser or http (default: submit_backend from the config, or browser)"),
+    workers: Optional[int] = typer.Option(None, "-w", "--workers", min=1, help="Number of browsers submitting timecards at once (default: submit_workers from the config, or 1)"),
     verbose: bool = typer.Option(False, "-v", "--verbose", help="Enable verbose output"),
 ):
     """
     Submit timecards for a specific day or date range to SF.
     """
     day_obj, from_obj, to_obj = resolve_date_range(day, from_, to, ctx_name="submit")
-    parser_args = SimpleNamespace(day=day_obj, from_=from_obj, to=to_obj, dry_run=dry_run, headed=headed, interactive=interactive, sleep=sleep, verbose=verbose)
+    parser_args = SimpleNamespace(day=day_obj, from_=from_obj, to=to_obj, dry_run=dry_run, headed=headed, interactive=interactive, sleep=sleep, workers=workers, force=force, backend=backend, verbose=verbose)
     config = load_config(get_config_path())
     tasks_file = get_tasks_file()
     console = Console()
     handle_submit(parser_args, config, tasks_file, console)
 
+@app.command()
+def archive(
+    before: str = typer.Option(..., "-b", "--before", help="Archive the entries finished before this date (YYYY-MM-DD)", callback=check_valid_date),
+    verbose: bool = typer.Option(False, "-v", "--verbose", help="Enable verbose output"),
+):
+    """
+    Move old entries into a compressed archive, still included in reports and exports.
+    """
+    console = Console()
+    handle_archive(SimpleNamespace(before=valid_date(before), verbose=verbose), get_tasks_file(), console)
+
 @config_app.command("show")
 def config_show(
     verbose: bool = typer.Option(False, "-v", "--verbose", help="Enable verbose output"),
@@ -394,6 +520,56 @@ def config_wizard(
     config_data = load_config(config_path)
     from punch.commands import run_config_wizard
     run_config_wizard(config_data, config_path)
+
+@db_app.command("migrate")
+def db_migrate(
+    verbose: bool = typer.Option(False, "-v", "--verbose", help="Enable verbose output"),
+):
+    """Move the text task log into an indexed SQLite database."""
+    console = Console()
+    handle_db_migrate(SimpleNamespace(verbose=verbose), get_data_dir(), console)
+
+@db_app.command("export-text")
+def db_export_text(
+    output: str = typer.Option(None, "-o", "--output", help="Write the text log to this file instead of switching back to the text storage"),
+    verbose: bool = typer.Option(False, "-v", "--verbose", help="Enable verbose output"),
+):
+    """Convert the SQLite task database back to a text task log."""
+    console = Console()
+    handle_db_export_text(SimpleNamespace(output=output, verbose=verbose), get_data_dir(), console)
+
+@log_app.command("segment")
+def log_segment(
+    verbose: bool = typer.Option(False, "-v", "--verbose", help="Enable verbose output"),
+):
+    """Split the task log into one file per month plus a manifest."""
+    console = Console()
+    handle_log_segment(SimpleNamespace(verbose=verbose), get_tasks_file(), console)
+
+@log_app.command("verify")
+def log_verify(
+    verbose: bool = typer.Option(False, "-v", "--verbose", help="Enable verbose output"),
+):
+    """Check the monthly segments against the manifest."""
+    console = Console()
+    handle_log_verify(SimpleNamespace(verbose=verbose), get_tasks_file(), console)
+
+@rollup_app.command("verify")
+def rollup_verify(
+    verbose: bool = typer.Option(False, "-v", "--verbose", help="Enable verbose output"),
+):
+    """Compare the daily rollups with a full recompute from the task log."""
+    console = Console()
+    handle_rollup_verify(SimpleNamespace(verbose=verbose), get_tasks_file(), console)
+
+@rollup_app.command("rebuild")
+def rollup_rebuild(
+    verbose: bool = typer.Option(False, "-v", "--verbose", help="Enable verbose output"),
+):
+    """Recompute the daily rollups from scratch."""
+    console = Console()
+    handle_rollup_rebuild(SimpleNamespace(verbose=verbose), get_tasks_file(), console)
+
 @app.command("help")
 def help_cmd(
     ctx: typer.Context,
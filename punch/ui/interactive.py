@@ -8,7 +8,8 @@ from textual.widgets import Header, Footer, Button, Static, ListItem, ListView,
 from textual.screen import ModalScreen
 from rich.console import Console
 
-from punch.tasks import TaskEntry, get_recent_tasks, write_task
+from punch.storage import open_storage
+from punch.tasks import RECENT_TASKS_HORIZON, RECENT_TASKS_LIMIT, TaskEntry
 
 
 class NewTaskScreen(ModalScreen):
@@ -164,11 +165,16 @@ class InteractiveApp(App[TaskEntry]):
         ("escape", "quit", "Quit"),
     ]
     
-    def __init__(self, categories, tasks_file, selected_category=None):
+    def __init__(self, categories, tasks_file, selected_category=None,
+                 recent_limit=RECENT_TASKS_LIMIT, recent_horizon=RECENT_TASKS_HORIZON):
         super().__init__()
         self.categories = categories
         self.tasks_file = tasks_file
         self.selected_category = selected_category
+        self.recent_limit = recent_limit
+        self.recent_horizon = recent_horizon
+        # Recent task names per category, looked up once for the lifetime of the app
+        self._recent_task_names = {}
         self.current_stage = "categories" if not selected_category else "tasks"
         self.selected_task = None
         
@@ -215,11 +221,7 @@ class InteractiveApp(App[TaskEntry]):
         content.mount(Static(f"Tasks in '{self.selected_category}':", classes="info"))
         
         # Get recent tasks
-        if self.selected_category:
-            tasks = get_recent_tasks(self.tasks_file, self.selected_category)
-            task_names = [task.task for task in tasks]
-        else:
-            task_names = []
+        task_names = self.recent_task_names(self.selected_category) if self.selected_category else []
         
         # Create ListView and mount it first
         list_view = ListView()
@@ -235,6 +237,12 @@ class InteractiveApp(App[TaskEntry]):
         # Focus the ListView so user can navigate immediately
         list_view.focus()
     
+    def recent_task_names(self, category):
+        if category not in self._recent_task_names:
+            tasks = open_storage(self.tasks_file).recent_tasks(category, self.recent_limit, self.recent_horizon)
+            self._recent_task_names[category] = [task.task for task in tasks]
+        return self._recent_task_names[category]
+    
     def on_list_view_selected(self, event: ListView.Selected) -> None:
         selected_item = event.list_view.highlighted_child
         if selected_item is None:
@@ -253,8 +261,7 @@ class InteractiveApp(App[TaskEntry]):
             if not self.selected_category:
                 return
                 
-            tasks = get_recent_tasks(self.tasks_file, self.selected_category)
-            task_names = [task.task for task in tasks]
+            task_names = self.recent_task_names(self.selected_category)
             
             if index == len(task_names):  # "Add new task" option
                 self.push_screen(NewTaskScreen(), self.on_new_task_result)
@@ -285,7 +292,8 @@ class InteractiveApp(App[TaskEntry]):
         self.exit()
 
 
-def run_interactive_mode(categories, tasks_file, selected_category=None):
+def run_interactive_mode(categories, tasks_file, selected_category=None,
+                         recent_limit=RECENT_TASKS_LIMIT, recent_horizon=RECENT_TASKS_HORIZON):
     """Launch the interactive Textual interface for task entry."""
-    app = InteractiveApp(categories, tasks_file, selected_category)
+    app = InteractiveApp(categories, tasks_file, selected_category, recent_limit, recent_horizon)
     return app.run()
\ No newline at end of file
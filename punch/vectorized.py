@@ -0,0 +1,150 @@
+import datetime
+import math
+
+try:
+    import numpy as np
+except ImportError:  # optional, pip install punch[numpy]
+    np = None
+
+from punch.tasklog import _EPOCH_ORDINAL, _MINUTES_PER_DAY, from_epoch_minutes
+
+# Set to False to force the pure-Python loops even when NumPy is installed
+ENABLED = True
+
+def available():
+    """
+    Returns True if TaskLog aggregations and exports run on NumPy arrays.
+    """
+    return ENABLED and np is not None
+
+class TaskArrays:
+    """
+    NumPy views of the columns of a TaskLog (no copy is made) plus, per interned string,
+    whether the task ends with '**' and whether the notes are not empty.
+    """
+    def __init__(self, tasklog):
+        self.tasklog = tasklog
+        self.finish = _view(tasklog.finish_minutes)
+        self.duration = _view(tasklog.duration_minutes)
+        self.category_ids = _view(tasklog.category_ids)
+        self.task_ids = _view(tasklog.task_ids)
+        self.notes_ids = _view(tasklog.notes_ids)
+        self.untracked_tasks = np.array([task.endswith("**") for task in tasklog.tasks.strings], dtype=bool)
+        self.has_notes = np.array([bool(notes) for notes in tasklog.notes.strings], dtype=bool)
+
+    def select(self, date_from=None, date_to=None):
+        """
+        Returns the indices of the entries finished between date_from and date_to that count
+        towards reports: the range is found with searchsorted on the finish column, then
+        entries with no duration or a task ending with '**' are masked out.
+        """
+        start, stop = 0, len(self.finish)
+        if date_from is not None:
+            start = np.searchsorted(self.finish, _day_minutes(date_from), side="left")
+        if date_to is not None:
+            stop = np.searchsorted(self.finish, _day_minutes(date_to) + _MINUTES_PER_DAY - 1, side="right")
+        stop = max(start, stop)
+        tracked = self.duration[start:stop] > 0
+        if len(self.untracked_tasks):
+            tracked &= ~self.untracked_tasks[self.task_ids[start:stop]]
+        return np.flatnonzero(tracked) + start
+
+def group_totals(tasklog, date_from=None, date_to=None, by=("category", "task")):
+    """
+    Yields the (day, category, task, notes, minutes, count, min minutes, max minutes) partial
+    totals of punch.report._iter_totals, one per distinct value of the fields in by, computed
+    with np.unique and bincount over the entries in range.
+    day is the day, Monday or first of the month the group's date fields are taken from
+    (None when not grouping by date), notes a string only telling whether the entry had notes.
+    """
+    arrays = TaskArrays(tasklog)
+    idx = arrays.select(date_from, date_to)
+    if not len(idx):
+        return
+    minutes = arrays.duration[idx].astype(np.int64)
+    days = arrays.finish[idx] // _MINUTES_PER_DAY
+    date_fields = {"day", "week", "month"} & set(by)
+    if date_fields == {"week"}:
+        # 1970-01-01 was a Thursday
+        days = days - (days + 3) % 7
+    elif date_fields == {"month"}:
+        days = days.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    columns = {
+        "day": days,
+        "category": arrays.category_ids[idx],
+        "task": arrays.task_ids[idx],
+        "notes": arrays.has_notes[arrays.notes_ids[idx]] if len(arrays.has_notes) else np.zeros(len(idx), dtype=bool),
+    }
+    names = ["day"] if date_fields else []
+    names += [name for name in ("category", "task", "notes") if name in by]
+    keys, inverse = _group([columns[name].astype(np.int64) for name in names], len(idx))
+
+    # Sums of integers below 2**53 are exact in the float64 weights of bincount
+    sums = np.bincount(inverse, weights=minutes, minlength=len(keys)).astype(np.int64)
+    counts = np.bincount(inverse, minlength=len(keys))
+    lows = np.full(len(keys), np.iinfo(np.int64).max)
+    highs = np.full(len(keys), np.iinfo(np.int64).min)
+    np.minimum.at(lows, inverse, minutes)
+    np.maximum.at(highs, inverse, minutes)
+
+    strings = {"category": tasklog.categories.strings, "task": tasklog.tasks.strings}
+    for key, total in zip(keys.tolist(), zip(sums.tolist(), counts.tolist(), lows.tolist(), highs.tolist())):
+        fields = dict(zip(names, key))
+        day = fields.get("day")
+        yield (
+            None if day is None else _to_date(day),
+            strings["category"][fields["category"]] if "category" in fields else None,
+            strings["task"][fields["task"]] if "task" in fields else None,
+            "*" if fields.get("notes") else "",
+        ) + total
+
+def iter_rows(tasklog, date_from=None, date_to=None):
+    """
+    Yields the (category, task, notes, finish, duration_minutes) rows of TaskLog.rows for the
+    entries selected by TaskArrays.select, reading each column in one go.
+    """
+    arrays = TaskArrays(tasklog)
+    idx = arrays.select(date_from, date_to)
+    categories = tasklog.categories.strings
+    tasks = tasklog.tasks.strings
+    notes = tasklog.notes.strings
+    for category_id, task_id, notes_id, finish, minutes in zip(
+        arrays.category_ids[idx].tolist(),
+        arrays.task_ids[idx].tolist(),
+        arrays.notes_ids[idx].tolist(),
+        arrays.finish[idx].tolist(),
+        arrays.duration[idx].tolist(),
+    ):
+        yield categories[category_id], tasks[task_id], notes[notes_id], from_epoch_minutes(finish), minutes
+
+def _group(columns, count):
+    """
+    Returns (keys, inverse): the distinct rows of the columns as a (groups, len(columns)) array
+    and the group of every entry. The columns are packed into one int64 code per entry so that
+    a single 1-D np.unique sorts them, unless the code could overflow.
+    """
+    if not columns:
+        return np.zeros((1, 0), dtype=np.int64), np.zeros(count, dtype=np.intp)
+    lows = [column.min() for column in columns]
+    radixes = [int(column.max() - low) + 1 for column, low in zip(columns, lows)]
+    if math.prod(radixes) >= 2**63:
+        keys, inverse = np.unique(np.stack(columns, axis=1), axis=0, return_inverse=True)
+        return keys, inverse.reshape(-1)
+    codes = np.zeros(count, dtype=np.int64)
+    for column, low, radix in zip(columns, lows, radixes):
+        codes = codes * radix + (column - low)
+    codes, inverse = np.unique(codes, return_inverse=True)
+    keys = np.empty((len(codes), len(columns)), dtype=np.int64)
+    for i in reversed(range(len(columns))):
+        codes, keys[:, i] = np.divmod(codes, radixes[i])
+        keys[:, i] += lows[i]
+    return keys, inverse.reshape(-1)
+
+def _view(column):
+    return np.frombuffer(column, dtype=column.typecode)
+
+def _day_minutes(day):
+    return (day.toordinal() - _EPOCH_ORDINAL) * _MINUTES_PER_DAY
+
+def _to_date(days):
+    return datetime.date.fromordinal(_EPOCH_ORDINAL + days)
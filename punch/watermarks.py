@@ -0,0 +1,111 @@
+import datetime
+import json
+import os
+
+from punch.archive import is_archive
+from punch.cache import tail_digest
+from punch.locking import locked
+from punch.segments import _write_json_atomic
+from punch.tasks import TaskEntry, TasklogState, _is_tracked, _iter_file, _iter_parsed, _snapshot, parse_finish
+
+WATERMARKS_VERSION = 1
+
+def get_watermarks_path(taskfile):
+    """
+    Returns the path of the named export watermarks of taskfile, a hidden file next to it.
+    """
+    taskfile = os.path.abspath(taskfile)
+    return os.path.join(os.path.dirname(taskfile), f".{os.path.basename(taskfile)}.watermarks")
+
+def load_watermarks(taskfile):
+    """
+    Returns {name: watermark} for the task log, where a watermark records how far an
+    incremental export has read: {"file", "offset", "last_finish", "tail_digest"}, file being
+    the name of the log file (the task file or a segment) the byte offset is in and last_finish
+    the 'YYYY-MM-DD HH:MM' timestamp of the line before it.
+    """
+    try:
+        with open(get_watermarks_path(taskfile), 'r') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if data.get("version") != WATERMARKS_VERSION:
+        raise ValueError(f"Unsupported watermarks version: {data.get('version')}")
+    return data["watermarks"]
+
+def save_watermark(taskfile, name, watermark):
+    """
+    Atomically records the watermark of name, keeping the other ones.
+    """
+    with locked(taskfile):
+        watermarks = load_watermarks(taskfile)
+        watermarks[name] = watermark
+        _write_json_atomic(get_watermarks_path(taskfile), {"version": WATERMARKS_VERSION, "watermarks": watermarks})
+
+def iter_since(taskfile, watermark, mark):
+    """
+    Yields the entries counting towards reports that were added to the text task log after
+    watermark (None for the whole log), then fills the dict mark with the watermark of
+    everything read, to be saved once the entries are safely exported.
+    Parsing resumes at the stored byte offset with the last finish time as the previous entry,
+    so a line appended to the same day gets its duration from the last line already read.
+    If the log was rewritten before the offset (a back-dated insert, an amend, an undo or
+    archiving), entries finished after last_finish are yielded instead and mark["rewritten"]
+    is set: lines inserted before it are not picked up.
+    """
+    rewritten = False
+    with _snapshot(taskfile) as files:
+        state = TasklogState()
+        resume = None
+        if watermark is not None:
+            last_finish = parse_finish(watermark["last_finish"])
+            resume = _find_resume(files, watermark)
+            rewritten = resume is None
+        last = None
+        for idx, (path, f, st) in enumerate(files):
+            if resume is not None and idx < resume:
+                continue
+            if resume == idx:
+                # The previous line may be on the same day as the next one
+                prev = TaskEntry(last_finish, "", "", "", datetime.timedelta(0))
+                state = TasklogState(offset=watermark["offset"], prev_finish=last_finish,
+                                     prev_entry_by_day={last_finish.date(): prev})
+                f.seek(watermark["offset"])
+                entries = _iter_parsed(state, f, end=st.st_size)
+            elif rewritten:
+                entries = (
+                    entry for entry in _iter_file(path, f, st, state, last_finish.date())
+                    if entry.finish > last_finish
+                )
+            else:
+                entries = _iter_file(path, f, st, state)
+            for entry in entries:
+                if _is_tracked(entry):
+                    yield entry
+            last = (path, f, st)
+        if last is None or state.prev_finish is None:
+            # Nothing was read
+            mark.update(watermark or {})
+        else:
+            path, f, st = last
+            offset = st.st_size if is_archive(path) else state.offset
+            mark.update(
+                file=os.path.basename(path),
+                offset=offset,
+                last_finish=f"{state.prev_finish:%Y-%m-%d %H:%M}",
+                tail_digest=tail_digest(f, offset),
+            )
+    if rewritten:
+        mark["rewritten"] = True
+
+def _find_resume(files, watermark):
+    """
+    Returns the index in files of the text file the watermark's offset is still valid in,
+    or None if that part of the log was rewritten since.
+    """
+    for idx, (path, f, st) in enumerate(files):
+        if os.path.basename(path) != watermark["file"] or is_archive(path):
+            continue
+        if watermark["offset"] <= st.st_size and tail_digest(f, watermark["offset"]) == watermark["tail_digest"]:
+            return idx
+    return None
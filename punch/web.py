@@ -1,9 +1,12 @@
 from dataclasses import dataclass
 import os
 from pathlib import Path
+import queue
+import threading
 import time
-from playwright.sync_api import sync_playwright, Error as playwright_error
-from punch.tasks import read_tasklog
+from playwright.sync_api import sync_playwright, Error as playwright_error, TimeoutError as playwright_timeout
+from punch import browserd
+from punch.storage import open_storage
 import datetime
 from rich.progress import Progress, BarColumn, TextColumn, TimeElapsedColumn
 from rich.console import Console
@@ -13,6 +16,30 @@ import sys
 
 DRY_RUN_SUFFIX = " (dry run)"
 
+# Number of browsers submitting timecards at once, overridden by the submit_workers config key
+SUBMIT_WORKERS = 1
+
+# Attempts at each timecard in a parallel submission before giving up on it
+SUBMIT_ATTEMPTS = 3
+
+PROGRESS_WIDTH = 30  # Constant for progress description width
+
+# Milliseconds to wait for a combobox option to show up or go away
+COMBO_TIMEOUT = 10000
+
+# Milliseconds to wait for Salesforce to confirm a timecard was saved
+SAVE_TIMEOUT = 30000
+
+# True once the success toast shows up or the form was cleared for the next timecard,
+# while a validation error keeps the filled in form open
+_SAVED_JS = """() => {
+    if (document.querySelector('.forceToastMessage.slds-theme--success, .slds-notify_toast.slds-theme_success')) {
+        return true;
+    }
+    const description = document.querySelector("textarea[maxlength='255']");
+    return description !== null && description.value === '';
+}"""
+
 @dataclass
 class TimecardEntry:
     case_no: str
@@ -32,6 +59,9 @@ class MissingTimecardsUrl(Exception):
 class AuthFileNotFoundError(Exception):
     pass
 
+class SaveFailedError(Exception):
+    pass
+
 def get_timecards_link(config):
     """
     Fetch the timecards link from config, or raise if not set.
@@ -57,9 +87,25 @@ def log_redirects(request):
         )
 
 def login_to_site(config, verbose=False):
+    """
+    Logs in in a browser window and saves the session to auth.json, in the window of
+    punch browserd if it is running headed.
+    """
     console = Console()
     auth_json_path = get_auth_json_path()
     timecards_link = get_timecards_link(config)
+    daemon = browserd.connect()
+    if daemon is not None and not daemon.headless:
+        console.print("[cyan]Logging in through punch browserd[/cyan]")
+        try:
+            for message in daemon.login(config):
+                if message["event"] == "waiting":
+                    console.print(f"[cyan]Waiting for login at {message['url']}...[/cyan]")
+            console.print("[green]Login successful.[/green]")
+            console.print("[green]Login saved to auth.json[/green]")
+            return
+        except (browserd.BrowserdError, OSError) as e:
+            console.print(f"[yellow]punch browserd failed to log in ({e}), starting a new browser[/yellow]")
     with sync_playwright() as p:
         browser = p.firefox.launch(headless=False)
         if os.path.exists(auth_json_path):
@@ -84,20 +130,21 @@ def login_to_site(config, verbose=False):
 
         browser.close()
 
-def select_from_combo(page, value, placeholder, xpath):
+def select_from_combo(page, value, placeholder, xpath, timeout=COMBO_TIMEOUT):
     """
     Select an item from a Lightning combobox by filling the input, clicking, and selecting the matching element.
+    Waits for readiness signals instead of fixed sleeps: the matching option only shows up in
+    the listbox once the search request for value has returned, and the listbox closes once
+    the selection has been applied. Each wait gives up after timeout milliseconds.
     """
     input_box = page.locator(f'input[placeholder="{placeholder}"]')
     input_box.fill(f"{value}")
-    time.sleep(1)
     input_box.click()
     element = page.locator(xpath)
-    element.wait_for(state="visible", timeout=10000)
-    
-    element.click()
+    element.wait_for(state="visible", timeout=timeout)
 
-    time.sleep(1)
+    element.click()
+    element.wait_for(state="hidden", timeout=timeout)
 
 def determine_case_number(config, entry):
     """
@@ -183,11 +230,18 @@ def get_timecards(config, file_path="tasks.txt", date_from=None, date_to=None):
         return []
     return [_convert_to_timecard(config, entry) for entry in entries]
 
-def submit_timecards(config, timecards, headless=True, interactive=False, dry_run=False, verbose=False, sleep=0.0):
+def submit_timecards(config, timecards, headless=True, interactive=False, dry_run=False, verbose=False, sleep=0.0, workers=1, journal=None):
     """
     Submits timecards for tasks between date_from and date_to (inclusive).
     date_from and date_to should be datetime.date objects or None (defaults to all).
+    With workers > 1 (and not interactive), see _submit_parallel.
+    Otherwise the warm browser of punch browserd is used if it is running (headed, if headless is False),
+    see _submit_with_daemon.
+    Each timecard saved is recorded in journal (a punch.submissions.SubmissionJournal) if given,
+    which dry runs and interactive mode, where saving is left to the user, never do.
     """
+    if dry_run or interactive:
+        journal = None
 
     console = Console()
     
@@ -202,6 +256,24 @@ def submit_timecards(config, timecards, headless=True, interactive=False, dry_ru
         login_to_site(config, verbose)
 
     suffix = DRY_RUN_SUFFIX if dry_run else ""
+    if workers > 1 and not interactive and len(timecards) > 1:
+        failed, latencies = _submit_parallel(
+            console, config, timecards, min(workers, len(timecards)), headless, dry_run, verbose, sleep, journal,
+        )
+        for timecard, error in failed:
+            console.print(f"[red]Failed to submit {timecard.desc} - {timecard.work_performed} ({timecard.start_date} {timecard.start_time:%H:%M}): {error}[/red]")
+        console.print(f"[bold green]Submitted {len(timecards) - len(failed)} entries.{suffix}[/bold green]")
+        console.print(format_latencies(latencies))
+        return
+    daemon = None if interactive else browserd.connect()
+    if daemon is not None and (headless or not daemon.headless):
+        console.print(f"[green]Submitting timecards through punch browserd...[/green]{suffix}")
+        latencies, error = _submit_with_daemon(console, daemon, config, timecards, dry_run, sleep, journal)
+        if error is not None:
+            console.print(f"[red]punch browserd failed to submit the timecards: {error}[/red]")
+        console.print(f"[bold green]Submitted {len(latencies)} entries.{suffix}[/bold green]")
+        console.print(format_latencies(latencies))
+        return
     with sync_playwright() as p:
         browser = p.firefox.launch(headless=headless)
         context = _get_browser_context(browser, auth_json_path if Path(auth_json_path).exists() else None)
@@ -216,7 +288,11 @@ def submit_timecards(config, timecards, headless=True, interactive=False, dry_ru
             console.print(f"[green]Login successful. Submitting timecards...[/green]{suffix}")
 
         try:
-            _submit_entries_with_progress(console, page, config, timecards, interactive, dry_run, sleep)
+            latencies = _submit_entries_with_progress(console, page, config, timecards, interactive, dry_run, sleep, journal)
+        except SaveFailedError as e:
+            console.print(f"[red]{e}, stopping the submission.[/red]")
+            browser.close()
+            return
         except playwright_error:
             console.print("[red]The browser window was closed before submission could complete.[/red]")
             return
@@ -224,6 +300,7 @@ def submit_timecards(config, timecards, headless=True, interactive=False, dry_ru
         if not interactive:
             _cancel_edit(page)
             console.print(f"[bold green]Submitted {len(timecards)} entries.{suffix}[/bold green]")
+            console.print(format_latencies(latencies))
             browser.close()
         else:
             console.print("[yellow]Interactive mode enabled. Please review the entries before submitting.[/yellow]")
@@ -239,33 +316,15 @@ def _get_browser_context(browser, auth_json_path):
         raise AuthFileNotFoundError("Auth file not found. Please login first using the 'login' command.")
 
 def _get_valid_entries(file_path, date_from=None, date_to=None):
+    """
+    Returns the entries between date_from and date_to (inclusive, None for an open bound),
+    skipping tasks with duration 0 or ending with **.
+    """
     try:
-        entries = read_tasklog(file_path)
+        return list(open_storage(file_path).iter_entries(date_from, date_to))
     except FileNotFoundError:
         raise AuthFileNotFoundError("Task file not found. Please login first using the 'login' command.")
 
-    # Filter by date range if provided
-    if date_from or date_to:
-        if date_from is None:
-            date_from_dt = datetime.datetime.min
-        else:
-            date_from_dt = datetime.datetime.combine(date_from, datetime.time.min)
-        if date_to is None:
-            date_to_dt = datetime.datetime.max
-        else:
-            date_to_dt = datetime.datetime.combine(date_to, datetime.time.max)
-        entries = [
-            entry for entry in entries
-            if date_from_dt <= entry.finish <= date_to_dt
-        ]
-
-    # Skip tasks with duration 0 or ending with **
-    entries = [
-        entry for entry in entries
-        if entry.duration.total_seconds() > 0 and not entry.task.endswith("**")
-    ]
-    return entries
-
 def _login_to_timecards(console, page, config):
     timecards_link = get_timecards_link(config)
     page.goto(timecards_link)
@@ -280,53 +339,210 @@ def _reload_timecards(console, page, config):
     page.wait_for_url(timecards_link, timeout=30000)
 
 
-def _submit_entries_with_progress(console, page, config, timecards, interactive, dry_run=True, sleep=0.0):
-    from rich.progress import Progress, BarColumn, TextColumn, TimeElapsedColumn
-
-    PROGRESS_WIDTH = 30  # Constant for progress description width
-
-    with Progress(
+def _submission_progress(console):
+    return Progress(
         TextColumn("{task.fields[desc]}", justify="left", style="white"),
         BarColumn(bar_width=PROGRESS_WIDTH+10),
         TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
         TextColumn("[cyan]{task.fields[count]}", justify="right"),
         "•",
         TimeElapsedColumn(),
+        TextColumn("[dim]{task.fields[latency]}"),
         console=console,
-    ) as progress:
+    )
+
+def format_latencies(latencies):
+    """
+    Summarizes the seconds it took to fill in and save each timecard (not counting --sleep).
+    """
+    if not latencies:
+        return "[dim]No timecards filled in.[/dim]"
+    ordered = sorted(latencies)
+    median = ordered[len(ordered) // 2]
+    return (
+        f"[dim]Per entry: {sum(ordered) / len(ordered):.1f}s average, {median:.1f}s median, "
+        f"{ordered[0]:.1f}s min, {ordered[-1]:.1f}s max[/dim]"
+    )
+
+def _progress_desc(timecard):
+    desc = f"{timecard.desc} - {timecard.work_performed}"
+    return (desc[:PROGRESS_WIDTH-3] + "...") if len(desc) > PROGRESS_WIDTH else desc.ljust(PROGRESS_WIDTH)
+
+def _submit_entries_with_progress(console, page, config, timecards, interactive, dry_run=True, sleep=0.0, journal=None):
+    with _submission_progress(console) as progress:
         total = len(timecards)
         task = progress.add_task(
-            "Submitting entries", total=total, desc="Submitting entries".ljust(PROGRESS_WIDTH), count=f"0/{total}"
+            "Submitting entries", total=total, desc="Submitting entries".ljust(PROGRESS_WIDTH), count=f"0/{total}",
+            latency="",
         )
+        latencies = []
         for idx, timecard in enumerate(timecards, 1):
+            start = time.perf_counter()
 
             _fill_single_entry(config, page, timecard, interactive)
 
-            desc = f"{timecard.desc} - {timecard.work_performed}"
-            desc = (desc[:PROGRESS_WIDTH-3] + "...") if len(desc) > PROGRESS_WIDTH else desc.ljust(PROGRESS_WIDTH)
+            desc = _progress_desc(timecard)
             progress.update(task, advance=0, desc=desc, count=f"{idx}/{total}")
 
-            if sleep > 0:
-                time.sleep(sleep)
-
-            if dry_run:
-                # when cancelling, we have to reload the page.
-                # if we are not running headless, we could potentially use
-                # page.pause() instead of _cancel_edit that allows the user to
-                # look over what would be done.  However, they then need to
-                # trigger "Resume", which is tricky to do unless you have the
-                # debugging tools installed.
-                # page.pause()
-                # time.sleep(5)
-                # We don't have to actually cancel, we reload and keep going
-                # _cancel_edit(page)
-                _reload_timecards(console, page, config)
-            else:
-                # We can reuse the page if we are saving this one
-                if not interactive:
-                    _save_and_new(page)
-            progress.update(task, advance=1, desc=desc, count=f"{idx}/{total}")
+            _finish_entry(console, page, config, interactive, dry_run, sleep)
+            if journal is not None:
+                journal.record(timecard)
+            latencies.append(time.perf_counter() - start - sleep)
+            progress.update(task, advance=1, desc=desc, count=f"{idx}/{total}", latency=f"{latencies[-1]:.1f}s/entry")
         progress.update(task, completed=total, count=f"{total}/{total}")
+    return latencies
+
+def _submit_with_daemon(console, daemon, config, timecards, dry_run, sleep, journal=None):
+    """
+    Submits timecards one after another in the page punch browserd keeps loaded.
+    The daemon stops at the first timecard that fails, as the serial submission does.
+    Returns the seconds each saved timecard took and the error that stopped the submission, or None.
+    """
+    with _submission_progress(console) as progress:
+        total = len(timecards)
+        task = progress.add_task(
+            "Submitting entries", total=total, desc="Submitting entries".ljust(PROGRESS_WIDTH), count=f"0/{total}",
+            latency="",
+        )
+        latencies = []
+        try:
+            for message in daemon.submit(config, timecards, dry_run, sleep):
+                if message["event"] not in ("filled", "saved"):
+                    continue
+                timecard = timecards[message["idx"]]
+                desc = _progress_desc(timecard)
+                count = f"{message['idx'] + 1}/{total}"
+                if message["event"] == "filled":
+                    progress.update(task, advance=0, desc=desc, count=count)
+                    continue
+                if journal is not None:
+                    journal.record(timecard)
+                latencies.append(message["latency"])
+                progress.update(task, advance=1, desc=desc, count=count, latency=f"{latencies[-1]:.1f}s/entry")
+        except (browserd.BrowserdError, OSError) as e:
+            return latencies, e
+    return latencies, None
+
+def _finish_entry(console, page, config, interactive, dry_run, sleep):
+    """
+    Saves the filled in timecard and opens a new one, or throws it away on a dry run.
+    Raises SaveFailedError if the save is not confirmed.
+    """
+    if sleep > 0:
+        time.sleep(sleep)
+
+    if dry_run:
+        # when cancelling, we have to reload the page.
+        # if we are not running headless, we could potentially use
+        # page.pause() instead of _cancel_edit that allows the user to
+        # look over what would be done.  However, they then need to
+        # trigger "Resume", which is tricky to do unless you have the
+        # debugging tools installed.
+        # page.pause()
+        # time.sleep(5)
+        # We don't have to actually cancel, we reload and keep going
+        # _cancel_edit(page)
+        _reload_timecards(console, page, config)
+    else:
+        # We can reuse the page if we are saving this one
+        if not interactive:
+            _save_and_new(page)
+
+def _submit_parallel(console, config, timecards, workers, headless, dry_run, verbose, sleep, journal=None, attempts=SUBMIT_ATTEMPTS):
+    """
+    Submits timecards from a work queue shared by worker threads, each driving its own browser
+    with a context loaded from auth.json (Playwright's sync API cannot be shared between threads).
+    A timecard that fails to be filled in is put back on the queue, with its page reloaded, for any worker
+    to retry up to attempts times; one that fails once Save & New was clicked may have been saved
+    and is given up on. A worker whose browser fails to start stops, leaving its timecards to the others;
+    one whose page fails to reload after a failure gives up on that timecard too.
+    The progress bar counts timecards saved or given up on.
+    Returns the [(timecard, error)] that could not be submitted and the seconds each saved one took.
+    """
+    auth_json_path = get_auth_json_path()
+    work = queue.Queue()
+    for idx, timecard in enumerate(timecards):
+        work.put((idx, timecard, 1))
+    failed = {}
+    latencies = []
+    lock = threading.Lock()
+    total = len(timecards)
+    done = 0
+
+    with _submission_progress(console) as progress:
+        task = progress.add_task(
+            "Submitting entries", total=total, desc="Submitting entries".ljust(PROGRESS_WIDTH), count=f"0/{total}",
+            latency="",
+        )
+
+        def finished(idx, timecard, error=None, latency=None):
+            nonlocal done
+            with lock:
+                done += 1
+                if error is not None:
+                    failed[idx] = (timecard, error)
+                fields = {}
+                if latency is not None:
+                    latencies.append(latency)
+                    fields["latency"] = f"{latency:.1f}s/entry"
+                progress.update(task, advance=1, desc=_progress_desc(timecard), count=f"{done}/{total}", **fields)
+
+        def worker():
+            try:
+                with sync_playwright() as p:
+                    browser = p.firefox.launch(headless=headless)
+                    try:
+                        page = browser.new_context(storage_state=auth_json_path).new_page()
+                        if verbose:
+                            page.on("request", log_redirects)
+                        _reload_timecards(console, page, config)
+                        while True:
+                            try:
+                                idx, timecard, attempt = work.get_nowait()
+                            except queue.Empty:
+                                return
+                            start = time.perf_counter()
+                            saving = False
+                            try:
+                                _fill_single_entry(config, page, timecard, False)
+                                saving = True
+                                _finish_entry(console, page, config, False, dry_run, sleep)
+                                if journal is not None:
+                                    journal.record(timecard)
+                            except Exception as e:
+                                try:
+                                    # Start over from a blank form
+                                    _reload_timecards(console, page, config)
+                                except Exception as reload_error:
+                                    finished(idx, timecard, e)
+                                    console.print(f"[yellow]Submission worker stopped, could not reload the timecard form: {reload_error}[/yellow]")
+                                    return
+                                if saving or attempt >= attempts:
+                                    finished(idx, timecard, e)
+                                else:
+                                    work.put((idx, timecard, attempt + 1))
+                                continue
+                            finished(idx, timecard, latency=time.perf_counter() - start - sleep)
+                    finally:
+                        browser.close()
+            except Exception as e:
+                if verbose:
+                    console.print(f"[yellow]Submission worker stopped: {e}[/yellow]")
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Left over when every worker stopped
+        while True:
+            try:
+                idx, timecard, _ = work.get_nowait()
+            except queue.Empty:
+                break
+            finished(idx, timecard, "no browser left to submit it")
+    return [failed[idx] for idx in sorted(failed)], latencies
 
 def _fill_single_entry(config, page, timecard_entry, interactive):
     _fill_owner(page, timecard_entry.owner)
@@ -341,9 +557,17 @@ def _fill_single_entry(config, page, timecard_entry, interactive):
     time_str = timecard_entry.start_time.strftime(config.get("time_format", "%H:%M"))
     _fill_time(page, time_str)
 
-def _save_and_new(page):
+def _save_and_new(page, timeout=SAVE_TIMEOUT):
+    """
+    Clicks Save & New and waits for Salesforce to confirm the save,
+    raising SaveFailedError if it does not within timeout milliseconds.
+    """
     # page.locator('xpath=//lightning-button[button[@name="SaveAndNew"]]').click()
     page.get_by_role("button", name="Save & New").click()
+    try:
+        page.wait_for_function(_SAVED_JS, timeout=timeout)
+    except playwright_timeout:
+        raise SaveFailedError("Salesforce did not confirm the timecard was saved")
 
 def _cancel_edit(page):
     page.get_by_role("button", name="Cancel", exact=True).click()
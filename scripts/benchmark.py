@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# filepath: scripts/benchmark.py
+"""
+Micro-benchmarks for the task log code paths.
+
+Usage:
+    python scripts/benchmark.py parse [--lines N]
+    python scripts/benchmark.py memory [--lines N]
+    python scripts/benchmark.py parallel [--lines N] [--workers N ...]
+    python scripts/benchmark.py vectorized [--lines N]
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from punch import vectorized  # noqa: E402
+from punch.export import export_csv  # noqa: E402
+from punch.parallel import read_tasklog_parallel  # noqa: E402
+from punch.report import aggregate, generate_report  # noqa: E402
+from punch.tasklog import TaskLog  # noqa: E402
+from punch.tasks import SEPARATOR, TaskEntry, parse_task, read_tasklog  # noqa: E402
+
+CATEGORIES = ["Coding", "Meeting", "Bugfix", "Research", "Support"]
+TASKS = [f"Task {i}" for i in range(200)]
+
+def generate_lines(count, seed=0):
+    """
+    Yields count synthetic task log lines in chronological order, about 10 per working day.
+    """
+    rng = random.Random(seed)
+    finish = datetime.datetime(2015, 1, 1, 9, 0)
+    for i in range(count):
+        if i % 10 == 0:
+            # New day
+            finish = datetime.datetime.combine(finish.date() + datetime.timedelta(days=1), datetime.time(9, 0))
+            yield f"{finish:%Y-%m-%d %H:%M} | start\n"
+            continue
+        finish += datetime.timedelta(minutes=rng.randrange(5, 60))
+        if rng.random() < 0.05:
+            yield f"{finish:%Y-%m-%d %H:%M} | lunch**\n"
+        else:
+            notes = f" | notes {rng.randrange(1000)}" if rng.random() < 0.5 else ""
+            yield f"{finish:%Y-%m-%d %H:%M} | {rng.choice(CATEGORIES)} | {rng.choice(TASKS)}{notes}\n"
+
+def generate_log(path, count, seed=0):
+    with open(path, "w") as f:
+        f.writelines(generate_lines(count, seed))
+
+def parse_task_strptime(line, line_no=-1):
+    """
+    The original strptime based parser, used as the baseline.
+    """
+    parts = line.strip().split(SEPARATOR)
+    parts = [s.strip() for s in parts]
+    if len(parts) == 2:
+        finish_str, task = parts
+        category = ""
+        notes = ""
+    elif len(parts) == 3:
+        finish_str, category, task = parts
+        notes = ""
+    elif len(parts) >= 4:
+        finish_str, category, task, notes = parts[:4]
+    else:
+        raise ValueError(f"Invalid task entry format: line {line_no}: {line.strip()}")
+    finish = datetime.datetime.strptime(finish_str.strip(), '%Y-%m-%d %H:%M')
+    return TaskEntry(finish, category, task, notes, duration=datetime.timedelta(0))
+
+def timed(func, *args, repeat=3):
+    """
+    Returns the best wall clock time of repeat calls of func(*args).
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def report(name, count, seconds, unit="lines"):
+    print(f"{name:<28} {seconds * 1000:10.1f} ms {count / seconds:14,.0f} {unit}/s")
+
+def bench_parse(args):
+    lines = list(generate_lines(args.lines))
+
+    def run(parser):
+        for line_no, line in enumerate(lines, 1):
+            parser(line, line_no)
+
+    print(f"Parsing {len(lines):,} lines")
+    baseline = timed(run, parse_task_strptime)
+    fast = timed(run, parse_task)
+    report("strptime parse_task", len(lines), baseline)
+    report("fast-path parse_task", len(lines), fast)
+    print(f"speedup: {baseline / fast:.2f}x")
+
+def traced_size(func, *args):
+    """
+    Returns (result, bytes still allocated by func(*args) once it returned).
+    """
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+def bench_memory(args):
+    path = os.path.join(args.tmpdir, "tasks.txt")
+    generate_log(path, args.lines)
+    print(f"Loading {args.lines:,} lines")
+    entries, entries_size = traced_size(read_tasklog, path, False, False)
+    count = len(entries)
+    del entries
+    tasklog, tasklog_size = traced_size(TaskLog.load, path)
+    print(f"{'list[TaskEntry]':<28} {entries_size / 2**20:10.1f} MiB {entries_size / count:8.0f} B/entry")
+    print(f"{'TaskLog':<28} {tasklog_size / 2**20:10.1f} MiB {tasklog_size / len(tasklog):8.0f} B/entry")
+    print(f"reduction: {entries_size / tasklog_size:.1f}x")
+
+def bench_parallel(args):
+    path = os.path.join(args.tmpdir, "tasks.txt")
+    generate_log(path, args.lines)
+    size = os.path.getsize(path)
+    workers = args.workers or sorted({1, 2, 4, os.cpu_count() or 1})
+    print(f"Parsing {args.lines:,} lines ({size / 2**20:.1f} MiB) on {os.cpu_count()} cores")
+    baseline = timed(read_tasklog, path, False, False, repeat=1)
+    report("read_tasklog", args.lines, baseline)
+    for count in workers:
+        seconds = timed(read_tasklog_parallel, path, None, None, count, repeat=1)
+        report(f"read_tasklog_parallel x{count}", args.lines, seconds)
+        print(f"{'':<28} speedup: {baseline / seconds:.2f}x")
+
+def bench_vectorized(args):
+    if vectorized.np is None:
+        sys.exit("NumPy is not installed")
+    path = os.path.join(args.tmpdir, "tasks.txt")
+    generate_log(path, args.lines)
+    tasklog = TaskLog.load(path, include_untracked=True)
+    date_from = datetime.date(2016, 1, 1)
+    date_to = datetime.date(2018, 12, 31)
+    workloads = [
+        ("generate_report", generate_report, (tasklog, None, None)),
+        ("--by month,category", aggregate, (tasklog, None, None, ("month", "category"), ("sum", "count", "min", "max"))),
+        ("--by week,category,notes", aggregate, (tasklog, None, None, ("week", "category", "notes"))),
+        ("export_csv", export_csv, (tasklog, date_from, date_to)),
+    ]
+    print(f"Aggregating {len(tasklog):,} entries")
+    for name, func, func_args in workloads:
+        vectorized.ENABLED = False
+        expected = func(*func_args)
+        baseline = timed(func, *func_args)
+        vectorized.ENABLED = True
+        if func(*func_args) != expected:
+            sys.exit(f"{name}: NumPy results differ from the pure-Python ones")
+        fast = timed(func, *func_args)
+        print(name)
+        report("  pure Python", len(tasklog), baseline, "entries")
+        report("  NumPy", len(tasklog), fast, "entries")
+        print(f"{'':<28} speedup: {baseline / fast:.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    parse_parser = subparsers.add_parser("parse", help="Lines per second of parse_task")
+    parse_parser.add_argument("--lines", type=int, default=200_000)
+    parse_parser.set_defaults(func=bench_parse)
+
+    memory_parser = subparsers.add_parser("memory", help="Memory used by a loaded task log")
+    memory_parser.add_argument("--lines", type=int, default=2_000_000)
+    memory_parser.set_defaults(func=bench_memory)
+
+    parallel_parser = subparsers.add_parser("parallel", help="Scaling of the multi-process parser across cores")
+    parallel_parser.add_argument("--lines", type=int, default=2_000_000)
+    parallel_parser.add_argument("--workers", type=int, nargs="+", help="Worker counts to try (default: 1, 2, 4 and all cores)")
+    parallel_parser.set_defaults(func=bench_parallel)
+
+    vectorized_parser = subparsers.add_parser("vectorized", help="NumPy against pure-Python aggregation of a TaskLog")
+    vectorized_parser.add_argument("--lines", type=int, default=1_000_000)
+    vectorized_parser.set_defaults(func=bench_vectorized)
+
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        args.tmpdir = tmpdir
+        args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import unittest
+import tempfile
+import os
+import datetime
+import io
+from types import SimpleNamespace
+from unittest import mock
+from rich.console import Console
+from punch import archive
+from punch.archive import archive_tasklog, get_archive_path, get_index_path, has_archive, load_index
+from punch.commands import handle_db_export_text, handle_db_migrate
+from punch.export import export_csv
+from punch.report import generate_report
+from punch.tasks import iter_tasklog, read_tasklog, write_task
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+        self.original = os.path.join(self.tmpdir.name, "original.txt")
+        lines = []
+        day = datetime.date(2025, 1, 1)
+        for i in range(90):
+            d = day + datetime.timedelta(days=i)
+            lines.append(f"{d} 09:00 | start\n")
+            lines.append(f"{d} 10:00 | Coding | Feature {i % 3}\n")
+            lines.append(f"{d} 10:15 | coffee**\n")
+            lines.append(f"{d} 11:30 | Meeting | Standup | notes {i}\n")
+        for path in (self.taskfile, self.original):
+            with open(path, "w") as f:
+                f.writelines(lines)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_archive_moves_old_entries(self):
+        count = archive_tasklog(self.taskfile, datetime.date(2025, 3, 1), block_size=1024)
+        self.assertEqual(count, 59 * 4)
+        with open(self.taskfile) as f:
+            self.assertTrue(f.readline().startswith("2025-03-01 09:00"))
+        index = load_index(get_archive_path(self.taskfile))
+        self.assertGreater(len(index["blocks"]), 1)
+        self.assertEqual(sum(block["lines"] for block in index["blocks"]), count)
+        self.assertEqual(index["size"], os.path.getsize(get_archive_path(self.taskfile)))
+        for prev, block in zip(index["blocks"], index["blocks"][1:]):
+            self.assertLess(prev["last"][:10], block["first"][:10])
+
+    def test_reads_are_transparent(self):
+        archive_tasklog(self.taskfile, datetime.date(2025, 2, 10), block_size=1024)
+        archive_tasklog(self.taskfile, datetime.date(2025, 3, 1), block_size=1024)
+        self.assertEqual(read_tasklog(self.taskfile), read_tasklog(self.original))
+        self.assertEqual(read_tasklog(self.taskfile, count_lines=True)[1], 360)
+        self.assertEqual(read_tasklog(self.taskfile, use_cache=False), read_tasklog(self.original))
+        for date_from, date_to in [
+            (None, None),
+            (datetime.date(2025, 1, 20), datetime.date(2025, 1, 21)),
+            (datetime.date(2025, 2, 25), datetime.date(2025, 3, 5)),
+            (datetime.date(2025, 3, 10), None),
+            (None, datetime.date(2025, 1, 3)),
+        ]:
+            self.assertEqual(
+                list(iter_tasklog(self.taskfile, date_from, date_to, include_untracked=True)),
+                list(iter_tasklog(self.original, date_from, date_to, include_untracked=True)),
+            )
+        day_from, day_to = datetime.date(2025, 2, 1), datetime.date(2025, 3, 1)
+        self.assertEqual(generate_report(self.taskfile, day_from, day_to), generate_report(self.original, day_from, day_to))
+        self.assertEqual(export_csv(self.taskfile, day_from, day_to), export_csv(self.original, day_from, day_to))
+
+    def test_only_overlapping_blocks_are_decompressed(self):
+        archive_tasklog(self.taskfile, datetime.date(2025, 3, 1), block_size=1024)
+        blocks = load_index(get_archive_path(self.taskfile))["blocks"]
+        with mock.patch("punch.tasks.read_block", wraps=archive.read_block) as read_block:
+            day = datetime.date(2025, 1, 20)
+            entries = list(iter_tasklog(self.taskfile, day, day))
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(read_block.call_count, 1)
+        self.assertLess(read_block.call_count, len(blocks))
+        with mock.patch("punch.tasks.read_block", wraps=archive.read_block) as read_block:
+            list(iter_tasklog(self.taskfile, datetime.date(2025, 3, 2)))
+        read_block.assert_not_called()
+
+    def test_cached_archive_reads_new_blocks_only(self):
+        archive_tasklog(self.taskfile, datetime.date(2025, 2, 1), block_size=1024)
+        read_tasklog(self.taskfile)
+        archive_tasklog(self.taskfile, datetime.date(2025, 3, 1), block_size=1024)
+        new_blocks = [b for b in load_index(get_archive_path(self.taskfile))["blocks"] if b["first"] >= "2025-02"]
+        with mock.patch("punch.tasks.read_block", wraps=archive.read_block) as read_block:
+            tasklog = read_tasklog(self.taskfile)
+        self.assertEqual(read_block.call_count, len(new_blocks))
+        self.assertEqual(tasklog, read_tasklog(self.original))
+
+    def test_new_entries_after_archive(self):
+        archive_tasklog(self.taskfile, datetime.date(2025, 3, 1))
+        write_task(self.taskfile, "Coding", "Later", "", datetime.datetime(2025, 3, 31, 12, 0))
+        last = read_tasklog(self.taskfile)[-1]
+        self.assertEqual((last.task, last.duration), ("Later", datetime.timedelta(minutes=30)))
+
+    def test_nothing_to_archive(self):
+        self.assertEqual(archive_tasklog(self.taskfile, datetime.date(2024, 12, 1)), 0)
+        self.assertFalse(os.path.exists(get_archive_path(self.taskfile)))
+
+    def test_order_checked_against_archive(self):
+        archive_tasklog(self.taskfile, datetime.date(2025, 3, 1))
+        with open(self.taskfile, "w") as f:
+            f.write("2025-02-01 09:00 | start\n")
+            f.write("2025-03-10 09:00 | start\n")
+        with self.assertRaises(ValueError):
+            archive_tasklog(self.taskfile, datetime.date(2025, 3, 5))
+        self.assertEqual(sum(b["lines"] for b in load_index(get_archive_path(self.taskfile))["blocks"]), 59 * 4)
+
+    def test_interrupted_archive_is_discarded(self):
+        archive_tasklog(self.taskfile, datetime.date(2025, 2, 1))
+        archive_path = get_archive_path(self.taskfile)
+        with open(archive_path, "ab") as f:
+            f.write(b"partial block")
+        archive_tasklog(self.taskfile, datetime.date(2025, 3, 1))
+        self.assertEqual(load_index(archive_path)["size"], os.path.getsize(archive_path))
+        self.assertEqual(read_tasklog(self.taskfile), read_tasklog(self.original))
+        self.assertTrue(os.path.exists(get_index_path(archive_path)))
+
+    def test_archived_lines_left_in_the_log_are_dropped(self):
+        # Interrupted after the index was written, before the task log was rewritten
+        with open(self.taskfile, "rb") as f:
+            before = f.read()
+        archive_tasklog(self.taskfile, datetime.date(2025, 2, 1), block_size=1024)
+        with open(self.taskfile, "wb") as f:
+            f.write(before)
+        archive_path = get_archive_path(self.taskfile)
+        self.assertEqual(sum(b["lines"] for b in load_index(archive_path)["blocks"]), 31 * 4)
+        self.assertEqual(archive_tasklog(self.taskfile, datetime.date(2025, 1, 15)), 0)
+        with open(self.taskfile) as f:
+            self.assertTrue(f.readline().startswith("2025-02-01 09:00"))
+        self.assertEqual(archive_tasklog(self.taskfile, datetime.date(2025, 3, 1)), 28 * 4)
+        self.assertEqual(sum(b["lines"] for b in load_index(archive_path)["blocks"]), 59 * 4)
+        self.assertEqual(read_tasklog(self.taskfile), read_tasklog(self.original))
+
+    def test_migrate_and_export_text(self):
+        archive_tasklog(self.taskfile, datetime.date(2025, 2, 1))
+        console = Console(file=io.StringIO())
+        handle_db_migrate(SimpleNamespace(), self.tmpdir.name, console)
+        self.assertFalse(has_archive(self.taskfile))
+        self.assertTrue(os.path.exists(get_archive_path(self.taskfile) + ".bak"))
+        handle_db_export_text(SimpleNamespace(output=None), self.tmpdir.name, console)
+        self.assertEqual(read_tasklog(self.taskfile), read_tasklog(self.original))
+        day_from, day_to = datetime.date(2025, 1, 1), datetime.date(2025, 3, 31)
+        self.assertEqual(generate_report(self.taskfile, day_from, day_to), generate_report(self.original, day_from, day_to))
+
+    def test_export_text_refuses_archived_log(self):
+        archive_tasklog(self.taskfile, datetime.date(2025, 2, 1))
+        os.rename(self.taskfile, self.taskfile + ".old")
+        with open(os.path.join(self.tmpdir.name, "tasks.db"), "w"):
+            pass
+        with self.assertRaises(SystemExit):
+            handle_db_export_text(SimpleNamespace(output=None), self.tmpdir.name, Console(file=io.StringIO()))
+        self.assertFalse(os.path.exists(self.taskfile))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+import unittest
+import tempfile
+import os
+import io
+import datetime
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+from rich.console import Console
+import http.client
+from punch.backends import ApiSession, BrowserBackend, HttpBackend, open_backend
+from punch.commands import handle_submit
+from punch.mock_salesforce import MockSalesforce
+from punch.submissions import SubmissionJournal
+from punch.web import TimecardEntry
+
+class TestHttpBackend(unittest.TestCase):
+    def setUp(self):
+        self.mock = MockSalesforce(cases={"00000100": "500A", "00000200": "500B"}, users={"Test User": "005A"}).start()
+        self.addCleanup(self.mock.stop)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        env = patch.dict(os.environ, {"PUNCH_CONFIG_DIR": self.tmpdir.name})
+        env.start()
+        self.addCleanup(env.stop)
+        self.write_auth(self.mock.cookie())
+        self.config = {
+            "full_name": "Test User",
+            "timecards_url": "https://example.com/timecards",
+            "submit_api": {"url": self.mock.url, "object": "Timecard__c"},
+            "submit_batch_size": 4,
+        }
+        cases = ["00000100", "00000200", "00000999"] + ["00000100"] * 7
+        self.timecards = [
+            TimecardEntry(case, "Test User", 30, datetime.date(2025, 5, 16), datetime.time(9, i), f"work {i}", "Coding")
+            for i, case in enumerate(cases)
+        ]
+        self.journal = SubmissionJournal(os.path.join(self.tmpdir.name, "submissions.jsonl"))
+
+    def write_auth(self, *cookies):
+        with open(os.path.join(self.tmpdir.name, "auth.json"), "w") as f:
+            json.dump({"cookies": list(cookies), "origins": []}, f)
+
+    def submit(self, workers=1, dry_run=False):
+        out = io.StringIO()
+        with patch("punch.backends.Console", lambda: Console(file=out, width=200)):
+            HttpBackend(self.config, workers=workers).submit(self.timecards, dry_run=dry_run, journal=self.journal)
+        return out.getvalue()
+
+    def test_batches_over_one_connection(self):
+        output = self.submit()
+        self.assertEqual([len(records) for records in self.mock.records], [4, 4, 1])
+        self.assertEqual(self.mock.connections, 1)
+        self.assertIn("Failed to submit Coding - work 2 (2025-05-16 09:02): case 00000999 not found", output)
+        self.assertIn("Submitted 9 entries.", output)
+        self.assertIn("Per entry:", output)
+        self.assertEqual(self.journal.pending(self.timecards), [self.timecards[2]])
+        record = self.mock.records[0][1]
+        self.assertEqual(record["attributes"], {"type": "Timecard__c"})
+        self.assertEqual((record["Case__c"], record["OwnerId"], record["Description__c"], record["TotalMinutesStatic__c"]),
+                         ("500B", "005A", "work 1", 30))
+        start = datetime.datetime.fromisoformat(record["StartTime__c"])
+        self.assertEqual(start, datetime.datetime(2025, 5, 16, 9, 1).astimezone())
+
+    def test_record_and_request_errors(self):
+        self.mock.failing = {"work 0"}
+        self.mock.failing_requests = {2}
+        output = self.submit()
+        self.assertIn("work 0 (2025-05-16 09:00): FIELD_CUSTOM_VALIDATION_EXCEPTION: simulated validation error", output)
+        self.assertIn("work 5 (2025-05-16 09:05): HTTP 503: SERVER_UNAVAILABLE: simulated outage", output)
+        self.assertIn("Submitted 4 entries.", output)
+        # The second batch (work 5 to 8) failed as a whole
+        failed = [self.timecards[i] for i in (0, 2, 5, 6, 7, 8)]
+        self.assertEqual(self.journal.pending(self.timecards), failed)
+
+    def test_parallel_requests_share_the_pool(self):
+        self.config["submit_batch_size"] = 1
+        self.submit(workers=3)
+        self.assertEqual(sum(map(len, self.mock.records)), 9)
+        self.assertLessEqual(self.mock.connections, 3)
+        self.assertEqual(self.journal.pending(self.timecards), [self.timecards[2]])
+
+    def test_expired_session(self):
+        self.write_auth({**self.mock.cookie(), "value": "stale"})
+        output = self.submit()
+        self.assertIn("HTTP 401: the session has expired, log in again with punch login", output)
+        self.assertEqual(self.mock.create_requests, 0)
+
+    def test_dry_run(self):
+        output = self.submit(dry_run=True)
+        self.assertIn("Would create 9 timecards in 3 requests.", output)
+        self.assertEqual(self.mock.create_requests, 0)
+        self.assertEqual(len(self.journal), 0)
+
+    def test_handle_submit_with_http_backend(self):
+        args = SimpleNamespace(interactive=False, from_=None, to=None, dry_run=False, headed=False, verbose=False,
+                               sleep=0.0, workers=None, force=False, backend="http")
+        console = Console(file=io.StringIO(), width=200)
+        console.input = lambda prompt: "y"
+        tasks_file = os.path.join(self.tmpdir.name, "tasks.txt")
+        with patch("punch.commands.get_timecards", return_value=self.timecards), \
+                patch("punch.backends.Console", lambda: console):
+            handle_submit(args, self.config, tasks_file, console)
+            handle_submit(args, self.config, tasks_file, console)
+        self.assertEqual(sum(map(len, self.mock.records)), 9)
+        self.assertIn("Skipping 9 timecards already submitted", console.file.getvalue())
+
+class StaleConnection:
+    """
+    A kept-alive connection the server has closed, noticed while sending the request
+    (broken pipe) or only when reading the response.
+    """
+    def __init__(self, fail_on_send):
+        self.fail_on_send = fail_on_send
+        self.requests = 0
+
+    def request(self, method, path, body=None, headers=None):
+        self.requests += 1
+        if self.fail_on_send:
+            raise BrokenPipeError()
+
+    def getresponse(self):
+        raise http.client.RemoteDisconnected("Remote end closed connection without response")
+
+    def close(self):
+        pass
+
+class TestApiSessionRetries(unittest.TestCase):
+    def setUp(self):
+        self.mock = MockSalesforce(cases={"00000100": "500A"}).start()
+        self.addCleanup(self.mock.stop)
+        self.session = ApiSession(self.mock.url, [self.mock.cookie()])
+        self.addCleanup(self.session.close)
+        self.query = "/services/data/v59.0/query?q=SELECT+Id,+CaseNumber+FROM+Case+WHERE+CaseNumber+IN+('00000100')"
+        self.create = ("/services/data/v59.0/composite/sobjects", {"allOrNone": False, "records": [{"Description__c": "work"}]})
+
+    def stale(self, fail_on_send):
+        conn = StaleConnection(fail_on_send)
+        self.session.close()
+        self.session.idle.put_nowait(conn)
+        return conn
+
+    def test_get_is_retried(self):
+        conn = self.stale(fail_on_send=False)
+        self.assertEqual(self.session.request("GET", self.query)["totalSize"], 1)
+        self.assertEqual(conn.requests, 1)
+
+    def test_post_is_retried_only_if_not_sent(self):
+        self.stale(fail_on_send=True)
+        self.assertTrue(self.session.request("POST", *self.create)[0]["success"])
+        self.assertEqual(len(self.mock.records), 1)
+        self.stale(fail_on_send=False)
+        with self.assertRaises(http.client.RemoteDisconnected):
+            self.session.request("POST", *self.create)
+        self.assertEqual(len(self.mock.records), 1)
+
+class TestOpenBackend(unittest.TestCase):
+    def test_open_backend(self):
+        config = {"timecards_url": "https://example.my.salesforce.com/lightning/o/Timecard__c/new",
+                  "submit_api": {"object": "Timecard__c"}}
+        self.assertIsInstance(open_backend("browser", config, interactive=True), BrowserBackend)
+        backend = open_backend("http", config)
+        self.assertEqual(backend.base_url, "https://example.my.salesforce.com")
+        with self.assertRaisesRegex(ValueError, "Unknown submission backend: ftp"):
+            open_backend("ftp", config)
+        with self.assertRaisesRegex(ValueError, "Interactive mode"):
+            open_backend("http", config, interactive=True)
+        with self.assertRaisesRegex(ValueError, "submit_api.object"):
+            open_backend("http", {"timecards_url": config["timecards_url"]})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import tempfile
+import os
+import io
+import datetime
+import socket
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from rich.console import Console
+from punch import browserd
+from punch.commands import handle_browserd
+from punch.submissions import SubmissionJournal
+from punch.web import TimecardEntry, submit_timecards
+
+class TestBrowserd(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        env = patch.dict(os.environ, {"PUNCH_CONFIG_DIR": self.tmpdir.name})
+        env.start()
+        self.addCleanup(env.stop)
+        with open(os.path.join(self.tmpdir.name, "auth.json"), "w") as f:
+            f.write("{}")
+        self.config = {"full_name": "Test User", "timecards_url": "https://example.com/timecards"}
+        self.timecards = [
+            TimecardEntry("00000100", "Test User", 30, datetime.date(2025, 5, 16), datetime.time(9, i), f"work {i}", "Coding")
+            for i in range(3)
+        ]
+        self.filled = []
+        self.fail = None
+        self.playwright = MagicMock()
+        self.playwright.return_value.__enter__.return_value.firefox.launch.return_value \
+            .new_context.return_value.new_page.return_value.is_closed.return_value = False
+        for target, kwargs in [
+            ("punch.browserd.sync_playwright", {"new": self.playwright}),
+            ("punch.web.sync_playwright", {"side_effect": AssertionError("started a browser")}),
+            ("punch.web._fill_single_entry", {"side_effect": self.fill}),
+            ("punch.web._save_and_new", {}),
+            ("punch.web._reload_timecards", {}),
+        ]:
+            patcher = patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.daemon = threading.Thread(target=browserd.BrowserDaemon(self.config, verbose=True).serve)
+        self.daemon.start()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.addCleanup(self.stop)
+        for _ in range(100):
+            if browserd.connect() is not None:
+                break
+            time.sleep(0.05)
+
+    def stop(self):
+        client = browserd.connect()
+        if client is not None:
+            client.stop()
+        self.daemon.join(5)
+
+    def fill(self, config, page, timecard, interactive):
+        if timecard.work_performed == self.fail:
+            raise TimeoutError("combobox did not show up")
+        self.filled.append(timecard.work_performed)
+
+    def submit(self, **kwargs):
+        out = io.StringIO()
+        with patch("punch.web.Console", lambda: Console(file=out, width=200)):
+            submit_timecards(self.config, self.timecards, **kwargs)
+        return out.getvalue()
+
+    def test_submissions_reuse_the_warm_browser(self):
+        journal = SubmissionJournal(os.path.join(self.tmpdir.name, "submissions.jsonl"))
+        output = self.submit(journal=journal)
+        self.assertIn("Submitting timecards through punch browserd", output)
+        self.assertIn("Submitted 3 entries.", output)
+        self.assertEqual(journal.pending(self.timecards), [])
+        self.submit(dry_run=True)
+        self.assertEqual(self.filled, [f"work {i}" for i in range(3)] * 2)
+        self.playwright.return_value.__enter__.return_value.firefox.launch.assert_called_once_with(headless=True)
+
+    def test_failure_stops_the_submission(self):
+        self.fail = "work 1"
+        output = self.submit()
+        self.assertIn("punch browserd failed to submit the timecards: TimeoutError: combobox did not show up", output)
+        self.assertIn("Submitted 1 entries.", output)
+        self.fail = None
+        self.assertIn("Submitted 3 entries.", self.submit())
+
+    def test_headed_submission_falls_back(self):
+        with self.assertRaisesRegex(AssertionError, "started a browser"):
+            self.submit(headless=False)
+
+    def test_status_and_stop(self):
+        console = Console(file=io.StringIO(), width=200)
+        args = SimpleNamespace(headed=False, status=True, stop=False, verbose=False)
+        handle_browserd(args, self.config, console)
+        self.assertIn("punch browserd is running headless", console.file.getvalue())
+        args.status, args.stop = False, True
+        handle_browserd(args, self.config, console)
+        self.daemon.join(5)
+        self.assertFalse(self.daemon.is_alive())
+        self.assertFalse(os.path.exists(browserd.get_socket_path()))
+        self.assertIsNone(browserd.connect())
+
+class TestConnect(unittest.TestCase):
+    def test_not_running(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, browserd.SOCKET_FILE)
+            self.assertIsNone(browserd.connect(path))
+            # Left behind by a daemon that was killed
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.bind(path)
+            self.assertIsNone(browserd.connect(path))
+
+if __name__ == "__main__":
+    unittest.main()
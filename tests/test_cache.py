@@ -0,0 +1,95 @@
+import unittest
+import tempfile
+import os
+import datetime
+from punch.cache import get_cache_path, invalidate_cache
+from punch.tasks import read_tasklog
+
+LINES = [
+    "2025-05-16 09:00 | Coding | new | \n",
+    "2025-05-16 10:00 | Coding | Feature | Implemented feature\n",
+    "2025-05-16 10:30 | Meeting | Standup | \n",
+]
+
+class TestTasklogCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+        with open(self.taskfile, "w") as f:
+            f.writelines(LINES)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_cache_created(self):
+        tasklog = read_tasklog(self.taskfile)
+        self.assertEqual(len(tasklog), 2)
+        self.assertTrue(os.path.exists(get_cache_path(self.taskfile)))
+
+    def test_no_cache(self):
+        read_tasklog(self.taskfile, use_cache=False)
+        self.assertFalse(os.path.exists(get_cache_path(self.taskfile)))
+
+    def test_cached_result_matches(self):
+        first = read_tasklog(self.taskfile, count_lines=True)
+        second = read_tasklog(self.taskfile, count_lines=True)
+        self.assertEqual(first, second)
+        self.assertEqual(second[1], 3)
+
+    def test_appended_lines_use_previous_day_state(self):
+        read_tasklog(self.taskfile)
+        with open(self.taskfile, "a") as f:
+            f.write("2025-05-16 11:00 | Coding | Feature | More\n")
+            f.write("2025-05-17 09:00 | Coding | start | \n")
+        tasklog, line_count = read_tasklog(self.taskfile, count_lines=True)
+        self.assertEqual(line_count, 5)
+        self.assertEqual(len(tasklog), 3)
+        self.assertEqual(tasklog[-1].duration, datetime.timedelta(minutes=30))
+        self.assertEqual(tasklog, read_tasklog(self.taskfile, use_cache=False))
+
+    def test_in_place_edit_reparses(self):
+        read_tasklog(self.taskfile)
+        with open(self.taskfile, "w") as f:
+            f.writelines(LINES[:2])
+            f.write("2025-05-16 11:30 | Meeting | Standup | \n")
+        tasklog = read_tasklog(self.taskfile)
+        self.assertEqual(tasklog[-1].duration, datetime.timedelta(minutes=90))
+
+    def test_replaced_log_reparses(self):
+        lines = [f"2025-05-{day:02d} {hour:02d}:00 | Coding | Task {hour % 3}\n" for day in range(1, 29) for hour in range(9, 18)]
+        with open(self.taskfile, "w") as f:
+            f.writelines(lines)
+        read_tasklog(self.taskfile)
+        # Same length edit well before the last 4 KB, saved to a new file as editors do
+        edited = os.path.join(self.tmpdir.name, "edited.txt")
+        with open(edited, "w") as f:
+            f.writelines([lines[0], lines[1].replace("Task 1", "Task X")] + lines[2:])
+        os.replace(edited, self.taskfile)
+        with open(self.taskfile, "a") as f:
+            f.write("2025-05-28 18:00 | Coding | Task 0\n")
+        self.assertEqual(read_tasklog(self.taskfile), read_tasklog(self.taskfile, use_cache=False))
+        self.assertEqual(read_tasklog(self.taskfile)[0].task, "Task X")
+
+    def test_truncated_log_reparses(self):
+        read_tasklog(self.taskfile)
+        with open(self.taskfile, "w") as f:
+            f.writelines(LINES[:2])
+        tasklog, line_count = read_tasklog(self.taskfile, count_lines=True)
+        self.assertEqual(line_count, 2)
+        self.assertEqual(len(tasklog), 1)
+
+    def test_order_check_spans_cached_part(self):
+        read_tasklog(self.taskfile)
+        with open(self.taskfile, "a") as f:
+            f.write("2025-05-16 08:00 | Coding | Late | \n")
+        with self.assertRaises(ValueError):
+            read_tasklog(self.taskfile)
+
+    def test_invalidate_cache(self):
+        read_tasklog(self.taskfile)
+        invalidate_cache(self.taskfile)
+        self.assertFalse(os.path.exists(get_cache_path(self.taskfile)))
+        invalidate_cache(self.taskfile)
+
+if __name__ == "__main__":
+    unittest.main()
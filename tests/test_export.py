@@ -0,0 +1,100 @@
+import unittest
+import tempfile
+import os
+import io
+import datetime
+import gzip
+import json
+from types import SimpleNamespace
+from unittest import mock
+from rich.console import Console
+from punch import export
+from punch.commands import handle_export
+from punch.export import export_csv, export_json, write_export
+from punch.importer import parse_import
+from punch.tasks import iter_tasklog
+
+LINES = [
+    "2025-05-15 08:30 | start\n",
+    "2025-05-15 09:00 | Coding | Bug | zażółć\n",
+    "2025-05-15 10:30 | Meeting | Standup\n",
+    "2025-05-15 11:00 | lunch**\n",
+    "2025-05-16 09:00 | start\n",
+    "2025-05-16 12:15 | Coding | Bug | \"quoted\"\n",
+]
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+        with open(self.taskfile, "w") as f:
+            f.writelines(LINES)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, fmt, batch=None):
+        out = io.BytesIO()
+        with mock.patch.object(export, "WRITE_BATCH", batch or export.WRITE_BATCH):
+            count = write_export(out, self.taskfile, None, None, fmt)
+        return count, out.getvalue().decode("utf-8")
+
+    def test_json_matches_json_dumps(self):
+        count, exported = self.write("json", batch=1)
+        self.assertEqual(count, 3)
+        rows = json.loads(exported)
+        # The same output as before exports were streamed
+        self.assertEqual(exported, json.dumps(rows, indent=2))
+        self.assertEqual(rows[0]["notes"], "zażółć")
+        self.assertTrue(exported.isascii())
+        self.assertEqual(exported, export_json(self.taskfile, None, None))
+        day = datetime.date(2025, 6, 1)
+        self.assertEqual(export_json(self.taskfile, day, day), "[]")
+
+    def test_ndjson_roundtrip(self):
+        count, exported = self.write("ndjson", batch=2)
+        self.assertEqual(len(exported.splitlines()), count)
+        entries = parse_import(io.StringIO(exported), "ndjson")
+        self.assertEqual([e.task for e in entries], ["Bug", "Standup", "Bug"])
+        self.assertEqual(entries[2].notes, '"quoted"')
+        csv_entries = parse_import(io.StringIO(export_csv(self.taskfile, None, None)), "csv")
+        self.assertEqual(entries, csv_entries)
+
+    @unittest.skipIf(export.orjson is None, "orjson is not installed")
+    def test_same_output_without_orjson(self):
+        for fmt in ("json", "ndjson"):
+            expected = self.write(fmt)
+            with mock.patch.object(export, "orjson", None):
+                self.assertEqual(self.write(fmt), expected)
+
+    def test_handle_export_gzip(self):
+        output = os.path.join(self.tmpdir.name, "export.ndjson.gz")
+        args = SimpleNamespace(from_=None, to=None, format="ndjson", output=output, parallel=None)
+        console = Console(file=io.StringIO())
+        handle_export(args, self.taskfile, console)
+        self.assertIn("Exported 3 entries", console.file.getvalue())
+        with gzip.open(output, "rt", encoding="utf-8") as f:
+            self.assertEqual(f.read(), self.write("ndjson")[1])
+
+        args.format = "xml"
+        with self.assertRaises(SystemExit):
+            handle_export(args, self.taskfile, console)
+
+    def test_handle_export_parses_large_ranges_in_parallel(self):
+        output = os.path.join(self.tmpdir.name, "export.ndjson")
+        args = SimpleNamespace(from_=None, to=None, format="ndjson", output=output, parallel=None)
+        with mock.patch("punch.commands.should_parse_in_parallel", return_value=True), \
+                mock.patch("punch.commands.can_parse_in_parallel", return_value=True), \
+                mock.patch("punch.commands.read_tasklog_parallel", side_effect=lambda path, *_: iter_tasklog(path)) as parse:
+            handle_export(args, self.taskfile, Console(file=io.StringIO()))
+            parse.assert_called_once()
+            with open(output) as f:
+                self.assertEqual(f.read(), self.write("ndjson")[1])
+            args.parallel = False
+            handle_export(args, self.taskfile, Console(file=io.StringIO()))
+            parse.assert_called_once()
+        with open(output) as f:
+            self.assertEqual(f.read(), self.write("ndjson")[1])
+
+if __name__ == "__main__":
+    unittest.main()
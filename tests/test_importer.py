@@ -0,0 +1,146 @@
+import unittest
+import tempfile
+import os
+import io
+import datetime
+from punch.export import export_csv, export_json
+from punch.importer import GAP_TASK, START_TASK, import_entries, parse_import
+from punch.tasks import iter_tasklog, write_tasks
+
+CATEGORIES = {"Coding": {"short": "c"}, "Meeting": {"short": "m"}}
+
+EXISTING = [
+    "2025-05-14 09:00 | start\n",
+    "2025-05-14 10:00 | Coding | Feature\n",
+    "2025-05-16 09:00 | start\n",
+    "2025-05-16 10:00 | Coding | Feature | More\n",
+]
+
+class TestImport(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+        with open(self.taskfile, "w") as f:
+            f.writelines(EXISTING)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def read_lines(self):
+        with open(self.taskfile) as f:
+            return f.readlines()
+
+    def test_export_roundtrip(self):
+        source = os.path.join(self.tmpdir.name, "source.txt")
+        with open(source, "w") as f:
+            f.writelines([
+                "2025-05-15 08:30 | start\n",
+                "2025-05-15 09:00 | Coding | Bug | notes\n",
+                "2025-05-15 10:30 | Meeting | Standup\n",
+                "2025-05-15 11:00 | lunch**\n",
+                "2025-05-15 12:15 | Coding | Bug\n",
+            ])
+        day = datetime.date(2025, 5, 15)
+        for fmt, exported in [("json", export_json(source, day, day)), ("csv", export_csv(source, day, day))]:
+            with open(self.taskfile, "w") as f:
+                f.writelines(EXISTING)
+            entries = parse_import(io.StringIO(exported), fmt)
+            planned = import_entries(self.taskfile, entries, CATEGORIES)
+            self.assertEqual([e.task for e in planned], [START_TASK, "Bug", "Standup", GAP_TASK, "Bug"])
+            self.assertEqual(export_json(self.taskfile, day, day), export_json(source, day, day))
+            self.assertEqual(self.read_lines()[:2], EXISTING[:2])
+            self.assertEqual(self.read_lines()[-2:], EXISTING[2:])
+        self.assertEqual(list(iter_tasklog(self.taskfile, day, day)), list(iter_tasklog(source, day, day)))
+
+    def test_ndjson_appends(self):
+        data = (
+            '{"category": "Coding", "task": "A", "finish": "2025-05-16T11:00:00", "duration_minutes": 60}\n'
+            '\n'
+            '{"category": "Meeting", "task": "B", "notes": "n", "finish": "2025-05-17T10:00", "duration_minutes": 30}\n'
+        )
+        planned = import_entries(self.taskfile, parse_import(io.StringIO(data), "ndjson"), CATEGORIES)
+        self.assertEqual(len(planned), 3)
+        self.assertEqual(self.read_lines()[len(EXISTING):], [
+            "2025-05-16 11:00 | Coding | A\n",
+            "2025-05-17 09:30 | start\n",
+            "2025-05-17 10:00 | Meeting | B | n\n",
+        ])
+
+    def test_utc_offset_converted_to_local_time(self):
+        data = '{"category": "Coding", "task": "A", "finish": "2025-05-16T23:00:00+01:00", "duration_minutes": 30}\n'
+        entries = parse_import(io.StringIO(data), "ndjson")
+        finish = datetime.datetime(2025, 5, 16, 22, 0, tzinfo=datetime.timezone.utc).astimezone().replace(tzinfo=None)
+        self.assertEqual(entries[0].finish, finish)
+        self.assertIsNone(entries[0].finish.tzinfo)
+        # Compared with the naive finish times of the existing entries of the day
+        with open(self.taskfile, "a") as f:
+            f.write(f"{finish - datetime.timedelta(hours=1):%Y-%m-%d %H:%M} | Coding | Feature\n")
+        planned = import_entries(self.taskfile, entries, CATEGORIES)
+        self.assertEqual(planned[-1].finish, finish)
+        self.assertEqual(self.read_lines()[-1], f"{finish:%Y-%m-%d %H:%M} | Coding | A\n")
+
+    def test_lines_format(self):
+        data = "2025-05-15 09:00 | start\n2025-05-15 09:45 | Coding | Review\n"
+        import_entries(self.taskfile, parse_import(io.StringIO(data), "lines"), CATEGORIES)
+        entries = list(iter_tasklog(self.taskfile, datetime.date(2025, 5, 15), datetime.date(2025, 5, 15)))
+        self.assertEqual([(e.task, e.duration) for e in entries], [("Review", datetime.timedelta(minutes=45))])
+
+    def test_unknown_category(self):
+        data = '[{"category": "Sleeping", "task": "Nap", "finish": "2025-05-17T10:00", "duration_minutes": 30}]'
+        with self.assertRaises(ValueError) as cm:
+            import_entries(self.taskfile, parse_import(io.StringIO(data), "json"), CATEGORIES)
+        self.assertIn("Sleeping", str(cm.exception))
+        self.assertEqual(self.read_lines(), EXISTING)
+
+    def test_overlaps_rejected(self):
+        for data in [
+            # Inside an existing day
+            '[{"category": "Coding", "task": "X", "finish": "2025-05-16T09:30", "duration_minutes": 10}]',
+            # Starts before the last existing entry of the day
+            '[{"category": "Coding", "task": "X", "finish": "2025-05-16T10:30", "duration_minutes": 60}]',
+            # Imported entries overlapping each other
+            '[{"category": "Coding", "task": "X", "finish": "2025-05-17T10:30", "duration_minutes": 60},'
+            ' {"category": "Coding", "task": "Y", "finish": "2025-05-17T11:00", "duration_minutes": 60}]',
+        ]:
+            with self.assertRaises(ValueError):
+                import_entries(self.taskfile, parse_import(io.StringIO(data), "json"), CATEGORIES)
+        self.assertEqual(self.read_lines(), EXISTING)
+
+    def test_dry_run(self):
+        data = '[{"category": "Coding", "task": "X", "finish": "2025-05-17T10:30", "duration_minutes": 60}]'
+        planned = import_entries(self.taskfile, parse_import(io.StringIO(data), "json"), CATEGORIES, dry_run=True)
+        self.assertEqual(len(planned), 2)
+        self.assertEqual(self.read_lines(), EXISTING)
+
+    def test_invalid_input(self):
+        for data, fmt in [
+            ('{"task": "X"}', "json"),
+            ('[{"task": "X"}]', "json"),
+            ('[{"task": "X", "finish": "yesterday"}]', "json"),
+            ('{"task": "X", "finish": "2025-05-17T10:30", "duration_minutes": "ten"}\n', "ndjson"),
+            ("2025-05-17 10:30\n", "lines"),
+            ("", "xml"),
+        ]:
+            with self.assertRaises(ValueError):
+                parse_import(io.StringIO(data), fmt)
+
+class TestWriteTasks(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def entry(self, finish, task):
+        return parse_import(io.StringIO(f"{finish} | Coding | {task}\n"), "lines")[0]
+
+    def test_append_and_merge(self):
+        write_tasks(self.taskfile, [self.entry("2025-05-16 10:00", "B"), self.entry("2025-05-16 09:00", "A")])
+        write_tasks(self.taskfile, [self.entry("2025-05-16 10:00", "C")])
+        write_tasks(self.taskfile, [self.entry("2025-05-15 10:00", "D"), self.entry("2025-05-17 10:00", "E")])
+        with open(self.taskfile) as f:
+            self.assertEqual([line.split(" | ")[-1].strip() for line in f], ["D", "A", "B", "C", "E"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+import tempfile
+import os
+import datetime
+import multiprocessing
+from punch.locking import fcntl, get_lock_path
+from punch.tasks import iter_tasklog, parse_task, read_tasklog, undo_tasks, write_task
+
+WRITERS = 8
+ENTRIES_PER_WRITER = 40
+BASE = datetime.datetime(2025, 5, 16, 0, 0)
+
+def _writer(taskfile, writer, start_event):
+    start_event.wait()
+    for i in range(ENTRIES_PER_WRITER):
+        # Writers race, so entries often arrive after later-timestamped ones
+        finish = BASE + datetime.timedelta(minutes=i * WRITERS + writer)
+        write_task(taskfile, "Coding", f"w{writer}-{i}", "", finish)
+
+def _reader(taskfile, start_event, done_event, errors):
+    start_event.wait()
+    while not done_event.is_set():
+        try:
+            read_tasklog(taskfile, use_cache=False)
+            for _ in iter_tasklog(taskfile, include_untracked=True):
+                pass
+        except ValueError as e:
+            errors.put(str(e))
+
+def _undoer(taskfile, start_event, undone):
+    start_event.wait()
+    for _ in range(ENTRIES_PER_WRITER):
+        try:
+            undone.put(undo_tasks(taskfile)[0].task)
+        except ValueError:
+            # Nothing written yet
+            pass
+    undone.put(None)
+
+@unittest.skipIf(fcntl is None, "advisory locks need fcntl")
+class TestConcurrentWrites(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_parallel_writers(self):
+        ctx = multiprocessing.get_context("fork")
+        start_event, done_event, errors = ctx.Event(), ctx.Event(), ctx.Queue()
+        writers = [ctx.Process(target=_writer, args=(self.taskfile, w, start_event)) for w in range(WRITERS)]
+        reader = ctx.Process(target=_reader, args=(self.taskfile, start_event, done_event, errors))
+        for p in writers + [reader]:
+            p.start()
+        start_event.set()
+        for p in writers:
+            p.join(60)
+            self.assertEqual(p.exitcode, 0)
+        done_event.set()
+        reader.join(60)
+        self.assertTrue(errors.empty(), errors.get() if not errors.empty() else "")
+
+        with open(self.taskfile) as f:
+            lines = f.readlines()
+        self.assertEqual(len(lines), WRITERS * ENTRIES_PER_WRITER)
+        entries = [parse_task(line, n) for n, line in enumerate(lines, 1)]
+        self.assertEqual([e.finish for e in entries], sorted(e.finish for e in entries))
+        self.assertEqual(
+            {e.task for e in entries},
+            {f"w{w}-{i}" for w in range(WRITERS) for i in range(ENTRIES_PER_WRITER)},
+        )
+        tasklog = read_tasklog(self.taskfile)
+        self.assertEqual(len(tasklog), WRITERS * ENTRIES_PER_WRITER - 1)
+        self.assertTrue(all(e.duration == datetime.timedelta(minutes=1) for e in tasklog))
+        self.assertTrue(os.path.exists(get_lock_path(self.taskfile)))
+
+    def test_undo_while_writing(self):
+        ctx = multiprocessing.get_context("fork")
+        start_event, undone = ctx.Event(), ctx.Queue()
+        writers = [ctx.Process(target=_writer, args=(self.taskfile, w, start_event)) for w in range(2)]
+        undoer = ctx.Process(target=_undoer, args=(self.taskfile, start_event, undone))
+        for p in writers + [undoer]:
+            p.start()
+        start_event.set()
+        for p in writers + [undoer]:
+            p.join(60)
+            self.assertEqual(p.exitcode, 0)
+
+        removed = list(iter(lambda: undone.get(timeout=10), None))
+        with open(self.taskfile) as f:
+            lines = f.readlines()
+        entries = [parse_task(line, n) for n, line in enumerate(lines, 1)]
+        # Every entry was either undone whole or is still in the log, in order
+        self.assertEqual(len(entries) + len(removed), 2 * ENTRIES_PER_WRITER)
+        self.assertEqual(
+            sorted([e.task for e in entries] + removed),
+            sorted(f"w{w}-{i}" for w in range(2) for i in range(ENTRIES_PER_WRITER)),
+        )
+        self.assertEqual([e.finish for e in entries], sorted(e.finish for e in entries))
+
+    def test_late_write_is_reordered(self):
+        write_task(self.taskfile, "", "start", "", BASE)
+        write_task(self.taskfile, "Coding", "B", "", BASE + datetime.timedelta(hours=2))
+        write_task(self.taskfile, "Coding", "A", "", BASE + datetime.timedelta(hours=1))
+        self.assertEqual(
+            [(e.task, e.duration) for e in read_tasklog(self.taskfile)],
+            [("A", datetime.timedelta(hours=1)), ("B", datetime.timedelta(hours=1))],
+        )
+
+    def test_reader_snapshot(self):
+        write_task(self.taskfile, "", "start", "", BASE)
+        write_task(self.taskfile, "Coding", "A", "", BASE + datetime.timedelta(hours=1))
+        entries = iter_tasklog(self.taskfile)
+        first = next(entries)
+        # Appended after the reader took its snapshot
+        write_task(self.taskfile, "Coding", "B", "", BASE + datetime.timedelta(hours=2))
+        self.assertEqual([first.task] + [e.task for e in entries], ["A"])
+        self.assertEqual([e.task for e in iter_tasklog(self.taskfile)], ["A", "B"])
+
+    def test_rewrite_while_reading_raises(self):
+        write_task(self.taskfile, "", "start", "", BASE)
+        write_task(self.taskfile, "Coding", "A", "", BASE + datetime.timedelta(hours=2))
+        entries = iter_tasklog(self.taskfile)
+        next(entries)
+        # Would wait for the open generator forever
+        with self.assertRaises(RuntimeError):
+            write_task(self.taskfile, "Coding", "Late", "", BASE + datetime.timedelta(hours=1))
+        with self.assertRaises(RuntimeError):
+            undo_tasks(self.taskfile)
+        entries.close()
+        write_task(self.taskfile, "Coding", "Late", "", BASE + datetime.timedelta(hours=1))
+        self.assertEqual([e.task for e in iter_tasklog(self.taskfile)], ["Late", "A"])
+
+if __name__ == "__main__":
+    unittest.main()
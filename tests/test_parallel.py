@@ -0,0 +1,107 @@
+import unittest
+import tempfile
+import os
+import datetime
+from types import SimpleNamespace
+from unittest import mock
+from punch.archive import archive_tasklog
+from punch.parallel import plan_chunks, range_size, read_tasklog_parallel, should_parse_in_parallel
+from punch.commands import load_range
+from punch.segments import segment_tasklog
+from punch.tasks import _snapshot, read_tasklog, read_tasklog_range
+
+class TestParallelParse(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+        lines = []
+        day = datetime.date(2025, 1, 1)
+        for i in range(70):
+            d = day + datetime.timedelta(days=i)
+            lines.append(f"{d} 09:00 | start\n")
+            for j in range(i % 5):
+                lines.append(f"{d} {10 + j}:{(i * 7) % 60:02d} | Coding | Feature {j} | notes {i}\n")
+            lines.append(f"{d} 15:15 | coffee**\n")
+            lines.append(f"{d} 16:30 | Meeting | Standup\n")
+        with open(self.taskfile, "w") as f:
+            f.writelines(lines)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def assert_matches_sequential(self, date_from=None, date_to=None, **kwargs):
+        self.assertEqual(
+            read_tasklog_parallel(self.taskfile, date_from, date_to, **kwargs),
+            read_tasklog_range(self.taskfile, date_from, date_to),
+        )
+
+    def test_matches_sequential_parse(self):
+        self.assertEqual(read_tasklog_parallel(self.taskfile), read_tasklog(self.taskfile))
+        for chunk_size in (1, 40, 333, 4096):
+            self.assert_matches_sequential(workers=1, chunk_size=chunk_size)
+            self.assert_matches_sequential(datetime.date(2025, 1, 15), datetime.date(2025, 2, 3), workers=1, chunk_size=chunk_size)
+            self.assert_matches_sequential(datetime.date(2025, 3, 1), None, workers=1, chunk_size=chunk_size)
+
+    def test_worker_processes(self):
+        self.assert_matches_sequential(workers=2, chunk_size=500)
+        self.assert_matches_sequential(datetime.date(2025, 2, 1), datetime.date(2025, 2, 28), workers=3, chunk_size=200)
+
+    def test_chunks_end_on_line_boundaries(self):
+        chunks = plan_chunks(self.taskfile, chunk_size=100)
+        self.assertGreater(len(chunks), 10)
+        with open(self.taskfile, "rb") as f:
+            data = f.read()
+        self.assertEqual(chunks[0][1], 0)
+        self.assertEqual(chunks[-1][2], len(data))
+        for (_, _, end, _), (_, start, _, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(data[end - 1:end], b"\n")
+
+    def test_lines_appended_after_the_snapshot_are_left_out(self):
+        size = os.path.getsize(self.taskfile)
+        with _snapshot(self.taskfile) as files:
+            with open(self.taskfile, "a") as f:
+                f.write("2025-03-11 17:00 | Coding | Late\n")
+            chunks = plan_chunks(self.taskfile, workers=1, chunk_size=100, files=files)
+        self.assertEqual(chunks[-1][2], size)
+        self.assertEqual(plan_chunks(self.taskfile, workers=1, chunk_size=100)[-1][2], os.path.getsize(self.taskfile))
+
+    def test_single_core_reads_sequentially(self):
+        args = SimpleNamespace(parallel=True, from_=None, to=None)
+        with mock.patch("punch.parallel.os.cpu_count", return_value=1):
+            self.assertEqual(load_range(args, self.taskfile), self.taskfile)
+        with mock.patch("punch.parallel.os.cpu_count", return_value=4):
+            self.assertEqual(list(load_range(args, self.taskfile)), read_tasklog(self.taskfile))
+
+    def test_day_split_across_chunks(self):
+        # Every line in its own chunk, so every duration needs the previous chunk
+        self.assert_matches_sequential(workers=1, chunk_size=1)
+        tasklog = read_tasklog_parallel(self.taskfile, workers=1, chunk_size=1)
+        self.assertTrue(all(entry.duration > datetime.timedelta(0) for entry in tasklog))
+
+    def test_segments_and_archive(self):
+        expected = read_tasklog(self.taskfile)
+        archive_tasklog(self.taskfile, datetime.date(2025, 1, 20), block_size=512)
+        self.assertEqual(read_tasklog_parallel(self.taskfile, workers=1, chunk_size=256), expected)
+        self.assert_matches_sequential(datetime.date(2025, 1, 10), datetime.date(2025, 2, 10), workers=2, chunk_size=256)
+        segment_tasklog(self.taskfile)
+        self.assertEqual(read_tasklog_parallel(self.taskfile, workers=1, chunk_size=256), expected)
+        self.assert_matches_sequential(datetime.date(2025, 1, 10), datetime.date(2025, 2, 10), workers=1, chunk_size=256)
+
+    def test_order_checked_across_chunks(self):
+        with open(self.taskfile, "a") as f:
+            f.write("2025-03-11 08:00 | Coding | Late\n")
+        with self.assertRaises(ValueError) as cm:
+            read_tasklog_parallel(self.taskfile, workers=1, chunk_size=64)
+        with open(self.taskfile) as f:
+            self.assertIn(f"line {len(f.readlines())}", str(cm.exception))
+
+    def test_threshold(self):
+        size = os.path.getsize(self.taskfile)
+        self.assertEqual(range_size(self.taskfile), size)
+        self.assertLess(range_size(self.taskfile, datetime.date(2025, 3, 1)), size)
+        self.assertFalse(should_parse_in_parallel(self.taskfile))
+        self.assertEqual(should_parse_in_parallel(self.taskfile, threshold=size), (os.cpu_count() or 1) > 1)
+
+if __name__ == "__main__":
+    unittest.main()
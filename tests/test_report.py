@@ -0,0 +1,151 @@
+import unittest
+import tempfile
+import os
+import datetime
+import io
+import sys
+from unittest import mock
+from rich.console import Console
+from punch.commands import paged_console, print_report
+from punch.report import aggregate, generate_report, iter_report
+from punch.tasklog import TaskLog
+
+LINES = [
+    "2025-05-15 09:00 | start\n",
+    "2025-05-15 10:00 | Coding | Feature | old\n",
+    "2025-05-16 09:00 | start\n",
+    "2025-05-16 10:00 | Coding | Feature | part 1\n",
+    "2025-05-16 10:30 | Meeting | Standup | \n",
+    "2025-05-16 11:00 | Coding | Feature | part 2\n",
+    "2025-05-16 11:15 | Coding | Bugfix | \n",
+    "2025-05-16 12:00 | lunch**\n",
+    "2025-05-16 12:20 | Uncategorized task\n",
+]
+
+class TestGenerateReport(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+        with open(self.taskfile, "w") as f:
+            f.writelines(LINES)
+        self.day = datetime.date(2025, 5, 16)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_collapsed(self):
+        report = generate_report(self.taskfile, self.day, self.day)
+        self.assertEqual(list(report), ["(no category)", "Coding", "Meeting"])
+        self.assertEqual(report["Coding"]["tasks"], [
+            ("Bugfix", datetime.timedelta(minutes=15)),
+            ("Feature", datetime.timedelta(minutes=90)),
+        ])
+        self.assertEqual(report["Coding"]["total"], datetime.timedelta(minutes=105))
+        self.assertEqual(report["Meeting"]["total"], datetime.timedelta(minutes=30))
+        self.assertEqual(report["(no category)"]["total"], datetime.timedelta(minutes=20))
+
+    def test_not_collapsed(self):
+        report = generate_report(self.taskfile, self.day, self.day, collapse=False)
+        self.assertEqual(report["Coding"]["tasks"], [
+            ("Feature", "part 1", datetime.timedelta(hours=1)),
+            ("Feature", "part 2", datetime.timedelta(minutes=30)),
+            ("Bugfix", "", datetime.timedelta(minutes=15)),
+        ])
+
+    def test_range(self):
+        report = generate_report(self.taskfile, self.day - datetime.timedelta(days=1), self.day)
+        self.assertEqual(report["Coding"]["total"], datetime.timedelta(minutes=165))
+
+    def test_empty_range(self):
+        day = datetime.date(2025, 6, 1)
+        self.assertEqual(generate_report(self.taskfile, day, day), {})
+
+class TestAggregate(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+        with open(self.taskfile, "w") as f:
+            f.writelines(LINES)
+            f.write("2025-05-19 09:00 | start\n")
+            f.write("2025-05-19 09:40 | Coding | Feature | part 3\n")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_group_by_week_and_category(self):
+        groups = aggregate(self.taskfile, by=("week", "category"), metrics=("sum", "count", "min", "max"))
+        self.assertEqual(groups, {
+            ("2025-W20", "(no category)"): {"sum": 20, "count": 1, "min": 20, "max": 20},
+            ("2025-W20", "Coding"): {"sum": 165, "count": 4, "min": 15, "max": 60},
+            ("2025-W20", "Meeting"): {"sum": 30, "count": 1, "min": 30, "max": 30},
+            ("2025-W21", "Coding"): {"sum": 40, "count": 1, "min": 40, "max": 40},
+        })
+
+    def test_sources_agree(self):
+        tasklog = TaskLog.load(self.taskfile)
+        for by in [("day",), ("month", "task"), ("category", "task"), ("notes", "category")]:
+            self.assertEqual(aggregate(self.taskfile, by=by, metrics=("sum", "count")), aggregate(tasklog, by=by, metrics=("sum", "count")))
+        day = datetime.date(2025, 5, 16)
+        self.assertEqual(aggregate(self.taskfile, day, day, ("notes",)), {(False,): {"sum": 65}, (True,): {"sum": 90}})
+
+    def test_collapsed_report_is_an_aggregate(self):
+        report = generate_report(self.taskfile, None, None)
+        groups = aggregate(self.taskfile)
+        self.assertEqual(
+            {(cat, task): duration.seconds // 60 for cat, data in report.items() for task, duration in data["tasks"]},
+            {key: values["sum"] for key, values in groups.items()},
+        )
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValueError):
+            aggregate(self.taskfile, by=("year",))
+        with self.assertRaises(ValueError):
+            aggregate(self.taskfile, metrics=("avg",))
+
+class TestPrintReport(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+        with open(self.taskfile, "w") as f:
+            f.writelines(LINES + ["2025-05-16 13:00 | Coding | " + "x" * 60 + " | [notes]\n"])
+        self.day = datetime.date(2025, 5, 16)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def render(self, report, **kwargs):
+        out = io.StringIO()
+        print_report(report, Console(file=out, width=200), **kwargs)
+        return out.getvalue().splitlines()
+
+    def test_streams_the_same_tree_as_the_dict(self):
+        for collapse in (True, False):
+            self.assertEqual(
+                self.render(iter_report(self.taskfile, self.day, self.day, collapse)),
+                self.render(generate_report(self.taskfile, self.day, self.day, collapse)),
+            )
+
+    def test_bounded_column(self):
+        lines = self.render(iter_report(self.taskfile, self.day, self.day), width=20)
+        self.assertIn("│   └── " + "x" * 19 + "…       0:40 (40 min)", lines)
+        self.assertEqual(lines[-1], "└── Total:                         3:15 (195 min)")
+        # Durations line up whatever the length of the task names
+        self.assertEqual({line.index(" (") for line in lines if line.startswith("│")}, {lines[-1].index(" (")})
+
+    def test_plain(self):
+        lines = self.render(iter_report(self.taskfile, self.day, self.day, collapse=False), plain=True)
+        self.assertEqual(lines[0], "(no category)\tUncategorized task\t\t20")
+        self.assertEqual(lines[-2], "Coding\t" + "x" * 60 + "\t[notes]\t40")
+        self.assertEqual(len(lines), 6)
+
+    def test_pager(self):
+        paged = os.path.join(self.tmpdir.name, "paged.txt")
+        with mock.patch.dict(os.environ, {"PAGER": f"sh -c 'cat > {paged}'"}), \
+                mock.patch.object(sys.stdout, "isatty", return_value=True):
+            with paged_console() as console:
+                print_report(iter_report(self.taskfile, self.day, self.day), console, plain=True)
+        with open(paged) as f:
+            self.assertEqual(len(f.readlines()), 5)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+import tempfile
+import os
+import datetime
+import random
+from punch.archive import archive_tasklog
+from punch.cache import get_rollup_path, load_rollup, save_rollup
+from punch.report import generate_report
+from punch.rollup import rebuild_rollups, rollup_days, rollup_totals, verify_rollups
+from punch.segments import segment_tasklog
+from punch.tasklog import TaskLog
+from punch.tasks import undo_tasks, write_task
+
+class TestRollup(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+        rng = random.Random(3)
+        lines = []
+        day = datetime.date(2024, 11, 1)
+        for i in range(90):
+            d = day + datetime.timedelta(days=i)
+            lines.append(f"{d} 08:{rng.randrange(60):02d} | start\n")
+            for hour in range(9, 17):
+                category = rng.choice(["Coding", "Meeting", "Bugfix"])
+                lines.append(f"{d} {hour:02d}:{rng.randrange(60):02d} | {category} | Task {rng.randrange(10)}\n")
+            lines.append(f"{d} 17:30 | lunch**\n")
+        with open(self.taskfile, "w") as f:
+            f.writelines(lines)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def assertMatchesEntries(self, date_from=None, date_to=None):
+        self.assertEqual(
+            generate_report(self.taskfile, date_from, date_to),
+            generate_report(TaskLog.load(self.taskfile), date_from, date_to),
+        )
+
+    def test_report_matches_entries(self):
+        self.assertMatchesEntries()
+        self.assertMatchesEntries(datetime.date(2024, 12, 24), datetime.date(2025, 1, 3))
+        self.assertTrue(os.path.exists(get_rollup_path(self.taskfile)))
+        self.assertEqual(verify_rollups(self.taskfile), [])
+
+    def test_counts_and_bounds(self):
+        day = datetime.date(2024, 11, 1)
+        totals = rollup_totals(self.taskfile, day, day)
+        self.assertEqual(sum(count for _, count, _, _ in totals.values()), 8)
+        for minutes, count, low, high in totals.values():
+            self.assertTrue(low <= minutes / count <= high)
+
+    def test_closed_days_are_not_recomputed(self):
+        rollup_days(self.taskfile)
+        rollup = load_rollup(self.taskfile)
+        # The stored offset is the start of the last day, still open to appends
+        with open(self.taskfile, "rb") as f:
+            f.seek(rollup["offset"])
+            self.assertTrue(f.readline().startswith(b"2025-01-29"))
+        closed = datetime.date(2024, 11, 2)
+        rollup["days"][closed] = {}
+        save_rollup(self.taskfile, rollup)
+
+        write_task(self.taskfile, "Coding", "Late", "", datetime.datetime(2025, 1, 29, 19, 0))
+        write_task(self.taskfile, "", "start", "", datetime.datetime(2025, 1, 30, 9, 0))
+        write_task(self.taskfile, "Coding", "Next day", "", datetime.datetime(2025, 1, 30, 9, 45))
+        days = rollup_days(self.taskfile)
+        self.assertEqual(days[closed], {})
+        self.assertEqual(days[datetime.date(2025, 1, 29)][("Coding", "Late")], [90, 1, 90, 90])
+        # The first entry of a day has no duration
+        self.assertEqual(days[datetime.date(2025, 1, 30)], {("Coding", "Next day"): [45, 1, 45, 45]})
+
+        self.assertEqual(verify_rollups(self.taskfile), [f"tasks.txt: {closed}: rollup totals differ from the log"])
+        self.assertEqual(rebuild_rollups(self.taskfile), 91)
+        self.assertEqual(verify_rollups(self.taskfile), [])
+
+    def test_rewrites_trim_the_rollup(self):
+        rollup_days(self.taskfile)
+        write_task(self.taskfile, "Research", "Back-dated", "", datetime.datetime(2024, 12, 5, 8, 59))
+        undo_tasks(self.taskfile, 12)
+        self.assertEqual(load_rollup(self.taskfile)["days"].keys() & {datetime.date(2025, 1, 28)}, set())
+        self.assertMatchesEntries()
+        self.assertEqual(verify_rollups(self.taskfile), [])
+
+    def test_archived_and_segmented(self):
+        expected = generate_report(TaskLog.load(self.taskfile), None, None)
+        rollup_days(self.taskfile)
+        archive_tasklog(self.taskfile, datetime.date(2024, 12, 10), block_size=4096)
+        self.assertEqual(generate_report(self.taskfile, None, None), expected)
+        self.assertEqual(verify_rollups(self.taskfile), [])
+
+        os.unlink(os.path.join(self.tmpdir.name, "tasks.archive.gz"))
+        os.unlink(os.path.join(self.tmpdir.name, "tasks.archive.json"))
+        segment_tasklog(self.taskfile)
+        self.assertMatchesEntries(datetime.date(2024, 12, 20), datetime.date(2025, 1, 10))
+        self.assertEqual(verify_rollups(self.taskfile), [])
+
+    def test_archive_overlapping_the_log(self):
+        archive_tasklog(self.taskfile, datetime.date(2024, 12, 10))
+        with open(self.taskfile) as f:
+            lines = f.readlines()
+        with open(self.taskfile, "w") as f:
+            f.writelines(["2024-12-05 10:00 | Coding | Task 1\n"] + lines)
+        with self.assertRaisesRegex(ValueError, "chronological order"):
+            generate_report(self.taskfile, None, None, collapse=False)
+        with self.assertRaisesRegex(ValueError, "chronological order"):
+            generate_report(self.taskfile, None, None)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+import tempfile
+import os
+import datetime
+import io
+from types import SimpleNamespace
+from rich.console import Console
+from punch.commands import handle_db_migrate
+from punch.report import generate_report
+from punch.segments import get_segment_dir, is_segmented, load_manifest, segment_paths, segment_tasklog, verify_manifest
+from punch.storage import open_storage
+from punch.tasks import iter_tasklog, read_tasklog, write_task
+
+class TestSegments(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+        self.monolithic = os.path.join(self.tmpdir.name, "monolithic.txt")
+        lines = []
+        day = datetime.date(2025, 1, 28)
+        for i in range(40):
+            d = day + datetime.timedelta(days=i)
+            lines.append(f"{d} 09:00 | start\n")
+            lines.append(f"{d} 10:00 | Coding | Feature {i % 3}\n")
+            lines.append(f"{d} 11:30 | Meeting | Standup | notes {i}\n")
+        for path in (self.taskfile, self.monolithic):
+            with open(path, "w") as f:
+                f.writelines(lines)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_segment(self):
+        manifest = segment_tasklog(self.taskfile)
+        self.assertTrue(is_segmented(self.taskfile))
+        self.assertFalse(os.path.exists(self.taskfile))
+        self.assertTrue(os.path.exists(self.taskfile + ".bak"))
+        self.assertEqual([s["file"] for s in manifest["segments"]], ["2025-01.txt", "2025-02.txt", "2025-03.txt"])
+        self.assertEqual([s["lines"] for s in manifest["segments"]], [12, 84, 24])
+        self.assertEqual(manifest["segments"][1]["first"], "2025-02-01 09:00")
+        self.assertEqual(manifest["segments"][1]["last"], "2025-02-28 11:30")
+        self.assertEqual(verify_manifest(self.taskfile), [])
+
+    def test_reads_are_transparent(self):
+        segment_tasklog(self.taskfile)
+        self.assertEqual(read_tasklog(self.taskfile), read_tasklog(self.monolithic))
+        self.assertEqual(read_tasklog(self.taskfile, count_lines=True)[1], 120)
+        for date_from, date_to in [
+            (None, None),
+            (datetime.date(2025, 1, 31), datetime.date(2025, 2, 1)),
+            (datetime.date(2025, 3, 1), None),
+            (None, datetime.date(2025, 2, 10)),
+        ]:
+            self.assertEqual(
+                list(iter_tasklog(self.taskfile, date_from, date_to)),
+                list(iter_tasklog(self.monolithic, date_from, date_to)),
+            )
+        day = datetime.date(2025, 2, 14)
+        self.assertEqual(generate_report(self.taskfile, day, day), generate_report(self.monolithic, day, day))
+
+    def test_only_overlapping_segments_are_opened(self):
+        segment_tasklog(self.taskfile)
+        day = datetime.date(2025, 2, 14)
+        self.assertEqual(segment_paths(self.taskfile, day, day), [os.path.join(get_segment_dir(self.taskfile), "2025-02.txt")])
+        self.assertEqual(len(segment_paths(self.taskfile)), 3)
+
+    def test_write_task_appends_to_segment(self):
+        segment_tasklog(self.taskfile)
+        write_task(self.taskfile, "Coding", "Later", "", datetime.datetime(2025, 3, 8, 12, 0))
+        write_task(self.taskfile, "", "start", "", datetime.datetime(2025, 4, 1, 9, 0))
+        manifest = load_manifest(self.taskfile)
+        self.assertEqual(manifest["segments"][-2]["last"], "2025-03-08 12:00")
+        self.assertEqual(manifest["segments"][-2]["lines"], 25)
+        self.assertEqual(manifest["segments"][-1]["file"], "2025-04.txt")
+        self.assertEqual(verify_manifest(self.taskfile), [])
+        self.assertFalse(os.path.exists(self.taskfile))
+        last = list(iter_tasklog(self.taskfile))[-1]
+        self.assertEqual((last.task, last.duration), ("Later", datetime.timedelta(minutes=30)))
+
+    def test_verify_detects_changes(self):
+        segment_tasklog(self.taskfile)
+        with open(os.path.join(get_segment_dir(self.taskfile), "2025-02.txt"), "a") as f:
+            f.write("2025-03-09 10:00 | Coding | Misfiled\n")
+        problems = verify_manifest(self.taskfile)
+        self.assertEqual(len(problems), 3)
+
+    def test_segment_invalid_log(self):
+        with open(self.taskfile, "a") as f:
+            f.write("2025-01-01 10:00 | Coding | Late\n")
+        with self.assertRaises(ValueError):
+            segment_tasklog(self.taskfile)
+        self.assertFalse(is_segmented(self.taskfile))
+        visible = [name for name in os.listdir(self.tmpdir.name) if not name.startswith(".")]
+        self.assertEqual(sorted(visible), ["monolithic.txt", "tasks.txt"])
+
+    def test_migrate_segmented_log(self):
+        segment_tasklog(self.taskfile)
+        handle_db_migrate(SimpleNamespace(), self.tmpdir.name, Console(file=io.StringIO()))
+        self.assertFalse(is_segmented(self.taskfile))
+        self.assertTrue(os.path.exists(get_segment_dir(self.taskfile) + ".bak"))
+        db = open_storage(os.path.join(self.tmpdir.name, "tasks.db"))
+        self.assertEqual(list(db.iter_entries()), list(iter_tasklog(self.monolithic)))
+
+if __name__ == "__main__":
+    unittest.main()
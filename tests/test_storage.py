@@ -0,0 +1,123 @@
+import unittest
+import tempfile
+import os
+import datetime
+from unittest.mock import patch
+from punch.config import get_tasks_file
+from punch.report import generate_report
+from punch.storage import SQLiteStorage, TextStorage, export_sqlite_to_text, migrate_text_to_sqlite, open_storage
+from punch.tasks import TaskEntry
+
+LINES = [
+    "2025-05-15 09:00 | start\n",
+    "2025-05-15 10:00 | Coding | Feature | old\n",
+    "2025-05-16 09:00 | start\n",
+    "2025-05-16 10:00 | Coding | Feature | part 1\n",
+    "2025-05-16 10:30 | Meeting | Standup\n",
+    "2025-05-16 11:00 | Coding | Feature | part 2\n",
+    "2025-05-16 11:15 | Coding | Bugfix\n",
+    "2025-05-16 12:00 | lunch**\n",
+    "2025-05-16 12:20 | Uncategorized task\n",
+]
+
+class TestStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.text_path = os.path.join(self.tmpdir.name, "tasks.txt")
+        self.db_path = os.path.join(self.tmpdir.name, "tasks.db")
+        with open(self.text_path, "w") as f:
+            f.writelines(LINES)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_open_storage(self):
+        self.assertIsInstance(open_storage(self.text_path), TextStorage)
+        self.assertIsInstance(open_storage(self.db_path), SQLiteStorage)
+
+    def test_migrate_roundtrip(self):
+        self.assertEqual(migrate_text_to_sqlite(self.text_path, self.db_path), len(LINES))
+        exported = os.path.join(self.tmpdir.name, "exported.txt")
+        self.assertEqual(export_sqlite_to_text(self.db_path, exported), len(LINES))
+        with open(exported) as f:
+            self.assertEqual(f.readlines(), LINES)
+
+    def test_migrate_refuses_existing_database(self):
+        migrate_text_to_sqlite(self.text_path, self.db_path)
+        with self.assertRaises(FileExistsError):
+            migrate_text_to_sqlite(self.text_path, self.db_path)
+
+    def test_migrate_invalid_log(self):
+        with open(self.text_path, "a") as f:
+            f.write("2025-05-16 08:00 | Coding | Late\n")
+        with self.assertRaises(ValueError):
+            migrate_text_to_sqlite(self.text_path, self.db_path)
+        self.assertFalse(os.path.exists(self.db_path))
+
+    def test_backends_agree(self):
+        migrate_text_to_sqlite(self.text_path, self.db_path)
+        text, db = open_storage(self.text_path), open_storage(self.db_path)
+        day = datetime.date(2025, 5, 16)
+        for args in [(), (day, day), (day, None), (None, day - datetime.timedelta(days=1))]:
+            self.assertEqual(list(db.iter_entries(*args)), list(text.iter_entries(*args)))
+        self.assertEqual(list(db.iter_entries(categories=["Meeting"])), list(text.iter_entries(categories=["Meeting"])))
+        self.assertEqual(db.recent_tasks("Coding"), text.recent_tasks("Coding"))
+        self.assertEqual(db.recent_tasks("Coding", limit=1), text.recent_tasks("Coding", limit=1))
+        self.assertEqual(db.recent_tasks("Coding", horizon=0), text.recent_tasks("Coding", horizon=0))
+        self.assertEqual([e.task for e in text.recent_tasks("Coding", horizon=0)], ["Bugfix", "Feature"])
+        self.assertEqual(generate_report(self.db_path, day, day), generate_report(self.text_path, day, day))
+
+    def test_sqlite_append(self):
+        db = SQLiteStorage(self.db_path)
+        db.append("", "start", "", datetime.datetime(2025, 5, 16, 9, 0))
+        db.append("Coding", "Feature", "", datetime.datetime(2025, 5, 16, 10, 0))
+        db.append("Coding", "Bugfix", "notes", datetime.datetime(2025, 5, 16, 11, 0, 42))
+        entries = list(db.iter_entries())
+        self.assertEqual([e.duration for e in entries], [datetime.timedelta(hours=1)] * 2)
+        self.assertEqual(entries[-1].finish, datetime.datetime(2025, 5, 16, 11, 0))
+
+    def test_sqlite_back_dated_append(self):
+        db = SQLiteStorage(self.db_path)
+        db.append("", "start", "", datetime.datetime(2025, 5, 16, 9, 0))
+        db.append("Coding", "Feature", "", datetime.datetime(2025, 5, 16, 11, 0))
+        db.append("Meeting", "Standup", "", datetime.datetime(2025, 5, 16, 9, 30))
+        entries = list(db.iter_entries())
+        self.assertEqual([(e.task, e.duration) for e in entries], [
+            ("Standup", datetime.timedelta(minutes=30)),
+            ("Feature", datetime.timedelta(minutes=90)),
+        ])
+
+    def test_append_many_backends_agree(self):
+        migrate_text_to_sqlite(self.text_path, self.db_path)
+        entries = [
+            TaskEntry(datetime.datetime(2025, 5, 17, 10, 0), "Coding", "Feature", "", datetime.timedelta(0)),
+            TaskEntry(datetime.datetime(2025, 5, 14, 9, 0), "", "start", "", datetime.timedelta(0)),
+            TaskEntry(datetime.datetime(2025, 5, 14, 9, 45), "Meeting", "Planning", "", datetime.timedelta(0)),
+            TaskEntry(datetime.datetime(2025, 5, 17, 9, 0), "", "start", "", datetime.timedelta(0)),
+        ]
+        text, db = open_storage(self.text_path), open_storage(self.db_path)
+        text.append_many(entries)
+        db.append_many(entries)
+        self.assertEqual(list(db.iter_entries(include_untracked=True)), list(text.iter_entries(include_untracked=True)))
+        self.assertEqual(len(list(text.iter_entries())), 8)
+
+    def test_amend_undo_backends_agree(self):
+        migrate_text_to_sqlite(self.text_path, self.db_path)
+        text, db = open_storage(self.text_path), open_storage(self.db_path)
+        for storage in (text, db):
+            self.assertEqual([e.task for e in storage.remove_last(2)], ["lunch**", "Uncategorized task"])
+            old, new = storage.amend_last(category="Meeting", task="Review", time=datetime.time(11, 45))
+            self.assertEqual((old.task, new.task, new.finish), ("Bugfix", "Review", datetime.datetime(2025, 5, 16, 11, 45)))
+            with self.assertRaises(ValueError):
+                storage.amend_last(time=datetime.time(10, 0))
+        self.assertEqual(list(db.iter_entries(include_untracked=True)), list(text.iter_entries(include_untracked=True)))
+        self.assertEqual(list(db.iter_entries())[-1].duration, datetime.timedelta(minutes=45))
+
+    def test_tasks_file_prefers_database(self):
+        with patch.dict(os.environ, {"PUNCH_DATA_DIR": self.tmpdir.name}):
+            self.assertEqual(get_tasks_file(), self.text_path)
+            migrate_text_to_sqlite(self.text_path, self.db_path)
+            self.assertEqual(get_tasks_file(), self.db_path)
+
+if __name__ == "__main__":
+    unittest.main()
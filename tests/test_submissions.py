@@ -0,0 +1,93 @@
+import unittest
+import tempfile
+import os
+import io
+import datetime
+import dataclasses
+from types import SimpleNamespace
+from unittest.mock import patch
+from rich.console import Console
+from punch.commands import handle_submit
+from punch.submissions import SUBMISSIONS_FILE, SubmissionJournal, open_journal, timecard_key
+from punch.web import TimecardEntry
+
+def make_timecards(count):
+    return [
+        TimecardEntry("00000100", "Test User", 30, datetime.date(2025, 5, 16), datetime.time(9, i), f"work {i}", "Coding")
+        for i in range(count)
+    ]
+
+class TestSubmissionJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, SUBMISSIONS_FILE)
+        self.timecards = make_timecards(4)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_key_is_stable(self):
+        timecard = self.timecards[0]
+        self.assertEqual(timecard_key(timecard), timecard_key(dataclasses.replace(timecard, owner="Someone", desc="Other")))
+        for change in ({"minutes": 31}, {"work_performed": "work 1"}, {"case_no": "00000200"},
+                       {"start_date": datetime.date(2025, 5, 17)}, {"start_time": datetime.time(9, 1)}):
+            self.assertNotEqual(timecard_key(timecard), timecard_key(dataclasses.replace(timecard, **change)), change)
+
+    def test_resumes_after_the_last_saved_timecard(self):
+        journal = SubmissionJournal(self.path)
+        self.assertEqual(journal.pending(self.timecards), self.timecards)
+        journal.record(self.timecards[0])
+        journal.record(self.timecards[2])
+        journal = open_journal(self.tmpdir.name)
+        self.assertEqual(len(journal), 2)
+        self.assertEqual(journal.pending(self.timecards), [self.timecards[1], self.timecards[3]])
+
+    def test_line_cut_short_is_ignored(self):
+        journal = SubmissionJournal(self.path)
+        journal.record(self.timecards[0])
+        with open(self.path, "a") as f:
+            f.write('{"key": "')
+        journal = SubmissionJournal(self.path)
+        self.assertEqual(len(journal), 1)
+        journal.record(self.timecards[1])
+        self.assertEqual(SubmissionJournal(self.path).pending(self.timecards), self.timecards[2:])
+
+class TestHandleSubmit(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.tasks_file = os.path.join(self.tmpdir.name, "tasks.txt")
+        self.timecards = make_timecards(3)
+        open_journal(self.tmpdir.name).record(self.timecards[0])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def submit(self, force=False, dry_run=False):
+        args = SimpleNamespace(interactive=False, from_=None, to=None, dry_run=dry_run, headed=False,
+                               verbose=False, sleep=0.0, workers=1, force=force)
+        console = Console(file=io.StringIO(), width=200)
+        console.input = lambda prompt: "y"
+        with patch("punch.commands.get_timecards", return_value=self.timecards), \
+                patch("punch.backends.submit_timecards") as submit:
+            handle_submit(args, {}, self.tasks_file, console)
+        return submit, console.file.getvalue()
+
+    def test_skips_submitted_timecards(self):
+        submit, output = self.submit()
+        self.assertIn("Skipping 1 timecards already submitted", output)
+        self.assertEqual(submit.call_args.args[1], self.timecards[1:])
+        self.assertIsInstance(submit.call_args.kwargs["journal"], SubmissionJournal)
+
+        submit, output = self.submit(force=True)
+        self.assertNotIn("Skipping", output)
+        self.assertEqual(submit.call_args.args[1], self.timecards)
+
+    def test_nothing_left_to_submit(self):
+        for timecard in self.timecards[1:]:
+            open_journal(self.tmpdir.name).record(timecard)
+        submit, output = self.submit()
+        self.assertIn("All timecards have already been submitted.", output)
+        submit.assert_not_called()
+
+if __name__ == "__main__":
+    unittest.main()
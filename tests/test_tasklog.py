@@ -0,0 +1,67 @@
+import unittest
+import tempfile
+import os
+import datetime
+from punch.export import export_csv, export_json
+from punch.report import generate_report
+from punch.tasklog import TaskLog, from_epoch_minutes, to_epoch_minutes
+from punch.tasks import read_tasklog
+
+class TestTaskLog(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+        lines = []
+        day = datetime.date(2025, 1, 1)
+        for i in range(30):
+            d = day + datetime.timedelta(days=i)
+            lines.append(f"{d} 09:00 | start\n")
+            lines.append(f"{d} 10:00 | Coding | Feature {i % 3} | \n")
+            lines.append(f"{d} 11:30 | Meeting | Standup | notes {i}\n")
+            lines.append(f"{d} 12:00 | lunch**\n")
+            lines.append(f"{d} 12:45 | Uncategorized\n")
+        with open(self.taskfile, "w") as f:
+            f.writelines(lines)
+        self.tasklog = TaskLog.load(self.taskfile)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_epoch_minutes_roundtrip(self):
+        for dt in [datetime.datetime(1970, 1, 1), datetime.datetime(2025, 5, 16, 23, 59), datetime.datetime(1960, 2, 29, 0, 1)]:
+            self.assertEqual(from_epoch_minutes(to_epoch_minutes(dt)), dt)
+
+    def test_entries_match_read_tasklog(self):
+        self.assertEqual(len(self.tasklog), 90)
+        self.assertEqual(list(self.tasklog), read_tasklog(self.taskfile, use_cache=False))
+        self.assertEqual(self.tasklog[-1].task, "Uncategorized")
+
+    def test_strings_are_interned(self):
+        self.assertEqual(len(self.tasklog.categories), 3)
+        self.assertEqual(len(self.tasklog.tasks), 5)
+
+    def test_index_range(self):
+        day = datetime.date(2025, 1, 5)
+        start, stop = self.tasklog.index_range(day, day)
+        self.assertEqual((start, stop), (12, 15))
+        self.assertEqual(self.tasklog.index_range(datetime.date(2026, 1, 1)), (90, 90))
+
+    def test_report_matches_file_report(self):
+        date_from, date_to = datetime.date(2025, 1, 3), datetime.date(2025, 1, 20)
+        for collapse in (True, False):
+            self.assertEqual(
+                generate_report(self.tasklog, date_from, date_to, collapse),
+                generate_report(self.taskfile, date_from, date_to, collapse),
+            )
+
+    def test_exports_match_file_exports(self):
+        date_from, date_to = datetime.date(2025, 1, 3), datetime.date(2025, 1, 20)
+        self.assertEqual(export_json(self.tasklog, date_from, date_to), export_json(self.taskfile, date_from, date_to))
+        self.assertEqual(export_csv(self.tasklog, date_from, date_to), export_csv(self.taskfile, date_from, date_to))
+
+    def test_append_out_of_order(self):
+        with self.assertRaises(ValueError):
+            self.tasklog.append(self.tasklog[0])
+
+if __name__ == "__main__":
+    unittest.main()
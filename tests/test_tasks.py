@@ -2,7 +2,11 @@ import unittest
 import tempfile
 import os
 import datetime
-from punch.tasks import TaskEntry, escape_separators, read_tasklog, parse_task, SEPARATOR, parse_new_task_string
+import random
+from punch.cache import invalidate_cache, load_cache
+from punch.archive import archive_tasklog
+from punch.segments import segment_tasklog, verify_manifest
+from punch.tasks import TaskEntry, escape_separators, read_tasklog, read_tasklog_range, iter_tasklog, parse_task, SEPARATOR, parse_new_task_string, write_task, amend_task, undo_tasks, get_recent_tasks, _get_journal_path, _reverse_lines, _save_journal
 
 CATEGORIES = {
     "Coding": {"short": "c", "caseid": "100"},
@@ -19,6 +23,7 @@ class TestTasks(unittest.TestCase):
 
     def tearDown(self):
         os.unlink(self.testfile.name)
+        invalidate_cache(self.testfile.name)
 
     def test_parse_task_first_entry(self):
         # First entry should have duration 0
@@ -105,9 +110,381 @@ class TestTasks(unittest.TestCase):
         self.assertIn("Coding", repr(entry))
         self.assertIn("Feature", repr(entry))
 
+class TestReadTasklogRange(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+        lines = []
+        day = datetime.date(2025, 1, 1)
+        for i in range(60):
+            d = day + datetime.timedelta(days=i)
+            lines.append(f"{d} 09:00 | start\n")
+            lines.append(f"{d} 10:00 | Coding | Feature {i} | \n")
+            lines.append(f"{d} 11:30 | Meeting | Standup | notes\n")
+            lines.append(f"{d} 12:00 | lunch**\n")
+        with open(self.taskfile, "w") as f:
+            f.writelines(lines)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def assertSameAsFullRead(self, date_from, date_to):
+        expected = [
+            e for e in read_tasklog(self.taskfile, use_cache=False)
+            if (date_from is None or e.finish.date() >= date_from)
+            and (date_to is None or e.finish.date() <= date_to)
+        ]
+        self.assertEqual(read_tasklog_range(self.taskfile, date_from, date_to), expected)
+
+    def test_single_day(self):
+        day = datetime.date(2025, 1, 15)
+        entries = read_tasklog_range(self.taskfile, day, day)
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0].duration, datetime.timedelta(hours=1))
+        self.assertSameAsFullRead(day, day)
+
+    def test_ranges(self):
+        first = datetime.date(2025, 1, 1)
+        last = datetime.date(2025, 3, 1)
+        for date_from, date_to in [
+            (first, last), (first, first), (last, last), (None, None),
+            (datetime.date(2024, 12, 1), datetime.date(2025, 1, 2)),
+            (datetime.date(2025, 2, 10), None), (None, datetime.date(2025, 1, 3)),
+            (datetime.date(2026, 1, 1), datetime.date(2026, 1, 2)),
+        ]:
+            self.assertSameAsFullRead(date_from, date_to)
+
+    def test_missing_file(self):
+        missing = os.path.join(self.tmpdir.name, "missing.txt")
+        self.assertEqual(read_tasklog_range(missing, datetime.date(2025, 1, 1)), [])
+
+    def test_unsorted_range_reports_absolute_line(self):
+        with open(self.taskfile, "a") as f:
+            f.write("2025-03-02 10:00 | Coding | Late | \n")
+            f.write("2025-03-02 09:00 | Coding | Early | \n")
+        day = datetime.date(2025, 3, 2)
+        with self.assertRaisesRegex(ValueError, "line 242"):
+            read_tasklog_range(self.taskfile, day, day)
+
+    def test_iter_tasklog_categories(self):
+        entries = list(iter_tasklog(self.taskfile, categories=["Meeting"]))
+        self.assertEqual(len(entries), 60)
+        self.assertTrue(all(e.category == "Meeting" for e in entries))
+        self.assertTrue(all(e.duration == datetime.timedelta(minutes=90) for e in entries))
+
+    def test_iter_tasklog_stops_after_date_to(self):
+        # Anything past date_to is never parsed
+        with open(self.taskfile, "a") as f:
+            f.write("2025-03-02 10:00 | not a valid task line | | | |\n")
+            f.write("garbage\n")
+        day = datetime.date(2025, 1, 2)
+        entries = list(iter_tasklog(self.taskfile, day, day))
+        self.assertEqual([e.task for e in entries], ["Feature 1", "Standup"])
+        with self.assertRaises(ValueError):
+            list(iter_tasklog(self.taskfile))
+
+    def test_iter_tasklog_is_lazy(self):
+        it = iter_tasklog(self.taskfile)
+        self.assertEqual(next(it).task, "Feature 0")
+        it.close()
+
+def reference_parse_task(line, line_no=-1):
+    """
+    The strptime based parse_task the fast path is checked against.
+    """
+    parts = line.strip().split(SEPARATOR)
+    parts = [s.strip() for s in parts]
+    if len(parts) == 2:
+        finish_str, task = parts
+        category = ""
+        notes = ""
+    elif len(parts) == 3:
+        finish_str, category, task = parts
+        notes = ""
+    elif len(parts) >= 4:
+        finish_str, category, task, notes = parts[:4]
+    else:
+        raise ValueError(f"Invalid task entry format: line {line_no}: {line.strip()}")
+    finish = datetime.datetime.strptime(finish_str.strip(), '%Y-%m-%d %H:%M')
+    return TaskEntry(finish, category, task, notes, duration=datetime.timedelta(0))
+
+class TestParseTaskDifferential(unittest.TestCase):
+    FUZZ_CHARS = "0123456789-: |\t\nxZ+.\u00b2\u0663\u3000"
+
+    def random_timestamp(self, rng):
+        if rng.random() < 0.6:
+            # A valid timestamp
+            dt = datetime.datetime(2000, 1, 1) + datetime.timedelta(minutes=rng.randrange(20_000_000))
+            year, month, day, hour, minute = dt.year, dt.month, dt.day, dt.hour, dt.minute
+        else:
+            # Corner cases, most of them out of range
+            year = rng.choice([2025, 1999, 1, 999, 9999, 0])
+            month = rng.choice([1, 2, 6, 12, 0, 13])
+            day = rng.choice([1, 15, 28, 29, 30, 31, 0, 32])
+            hour = rng.choice([0, 9, 23, 24])
+            minute = rng.choice([0, 5, 59, 60])
+        if rng.random() < 0.8:
+            ts = f"{year:04d}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}"
+        else:
+            ts = f"{year}-{month}-{day} {hour}:{minute}"
+        if rng.random() < 0.3:
+            pos = rng.randrange(len(ts))
+            ts = ts[:pos] + rng.choice(self.FUZZ_CHARS) + ts[pos + 1:]
+        if rng.random() < 0.1:
+            pos = rng.randrange(len(ts))
+            ts = ts[:pos] + ts[pos + 1:]
+        return ts
+
+    def random_line(self, rng):
+        fields = [self.random_timestamp(rng)]
+        for _ in range(rng.randrange(5)):
+            fields.append(rng.choice(["Coding", "Feature", "notes: with colon", "", "lunch**", " padded "]))
+        sep = rng.choice([" | ", "|", "  |\t"])
+        line = sep.join(fields)
+        return rng.choice(["", " ", "\t"]) + line + rng.choice(["\n", "", " \n", "\r\n"])
+
+    def assertSameResult(self, line):
+        try:
+            expected = reference_parse_task(line)
+        except ValueError:
+            with self.assertRaises(ValueError, msg=repr(line)):
+                parse_task(line)
+            return
+        self.assertEqual(parse_task(line), expected, msg=repr(line))
+
+    def test_fuzzed_lines(self):
+        rng = random.Random(20250516)
+        for _ in range(20000):
+            self.assertSameResult(self.random_line(rng))
+
+    def test_known_lines(self):
+        for line in [
+            "2025-05-16 09:00 | Coding | new | \n",
+            "2025-05-16 09:00 | start",
+            "2024-02-29 23:59 | Coding | leap | day",
+            "2025-02-29 10:00 | Coding | not a leap year",
+            "2025-5-16 9:00 | Coding | not padded",
+            "2025-05-16T09:00 | Coding | iso separator",
+            "2025-05-16 09:00:00 | Coding | seconds",
+            "\u0662025-05-16 09:00 | Coding | arabic digit",
+            "2025-05-16 09:00",
+            "",
+        ]:
+            self.assertSameResult(line)
+
 # Typer-based CLI tests (basic smoke test using subprocess)
 import subprocess
 
+class TestBackDatedInsert(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+        self.expected = os.path.join(self.tmpdir.name, "expected.txt")
+        self.lines = []
+        day = datetime.date(2025, 1, 1)
+        for i in range(40):
+            d = day + datetime.timedelta(days=i)
+            self.lines.append(f"{d} 09:00 | start\n")
+            self.lines.append(f"{d} 10:00 | Coding | Feature {i}\n")
+            self.lines.append(f"{d} 12:00 | Meeting | Standup\n")
+        with open(self.taskfile, "w") as f:
+            f.writelines(self.lines)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_expected(self, *extra):
+        with open(self.expected, "w") as f:
+            f.writelines(sorted(self.lines + list(extra), key=lambda line: line[:16]))
+
+    def test_insert_in_place(self):
+        ino = os.stat(self.taskfile).st_ino
+        write_task(self.taskfile, "Bugfix", "Hotfix", "late", datetime.datetime(2025, 2, 3, 11, 0))
+        write_task(self.taskfile, "Bugfix", "Same time", "", datetime.datetime(2025, 2, 3, 11, 0))
+        self.write_expected("2025-02-03 11:00 | Bugfix | Hotfix | late\n", "2025-02-03 11:00 | Bugfix | Same time\n")
+        with open(self.taskfile) as f, open(self.expected) as e:
+            self.assertEqual(f.read(), e.read())
+        # Rewritten in place, not replaced
+        self.assertEqual(os.stat(self.taskfile).st_ino, ino)
+        self.assertFalse(os.path.exists(_get_journal_path(self.taskfile)))
+        day = [e for e in read_tasklog(self.taskfile) if e.finish.date() == datetime.date(2025, 2, 3)]
+        # "Same time" has a duration of 0 and is not tracked
+        self.assertEqual([(e.task, e.duration.seconds // 60) for e in day], [("Feature 33", 60), ("Hotfix", 60), ("Standup", 60)])
+
+    def test_cache_kept_before_affected_day(self):
+        read_tasklog(self.taskfile)
+        write_task(self.taskfile, "Bugfix", "Hotfix", "", datetime.datetime(2025, 2, 3, 11, 0))
+        with open(self.taskfile, "rb") as f:
+            state = load_cache(self.taskfile, f, os.fstat(f.fileno()))
+        self.assertIsNotNone(state)
+        self.assertEqual(state.line_count, 33 * 3)
+        self.assertEqual(state.entries[-1].finish, datetime.datetime(2025, 2, 2, 12, 0))
+        self.assertEqual(read_tasklog(self.taskfile, count_lines=True), read_tasklog(self.taskfile, count_lines=True, use_cache=False))
+
+    def test_insert_on_a_new_day(self):
+        write_task(self.taskfile, "", "start", "", datetime.datetime(2024, 12, 31, 9, 0))
+        write_task(self.taskfile, "Coding", "Early", "", datetime.datetime(2024, 12, 31, 9, 30))
+        tasklog = read_tasklog(self.taskfile)
+        self.assertEqual((tasklog[0].task, tasklog[0].duration), ("Early", datetime.timedelta(minutes=30)))
+        self.assertEqual(len(tasklog), 81)
+
+    def test_interrupted_insert_is_rolled_back(self):
+        with open(self.taskfile, "rb") as f:
+            original = f.read()
+        offset = original.index(b"2025-02-03")
+        _save_journal(self.taskfile, offset, len(original), original[offset:])
+        with open(self.taskfile, "r+b") as f:
+            f.seek(offset)
+            f.write(b"2025-02-03 11:00 | Bugfix | Half written")
+        self.assertEqual(len(read_tasklog(self.taskfile)), 80)
+        with open(self.taskfile, "rb") as f:
+            self.assertEqual(f.read(), original)
+        self.assertFalse(os.path.exists(_get_journal_path(self.taskfile)))
+
+    def test_segmented_insert(self):
+        segment_tasklog(self.taskfile)
+        write_task(self.taskfile, "Bugfix", "Hotfix", "", datetime.datetime(2025, 1, 15, 11, 0))
+        self.assertEqual(verify_manifest(self.taskfile), [])
+        self.write_expected("2025-01-15 11:00 | Bugfix | Hotfix\n")
+        self.assertEqual(read_tasklog(self.taskfile), read_tasklog(self.expected))
+
+class TestAmendUndo(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+        self.lines = []
+        day = datetime.date(2025, 1, 1)
+        for i in range(40):
+            d = day + datetime.timedelta(days=i)
+            self.lines.append(f"{d} 09:00 | start\n")
+            self.lines.append(f"{d} 10:00 | Coding | Feature {i}\n")
+            self.lines.append(f"{d} 12:00 | Meeting | Standup\n")
+        with open(self.taskfile, "w") as f:
+            f.writelines(self.lines)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def read_lines(self):
+        with open(self.taskfile) as f:
+            return f.readlines()
+
+    def test_undo(self):
+        read_tasklog(self.taskfile)
+        removed = undo_tasks(self.taskfile, 4)
+        self.assertEqual([e.task for e in removed], ["Standup", "start", "Feature 39", "Standup"])
+        self.assertEqual(self.read_lines(), self.lines[:-4])
+        self.assertFalse(os.path.exists(_get_journal_path(self.taskfile)))
+        # The cache was cut back to the first affected day, not dropped
+        with open(self.taskfile, "rb") as f:
+            self.assertIsNotNone(load_cache(self.taskfile, f, os.fstat(f.fileno())))
+        self.assertEqual(read_tasklog(self.taskfile, count_lines=True), read_tasklog(self.taskfile, count_lines=True, use_cache=False))
+
+    def test_undo_more_than_available(self):
+        with self.assertRaises(ValueError):
+            undo_tasks(self.taskfile, len(self.lines) + 1)
+        self.assertEqual(self.read_lines(), self.lines)
+        self.assertEqual(len(undo_tasks(self.taskfile, len(self.lines))), len(self.lines))
+        self.assertEqual(self.read_lines(), [])
+
+    def test_undo_without_trailing_newline(self):
+        with open(self.taskfile, "w") as f:
+            f.write("".join(self.lines).rstrip("\n"))
+        self.assertEqual(undo_tasks(self.taskfile)[0].task, "Standup")
+        self.assertEqual(self.read_lines(), self.lines[:-1])
+
+    def test_amend(self):
+        ino = os.stat(self.taskfile).st_ino
+        old, new = amend_task(self.taskfile, category="Bugfix", task="Hotfix", notes=" urgent ", time=datetime.time(12, 30))
+        self.assertEqual((old.category, old.task), ("Meeting", "Standup"))
+        self.assertEqual(self.read_lines(), self.lines[:-1] + ["2025-02-09 12:30 | Bugfix | Hotfix | urgent\n"])
+        self.assertEqual(os.stat(self.taskfile).st_ino, ino)
+        amend_task(self.taskfile, notes="")
+        last = read_tasklog(self.taskfile)[-1]
+        self.assertEqual((last.task, last.notes, last.duration), ("Hotfix", "", datetime.timedelta(minutes=150)))
+
+    def test_amend_before_previous_entry(self):
+        with self.assertRaises(ValueError):
+            amend_task(self.taskfile, time=datetime.time(9, 30))
+        self.assertEqual(self.read_lines(), self.lines)
+
+    def test_amend_empty_log(self):
+        empty = os.path.join(self.tmpdir.name, "empty.txt")
+        with self.assertRaises(ValueError):
+            amend_task(empty, task="Nothing")
+
+    def test_segmented(self):
+        segment_tasklog(self.taskfile)
+        # The last segment (February) only has 27 lines, undo reaches into January
+        removed = undo_tasks(self.taskfile, 30)
+        self.assertEqual(len(removed), 30)
+        self.assertEqual(verify_manifest(self.taskfile), [])
+        amend_task(self.taskfile, task="Amended")
+        self.assertEqual(verify_manifest(self.taskfile), [])
+        self.assertEqual(
+            [e.task for e in iter_tasklog(self.taskfile, include_untracked=True)],
+            [parse_task(line).task for line in self.lines[:-31]] + ["Amended"],
+        )
+
+class TestRecentTasks(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+        rng = random.Random(7)
+        lines = []
+        day = datetime.date(2024, 1, 1)
+        for i in range(400):
+            d = day + datetime.timedelta(days=i)
+            lines.append(f"{d} 09:00 | start\n")
+            for hour in range(10, 14):
+                category = rng.choice(["Coding", "Meeting"])
+                lines.append(f"{d} {hour}:00 | {category} | Task {rng.randrange(100)} | notes\n")
+            lines.append(f"{d} 14:00 | Coding | Skipped**\n")
+        with open(self.taskfile, "w") as f:
+            f.writelines(lines)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def expected(self, category, limit=None, since=None):
+        seen = []
+        for entry in reversed(read_tasklog(self.taskfile)):
+            if entry.category == category and entry.task not in seen and (since is None or entry.finish.date() >= since):
+                seen.append(entry.task)
+        return seen[:limit]
+
+    def test_matches_full_parse(self):
+        recent = get_recent_tasks(self.taskfile, "Coding", limit=None, horizon=None)
+        self.assertEqual([e.task for e in recent], self.expected("Coding"))
+        self.assertNotIn("Skipped**", [e.task for e in recent])
+        self.assertTrue(all(e.duration == datetime.timedelta(hours=1) for e in recent))
+
+    def test_limit_and_horizon(self):
+        self.assertEqual([e.task for e in get_recent_tasks(self.taskfile, "Meeting", limit=5)], self.expected("Meeting", limit=5))
+        # The last entry is on 2025-02-03
+        self.assertEqual(
+            [e.task for e in get_recent_tasks(self.taskfile, "Coding", limit=None, horizon=10)],
+            self.expected("Coding", since=datetime.date(2025, 1, 24)),
+        )
+        self.assertEqual(get_recent_tasks(self.taskfile, "Research"), [])
+
+    def test_archived(self):
+        expected = self.expected("Coding")
+        archive_tasklog(self.taskfile, datetime.date(2024, 12, 1), block_size=4096)
+        self.assertEqual([e.task for e in get_recent_tasks(self.taskfile, "Coding", limit=None, horizon=None)], expected)
+
+    def test_segmented(self):
+        expected = self.expected("Meeting", limit=30)
+        segment_tasklog(self.taskfile)
+        self.assertEqual([e.task for e in get_recent_tasks(self.taskfile, "Meeting", limit=30)], expected)
+
+    def test_reverse_lines(self):
+        with open(self.taskfile, "rb") as f:
+            lines = f.readlines()
+            self.assertEqual(list(_reverse_lines(f, sum(map(len, lines)), block_size=37)), lines[::-1])
+            # A line without a newline at the end is still a line
+            self.assertEqual(next(_reverse_lines(f, sum(map(len, lines)) - 1, block_size=37)), lines[-1][:-1])
+
 class TestTyperCLI(unittest.TestCase):
     def test_report_help(self):
         result = subprocess.run(
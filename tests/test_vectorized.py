@@ -0,0 +1,68 @@
+import unittest
+import tempfile
+import os
+import datetime
+import itertools
+import random
+from punch import vectorized
+from punch.export import export_csv
+from punch.report import GROUP_FIELDS, METRICS, aggregate, generate_report
+from punch.tasklog import TaskLog
+
+@unittest.skipIf(vectorized.np is None, "NumPy is not installed")
+class TestVectorized(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+        rng = random.Random(5)
+        lines = []
+        day = datetime.date(2024, 12, 20)
+        for i in range(40):
+            d = day + datetime.timedelta(days=i)
+            lines.append(f"{d} 08:{rng.randrange(60):02d} | start\n")
+            for hour in range(9, 18):
+                category = rng.choice(["Coding", "Meeting", ""])
+                notes = rng.choice(["", "", "PR review"])
+                task = rng.choice(["Task 1", "Task 2", "lunch**"])
+                lines.append(f"{d} {hour:02d}:{rng.randrange(60):02d} | {category} | {task} | {notes}\n")
+        with open(self.taskfile, "w") as f:
+            f.writelines(lines)
+        # Untracked entries are kept in the columns to be masked out by the arrays
+        self.tasklog = TaskLog.load(self.taskfile, include_untracked=True)
+
+    def tearDown(self):
+        vectorized.ENABLED = True
+        self.tmpdir.cleanup()
+
+    def both(self, func, *args):
+        vectorized.ENABLED = False
+        expected = func(*args)
+        vectorized.ENABLED = True
+        return expected, func(*args)
+
+    def test_aggregate_matches_pure_python(self):
+        ranges = [(None, None), (datetime.date(2024, 12, 30), datetime.date(2025, 1, 6)), (datetime.date(2026, 1, 1), None)]
+        for date_from, date_to in ranges:
+            for size in range(len(GROUP_FIELDS) + 1):
+                for by in itertools.combinations(GROUP_FIELDS, size):
+                    expected, actual = self.both(aggregate, self.tasklog, date_from, date_to, by, METRICS)
+                    self.assertEqual(actual, expected, by)
+        # Untracked entries never reach the pure-Python path of the text log either
+        self.assertEqual(aggregate(self.tasklog, by=("task",)), aggregate(self.taskfile, by=("task",)))
+        self.assertNotIn(("lunch**",), aggregate(self.tasklog, by=("task",)))
+
+    def test_report_and_export_match_pure_python(self):
+        date_from, date_to = datetime.date(2025, 1, 3), datetime.date(2025, 1, 20)
+        for collapse in (True, False):
+            expected, actual = self.both(generate_report, self.tasklog, date_from, date_to, collapse)
+            self.assertEqual(actual, expected)
+        expected, actual = self.both(export_csv, self.tasklog, date_from, date_to)
+        self.assertEqual(actual, expected)
+        self.assertEqual(actual, export_csv(self.taskfile, date_from, date_to))
+
+    def test_empty_tasklog(self):
+        self.assertEqual(aggregate(TaskLog(), by=("day", "category")), {})
+        self.assertEqual(export_csv(TaskLog(), None, None), "category,task,notes,finish,duration_minutes\r\n")
+
+if __name__ == "__main__":
+    unittest.main()
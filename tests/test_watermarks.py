@@ -0,0 +1,86 @@
+import unittest
+import tempfile
+import os
+import io
+import datetime
+import json
+from punch.export import write_export_since
+from punch.segments import segment_tasklog
+from punch.tasks import undo_tasks, write_task
+from punch.watermarks import load_watermarks
+
+LINES = [
+    "2025-05-15 09:00 | start\n",
+    "2025-05-15 10:00 | Coding | Feature\n",
+    "2025-05-16 09:00 | start\n",
+    "2025-05-16 10:00 | Coding | Feature | part 1\n",
+    "2025-05-16 12:00 | lunch**\n",
+]
+
+class FailingOutput(io.BytesIO):
+    def write(self, data):
+        raise OSError("disk full")
+
+class TestWatermarks(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.taskfile = os.path.join(self.tmpdir.name, "tasks.txt")
+        with open(self.taskfile, "w") as f:
+            f.writelines(LINES)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def export(self, name="billing"):
+        out = io.BytesIO()
+        count, rewritten = write_export_since(out, self.taskfile, name, "ndjson")
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), count)
+        return [(row["task"], row["duration_minutes"]) for row in rows], rewritten
+
+    def test_exports_only_new_entries(self):
+        self.assertEqual(self.export(), ([("Feature", 60), ("Feature", 60)], False))
+        self.assertEqual(self.export(), ([], False))
+        self.assertEqual(load_watermarks(self.taskfile)["billing"]["last_finish"], "2025-05-16 12:00")
+
+        # The new line takes its duration from the last line of the previous export, even untracked
+        write_task(self.taskfile, "Meeting", "Standup", "", datetime.datetime(2025, 5, 16, 12, 30))
+        write_task(self.taskfile, "", "start", "", datetime.datetime(2025, 5, 17, 9, 0))
+        self.assertEqual(self.export(), ([("Standup", 30)], False))
+        write_task(self.taskfile, "Coding", "Bugfix", "", datetime.datetime(2025, 5, 17, 9, 45))
+        self.assertEqual(self.export(), ([("Bugfix", 45)], False))
+        # Watermarks are independent of each other
+        self.assertEqual(len(self.export("audit")[0]), 4)
+
+    def test_rewritten_log(self):
+        self.export()
+        write_task(self.taskfile, "Meeting", "Standup", "", datetime.datetime(2025, 5, 16, 12, 30))
+        self.export()
+        undo_tasks(self.taskfile)
+        write_task(self.taskfile, "Meeting", "Review", "", datetime.datetime(2025, 5, 16, 12, 15))
+        write_task(self.taskfile, "Coding", "Bugfix", "", datetime.datetime(2025, 5, 16, 13, 0))
+        # Review finished before the watermark, only what finished after it is exported
+        self.assertEqual(self.export(), ([("Bugfix", 45)], True))
+        self.assertEqual(self.export(), ([], False))
+
+    def test_segmented_log(self):
+        self.export()
+        segment_tasklog(self.taskfile)
+        write_task(self.taskfile, "Coding", "Feature", "", datetime.datetime(2025, 5, 16, 12, 30))
+        write_task(self.taskfile, "", "start", "", datetime.datetime(2025, 6, 2, 9, 0))
+        write_task(self.taskfile, "Coding", "June", "", datetime.datetime(2025, 6, 2, 9, 30))
+        # The watermark pointed into tasks.txt, now tasks.txt.bak
+        self.assertEqual(self.export(), ([("Feature", 30), ("June", 30)], True))
+        self.assertEqual(load_watermarks(self.taskfile)["billing"]["file"], "2025-06.txt")
+        write_task(self.taskfile, "Coding", "June", "", datetime.datetime(2025, 6, 2, 10, 0))
+        self.assertEqual(self.export(), ([("June", 30)], False))
+
+    def test_failed_export_keeps_the_watermark(self):
+        self.export()
+        write_task(self.taskfile, "Meeting", "Standup", "", datetime.datetime(2025, 5, 16, 12, 30))
+        with self.assertRaises(OSError):
+            write_export_since(FailingOutput(), self.taskfile, "billing", "ndjson")
+        self.assertEqual(self.export(), ([("Standup", 30)], False))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,12 @@
 import unittest
 import tempfile
 import os
-from punch.web import determine_case_number, DRY_RUN_SUFFIX, submit_timecards, get_timecards, MissingTimecardsUrl, AuthFileNotFoundError
+import datetime
+import io
+import threading
+from rich.console import Console
+from punch.submissions import SubmissionJournal
+from punch.web import determine_case_number, DRY_RUN_SUFFIX, submit_timecards, get_timecards, MissingTimecardsUrl, AuthFileNotFoundError, TimecardEntry, format_latencies, select_from_combo, SaveFailedError, _submit_entries_with_progress
 from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
 
@@ -131,5 +136,127 @@ class TestGetTimecardsEdgeCases(unittest.TestCase):
         result = get_timecards(self.config, file_path="definitely_missing.txt")
         self.assertIsInstance(result, list)
 
+class TestParallelSubmission(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.auth_json = os.path.join(self.tmpdir.name, "auth.json")
+        with open(self.auth_json, "w") as f:
+            f.write("{}")
+        self.config = {"full_name": "Test User", "timecards_url": "https://example.com/timecards"}
+        self.timecards = [
+            TimecardEntry("00000100", "Test User", 30, datetime.date(2025, 5, 16), datetime.time(9, i), f"work {i}", "Coding")
+            for i in range(12)
+        ]
+        self.saved = []
+        self.failing_saves = set()
+        self.reload_fails = False
+        self.attempts = {}
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def fill(self, config, page, timecard, interactive):
+        with self.lock:
+            self.attempts[timecard.work_performed] = self.attempts.get(timecard.work_performed, 0) + 1
+            attempt = self.attempts[timecard.work_performed]
+        if timecard.work_performed == "work 7" or (timecard.work_performed == "work 3" and attempt == 1):
+            raise TimeoutError("combobox did not show up")
+        page.filled = timecard
+
+    def save(self, page):
+        if page.filled.work_performed in self.failing_saves:
+            raise SaveFailedError("Salesforce did not confirm the timecard was saved")
+        with self.lock:
+            self.saved.append(page.filled.work_performed)
+
+    def reload(self, console, page, config):
+        if self.reload_fails and self.attempts:
+            raise TimeoutError("timecard form did not load")
+
+    def submit(self, workers, journal=None, dry_run=False):
+        out = io.StringIO()
+        with patch("punch.web.Console", lambda: Console(file=out, width=200)), \
+                patch("punch.web.sync_playwright", MagicMock()), \
+                patch("punch.web.get_auth_json_path", return_value=self.auth_json), \
+                patch("punch.web._fill_single_entry", side_effect=self.fill), \
+                patch("punch.web._save_and_new", side_effect=self.save), \
+                patch("punch.web._reload_timecards", side_effect=self.reload):
+            submit_timecards(self.config, self.timecards, workers=workers, journal=journal, dry_run=dry_run)
+        return out.getvalue()
+
+    def test_failures_are_retried_per_entry(self):
+        output = self.submit(workers=3)
+        self.assertEqual(sorted(self.saved), sorted(f"work {i}" for i in range(12) if i != 7))
+        self.assertEqual(self.attempts["work 3"], 2)
+        self.assertEqual(self.attempts["work 7"], 3)
+        self.assertIn("Failed to submit Coding - work 7", output)
+        self.assertIn("Submitted 11 entries.", output)
+        self.assertIn("Per entry:", output)
+
+    def test_failed_saves_are_not_retried(self):
+        self.failing_saves = {"work 5"}
+        journal = SubmissionJournal(os.path.join(self.tmpdir.name, "submissions.jsonl"))
+        output = self.submit(workers=3, journal=journal)
+        self.assertEqual(self.attempts["work 5"], 1)
+        self.assertIn("Failed to submit Coding - work 5 (2025-05-16 09:05): Salesforce did not confirm", output)
+        self.assertEqual(journal.pending(self.timecards), [self.timecards[5], self.timecards[7]])
+
+    def test_failed_reload_reports_the_entry(self):
+        self.reload_fails = True
+        output = self.submit(workers=2)
+        self.assertIn("Failed to submit Coding - work 3 (2025-05-16 09:03): combobox did not show up", output)
+        self.assertNotIn("work 3", self.saved)
+        # Every timecard is either saved or reported
+        self.assertEqual(output.count("Failed to submit") + len(self.saved), len(self.timecards))
+        self.assertIn(f"Submitted {len(self.saved)} entries.", output)
+
+    def test_saved_entries_are_journaled(self):
+        journal = SubmissionJournal(os.path.join(self.tmpdir.name, "submissions.jsonl"))
+        self.submit(workers=2, journal=journal, dry_run=True)
+        self.assertEqual(len(journal), 0)
+        self.submit(workers=3, journal=journal)
+        self.assertEqual(journal.pending(self.timecards), [self.timecards[7]])
+        self.assertEqual(len(SubmissionJournal(journal.path)), 11)
+
+class TestSaveAndNew(unittest.TestCase):
+    def test_unconfirmed_save_is_not_journaled(self):
+        from playwright.sync_api import TimeoutError as playwright_timeout
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        journal = SubmissionJournal(os.path.join(tmpdir.name, "submissions.jsonl"))
+        timecards = [TimecardEntry("00000100", "Test User", 30, datetime.date(2025, 5, 16), datetime.time(9, 0), "work", "Coding")]
+        page = MagicMock()
+        page.wait_for_function.side_effect = playwright_timeout("validation error")
+        with patch("punch.web._fill_single_entry"):
+            with self.assertRaises(SaveFailedError):
+                _submit_entries_with_progress(Console(file=io.StringIO()), page, {}, timecards, False, False, 0.0, journal)
+        page.get_by_role.assert_called_once_with("button", name="Save & New")
+        self.assertEqual(len(journal), 0)
+        page.wait_for_function.side_effect = None
+        with patch("punch.web._fill_single_entry"):
+            _submit_entries_with_progress(Console(file=io.StringIO()), page, {}, timecards, False, False, 0.0, journal)
+        self.assertEqual(len(journal), 1)
+
+class TestSelectFromCombo(unittest.TestCase):
+    def test_waits_for_the_option_instead_of_sleeping(self):
+        input_box, option = MagicMock(), MagicMock()
+        page = MagicMock()
+        page.locator.side_effect = {'input[placeholder="Search People..."]': input_box, "xpath=//option": option}.get
+        with patch("punch.web.time.sleep", side_effect=AssertionError("slept")):
+            select_from_combo(page, "Test User", "Search People...", "xpath=//option", timeout=500)
+        self.assertEqual(input_box.method_calls, [("fill", ("Test User",), {}), ("click", (), {})])
+        self.assertEqual(
+            option.method_calls,
+            [("wait_for", (), {"state": "visible", "timeout": 500}), ("click", (), {}), ("wait_for", (), {"state": "hidden", "timeout": 500})],
+        )
+
+    def test_format_latencies(self):
+        self.assertEqual(
+            format_latencies([2.0, 1.0, 4.5]),
+            "[dim]Per entry: 2.5s average, 2.0s median, 1.0s min, 4.5s max[/dim]",
+        )
+        self.assertIn("No timecards", format_latencies([]))
+
 if __name__ == "__main__":
     unittest.main()